@@ -1,5 +1,6 @@
 from distutils import command
 from fileinput import filename
+import functools
 import os
 from tkinter import filedialog, Tk
 from tkinter.filedialog import asksaveasfilename
@@ -9,11 +10,15 @@ import joblib
 from multiprocessing import Event
 import numpy as np
 from classification import calculate_cca_corrs_all_segments
+from classification.train_processing_cca_3 import filter_all_segments
+from classification.trca import TRCAClassifier
 from sklearn.discriminant_analysis import LinearDiscriminantAnalysis
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import confusion_matrix
 from utils.constants import Constants as cnst, getSessionFilename
 from utils.coloringPrint import printError
+from utils.filters import filterSignal
+from utils.sessionFile import readWindows, getSessionSettings
 
 root = Tk()
 root.withdraw()
@@ -34,10 +39,18 @@ _dataInFile.set()
 # functions 
 # classifier's training
 def training(segment_buffer, chan_ind, fs, frames_ch, lowcut, highcut, harmonics_num,
-             _dataInFile, classifierName):  # segment buffer is proc_buffer, with each get() we have one segment
+             _dataInFile, classifierName, filtered=False, fbcca=False, trca=False):  # segment buffer is proc_buffer, with each get() we have one segment
+
+	if trca:
+		# the classifier learns its spatial filters from the filtered segments themselves
+		segments_filt, ground_truth = filter_all_segments(segment_buffer, chan_ind, fs, lowcut, highcut, _dataInFile,
+		                                                  filtered)
+		clf_TRCA = TRCAClassifier(frames_ch, fs).fit(segments_filt, np.ravel(ground_truth))
+		joblib.dump(clf_TRCA, classifierName)
+		return
 
 	r, ground_truth = calculate_cca_corrs_all_segments(segment_buffer, chan_ind, fs, frames_ch, lowcut, highcut,
-	                                                   harmonics_num, _dataInFile)
+	                                                   harmonics_num, _dataInFile, filtered, fbcca)
 
 	# call the classifier
 	clf_LDA = LinearDiscriminantAnalysis()
@@ -49,9 +62,12 @@ def training(segment_buffer, chan_ind, fs, frames_ch, lowcut, highcut, harmonics
 
 
 def calculateAccuracy(segment_buffer, chan_ind, fs, frames_ch, lowcut, highcut, harmonics_num, _dataInFile,
-                      classifierFileName):
-	r, ground_truth = calculate_cca_corrs_all_segments(segment_buffer, chan_ind, fs, frames_ch, lowcut, highcut,
-	                                                   harmonics_num, _dataInFile)
+                      classifierFileName, filtered=False, fbcca=False, trca=False):
+	if trca:
+		r, ground_truth = filter_all_segments(segment_buffer, chan_ind, fs, lowcut, highcut, _dataInFile, filtered)
+	else:
+		r, ground_truth = calculate_cca_corrs_all_segments(segment_buffer, chan_ind, fs, frames_ch, lowcut, highcut,
+		                                                   harmonics_num, _dataInFile, filtered, fbcca)
 
 	# load classifier
 	clf_LDA = joblib.load(classifierFileName)
@@ -67,15 +83,21 @@ def calculateAccuracy(segment_buffer, chan_ind, fs, frames_ch, lowcut, highcut,
 
 # ................................................................
 # ................................................................
-def classify(fileNames, enabledChannels, lowcut, highcut, fs, saveClassifier,subject=None):
+def classify(fileNames, enabledChannels, lowcut, highcut, fs, saveClassifier,subject=None, filterOnce=cnst.filterOnce,
+             fbcca=cnst.fbcca, trca=cnst.trca):
 	electroType = None
 	allWinSignals= None
+	signalFilter = None
+	if filterOnce:
+		# filter every session's signal once, instead of every window
+		signalFilter = functools.partial(filterSignal, samplingRate=fs, lowBandBound=lowcut, highBandBound=highcut,
+		                                 noiseCancellation=True)
 	for fileName in fileNames:
 		with h5py.File(fileName, 'r') as fl:
 			# get dataset's windowed data as winSignal
-			winSignal = fl['packages'][:,:,0:9]
+			winSignal = readWindows(fl, slice(0, 9), signalFilter, int(cnst.filterTransient * fs) if filterOnce else 0)
 			# get dataset's streaming electrode's settings
-			dtElectroType = fl['StreamSettings'][7,1].decode('UTF-8').split('.')[1]
+			dtElectroType = getSessionSettings(fl)['usingElectrodes']
 			# check whether there is existing electrode type or not. If not init it with the first dataset's settings.
 			# In order to classify, the electrode's type should be the same for each one of the streaming datasets
 			if not electroType:
@@ -110,11 +132,12 @@ def classify(fileNames, enabledChannels, lowcut, highcut, fs, saveClassifier,sub
 	if not classifierFileName:
 		return
 	training(X_train, enabledChannels, fs, frames_ch, lowcut, highcut, harmonics_num, _dataInFile,
-	         classifierFileName)
+	         classifierFileName, filterOnce, fbcca, trca)
 	acc_LDA, predicted_labels_LDA, ground_truth = calculateAccuracy(X_test, enabledChannels, fs, frames_ch,
 	                                                                lowcut,
 	                                                                highcut, harmonics_num,
-	                                                                _dataInFile, classifierFileName)
+	                                                                _dataInFile, classifierFileName, filterOnce,
+	                                                                fbcca, trca)
 
 	print("")
 	print("************ LDA accuracy is ************** : " + str(acc_LDA))
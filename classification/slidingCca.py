@@ -0,0 +1,133 @@
+import numpy as np
+from classification.train_processing_cca_3 import get_stimulus_freqs, calculate_cca_correlations
+from utils.constants import Constants as cnst
+
+
+class SlidingCCA:
+	"""
+	CCA correlations of consecutive overlapping windows of a filtered stream, updated with the samples of every step
+	instead of calculated from the whole window, see
+	:func:`classification.train_processing_cca_3.calculate_cca_correlations`.
+
+	* The sums of the samples, of their products and of their products with the reference signals of every stimulus
+	  frequency are kept for the samples of the current window. On every window, the samples it dropped are subtracted
+	  from them and its new samples are added, so the work grows with the window step, not the window size.
+	* The correlations come from the covariances of the sums, through a whitened channels x references matrix per
+	  stimulus frequency, whose largest singular value is the largest canonical correlation.
+	* The reference signals follow the stream's sample index, the correlations are the same as the ones of references
+	  starting at every window, since the sine and the cosine of every harmonic span every phase.
+	* The windows of a stream are matched by the timestamps of their samples. A window not overlapping the previous one,
+	  e.g. after samples were lost, and every refreshSteps windows, to drop the rounding errors of the updates, the
+	  sums are calculated from the whole window again.
+
+	The windows must be cut from a stream filtered once, see the filterOnce argument of
+	:meth:`source.windowing.windowing`, because windows filtered one by one do not share their samples.
+
+	:param int fs: The sampling rate of the stream.
+	:param list frames_ch: The frames of every stimulus, see :data:`utils.constants.Constants.frames_ch`.
+	:param int harmonics_num: The harmonics of the reference signals.
+	:param int refreshSteps: The windows updated before the sums are calculated from the whole window again.
+	"""
+
+	def __init__(self, fs, frames_ch=cnst.frames_ch, harmonics_num=cnst.harmonics_num,
+	             refreshSteps=cnst.slidingCcaRefreshSteps):
+		self.fs = fs
+		self.frames_ch = frames_ch
+		self.harmonics_num = harmonics_num
+		self.refreshSteps = refreshSteps
+		self.frequencies = np.outer(get_stimulus_freqs(frames_ch), np.arange(1, harmonics_num + 1))
+		self.reset()
+
+	def reset(self):
+		""" Forgets the previous window, the next one is calculated from all its samples """
+		self.window = None
+		self.timestamps = None
+		self.firstIndex = 0
+		self.steps = 0
+
+	def getReferences(self, indexes):
+		"""
+		:param numpy.ndarray indexes: The stream indexes of the samples.
+		:return: (numpy.ndarray) The reference signals of every stimulus frequency at the given samples, as number of
+		         stimuli x number of samples x 2 * harmonics_num array.
+		"""
+		phases = 2 * np.pi * self.frequencies[:, np.newaxis, :] * (indexes / self.fs)[np.newaxis, :, np.newaxis]
+		return np.concatenate((np.sin(phases), np.cos(phases)), axis=2)
+
+	def _accumulate(self, samples, indexes, sign):
+		references = self.getReferences(indexes)
+		self.samplesNum += sign * samples.shape[0]
+		self.sumX += sign * samples.sum(axis=0)
+		self.sumXX += sign * samples.T @ samples
+		self.sumY += sign * references.sum(axis=1)
+		self.sumYY += sign * np.einsum('tnq,tnr->tqr', references, references)
+		self.sumXY += sign * np.einsum('nc,tnq->tcq', samples, references)
+
+	def _restart(self, window):
+		channelsNum = window.shape[1]
+		stimuliNum, referencesNum = self.frequencies.shape[0], 2 * self.harmonics_num
+		self.samplesNum = 0
+		self.sumX = np.zeros(channelsNum)
+		self.sumXX = np.zeros((channelsNum, channelsNum))
+		self.sumY = np.zeros((stimuliNum, referencesNum))
+		self.sumYY = np.zeros((stimuliNum, referencesNum, referencesNum))
+		self.sumXY = np.zeros((stimuliNum, channelsNum, referencesNum))
+		self.firstIndex = 0
+		self.steps = 0
+		self._accumulate(window, np.arange(window.shape[0]), 1)
+
+	def _overlap(self, window, timestamps):
+		# the number of samples the window dropped from the previous one, None if they do not overlap
+		if self.window is None or self.window.shape[1] != window.shape[1] or self.steps >= self.refreshSteps:
+			return None
+		expired = np.flatnonzero(self.timestamps == timestamps[0])
+		if expired.shape[0] != 1:
+			return None
+		overlapNum = self.timestamps.shape[0] - expired[0]
+		if overlapNum > timestamps.shape[0] or self.timestamps[-1] != timestamps[overlapNum - 1]:
+			return None
+		return expired[0]
+
+	def update(self, window, timestamps):
+		"""
+		Updates the sums with the given window and returns its cca correlations.
+
+		:param numpy.ndarray window: The filtered window, as number of samples x number of channels array.
+		:param numpy.ndarray timestamps: The timestamp of every sample of the window.
+		:return: (numpy.ndarray) The correlations, as 1 x number of stimulus freqs array, like
+		         :func:`classification.train_processing_cca_3.calculate_cca_correlations` returns.
+		"""
+		window = np.asarray(window, dtype=float)
+		timestamps = np.array(timestamps)
+		expiredNum = self._overlap(window, timestamps)
+		if expiredNum is None:
+			self._restart(window)
+		else:
+			previousNum = self.window.shape[0]
+			newNum = window.shape[0] - (previousNum - expiredNum)
+			self._accumulate(self.window[:expiredNum], self.firstIndex + np.arange(expiredNum), -1)
+			self._accumulate(window[window.shape[0] - newNum:], self.firstIndex + previousNum + np.arange(newNum), 1)
+			self.firstIndex += expiredNum
+			self.steps += 1
+		self.window = window
+		self.timestamps = timestamps
+		return self.correlations()
+
+	def correlations(self):
+		"""
+		:return: (numpy.ndarray) The cca correlations of the current window, as 1 x number of stimulus freqs array.
+		"""
+		meanX = self.sumX / self.samplesNum
+		covarianceXX = self.sumXX - self.samplesNum * np.outer(meanX, meanX)
+		covarianceYY = self.sumYY - np.einsum('tq,tr->tqr', self.sumY, self.sumY) / self.samplesNum
+		covarianceXY = self.sumXY - np.einsum('c,tq->tcq', meanX, self.sumY)
+		try:
+			choleskyX = np.linalg.cholesky(covarianceXX)
+			choleskyY = np.linalg.cholesky(covarianceYY)
+		except np.linalg.LinAlgError:
+			# rank deficient, e.g. a flat channel, the orthonormal bases drop the extra columns
+			return calculate_cca_correlations(self.window, self.fs, self.frames_ch, self.harmonics_num)
+		whitened = np.linalg.solve(choleskyX, covarianceXY)
+		whitened = np.linalg.solve(choleskyY, whitened.transpose(0, 2, 1))
+		r_segment = np.clip(np.linalg.svd(whitened, compute_uv=False)[:, 0], 0, 1)
+		return r_segment[np.newaxis]
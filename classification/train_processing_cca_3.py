@@ -5,8 +5,10 @@ Created on Wed Jul 10 13:56:22 2019
 @author: xfarmakh
 """
 
+import functools
 import numpy as np
-from utils import filteringCases, FilterType
+from utils import filterWindows, filterBankWindows
+from utils.constants import Constants as cnst
 
 # refresh rate
 refresh_rate = 60
@@ -21,41 +23,43 @@ def create_reference_signals(stimulus_freq, harmonics_num, samples_num, fs):
 	return y_ref
 
 
-def cca(X, Y):
+def orthonormal_basis(X):
 	"""
-
-	Canonical Correlation Analysis (from depmeas)
-	Currently only returns the canonical correlations.
+	Centers X and returns the orthonormal basis of its columns (Q of the QR decomposition), keeping its rank.
 	"""
-	n, p1 = X.shape
-	n, p2 = Y.shape
+	n, p = X.shape
 
-	# center X and Y
+	# center X
 	meanX = X.mean(axis=0)
-	meanY = Y.mean(axis=0)
 	X = X - meanX[np.newaxis, :]
-	Y = Y - meanY[np.newaxis, :]
 
 	Qx, Rx = np.linalg.qr(X)
-	Qy, Ry = np.linalg.qr(Y)
 
 	rankX = np.linalg.matrix_rank(Rx)
 	if rankX == 0:
 		raise Exception('Rank(X) = 0! Bad Data!')
-	elif rankX < p1:
+	elif rankX < p:
 		# warnings.warn("X not full rank!")
 		Qx = Qx[:, 0:rankX]
-		Rx = Rx[0:rankX, 0:rankX]
+	return Qx
+
+
+def cca(X, Y):
+	"""
+
+	Canonical Correlation Analysis (from depmeas)
+	Currently only returns the canonical correlations.
+	"""
+	return cca_basis(X, orthonormal_basis(Y))
 
-	rankY = np.linalg.matrix_rank(Ry)
-	if rankY == 0:
-		raise Exception('Rank(Y) = 0! Bad Data!')
-	elif rankY < p2:
-		# warnings.warn("Y not full rank!")
-		Qy = Qy[:, 0:rankY]
-		Ry = Ry[0:rankY, 0:rankY]
 
-	d = min(rankX, rankY)
+def cca_basis(X, Qy):
+	"""
+	Same as :func:`cca`, with the orthonormal basis of the centered Y given, see :func:`orthonormal_basis`, so only the
+	X side is decomposed.
+	"""
+	Qx = orthonormal_basis(X)
+
 	svdInput = np.dot(Qx.T, Qy)
 
 	U, r, V = np.linalg.svd(svdInput)
@@ -69,89 +73,167 @@ def cca(X, Y):
 	return r
 
 
-# ... This function calculates the cca correlations of a segment of data, for all the stimulus freqs
-# ... segment: number_of_samples x number_of_channels
-def calculate_cca_correlations(segment, fs, frames_ch, harmonics_num):
+def get_stimulus_freqs(frames_ch):
 	# I sum the frames along axis 1 (i.e. I sum all the elements of each row)
 	frames_np = np.sum(np.array(frames_ch), 1)
 	# I divide the screen refresh rate by the frames_np for each stimulus frequency
 	stimulus_freqs = np.divide(np.full(frames_np.shape[0], refresh_rate), frames_np)
 	# .....checkerboard invokes double of the stimuli freqs!!!!!!!!!!!!
 	# if not refresh_rate == 30:
-	stimulus_freqs = 2 * stimulus_freqs
+	return 2 * stimulus_freqs
+
+
+@functools.lru_cache(maxsize=cnst.referenceBankCacheSize)
+def _reference_bank(frames_ch, harmonics_num, samples_num, fs):
+	reference_bank = [orthonormal_basis(create_reference_signals(stimulus_freq, harmonics_num, samples_num, fs))
+	                  for stimulus_freq in get_stimulus_freqs(frames_ch)]
+	for Qy in reference_bank:
+		# shared by every caller
+		Qy.flags.writeable = False
+	return reference_bank
+
+
+def get_reference_bank(frames_ch, harmonics_num, samples_num, fs):
+	"""
+	Returns the orthonormal bases of the centered reference signals of every stimulus frequency, see
+	:func:`create_reference_signals` and :func:`orthonormal_basis`. They depend only on the arguments, so they are
+	computed the first time they are asked for and kept, the last
+	:data:`utils.constants.Constants.referenceBankCacheSize` banks.
+
+	:return: ([numpy.ndarray]) The basis (Qy) of every stimulus frequency, as samples_num x rank arrays.
+	"""
+	return _reference_bank(tuple(map(tuple, frames_ch)), harmonics_num, samples_num, float(fs))
+
+
+# ... This function calculates the cca correlations of a segment of data, for all the stimulus freqs
+# ... segment: number_of_samples x number_of_channels
+def calculate_cca_correlations(segment, fs, frames_ch, harmonics_num):
+	# r_segment contains one cca correlation for each stimulus frequency
+	r_segment = calculate_cca_correlations_batch(segment[np.newaxis], fs, frames_ch, harmonics_num)
+	return r_segment
 
-	r_segment = np.zeros((1, stimulus_freqs.shape[0]))
 
-	for stimulus_ind in range(stimulus_freqs.shape[0]):
-		stimulus_freq = stimulus_freqs[stimulus_ind]
-		# create_cca_reference_signals
-		y_ref = create_reference_signals(stimulus_freq, harmonics_num, segment.shape[0], fs)
+def calculate_cca_correlations_batch(segments, fs, frames_ch, harmonics_num):
+	"""
+	Calculates the cca correlations of many segments at once, for all the stimulus freqs, the same as
+	:func:`calculate_cca_correlations` does for each one of them. The segments are decomposed with one stacked QR and
+	the correlations of every segment and stimulus freq come from one stacked SVD.
+
+	:param numpy.ndarray segments: Array of shape (number of segments, number of samples, number of channels).
+	:return: (numpy.ndarray) The correlations, as number of segments x number of stimulus freqs array.
+	"""
+	# the reference signals of every stimulus frequency, centered and orthonormalized once
+	reference_bank = get_reference_bank(frames_ch, harmonics_num, segments.shape[1], fs)
+
+	# center the segments and decompose them all at once
+	X = segments.astype(float)
+	X = X - X.mean(axis=1)[:, np.newaxis, :]
+	Qx, Rx = np.linalg.qr(X)
+	full_rank = np.linalg.matrix_rank(Rx) == X.shape[2]
+
+	r_segments = np.zeros((segments.shape[0], len(reference_bank)))
+	if len({Qy.shape for Qy in reference_bank}) == 1:
+		# (segments, stimulus freqs, channels, references) products, only their largest singular value is needed
+		svdInput = np.einsum('wnp,tnq->wtpq', Qx[full_rank], np.stack(reference_bank))
+		r_segments[full_rank] = np.clip(np.linalg.svd(svdInput, compute_uv=False)[..., 0], 0, 1)
+	else:
+		full_rank[:] = False
+	# the rank deficient segments drop the extra columns of their basis, one by one
+	for segment_ind in np.flatnonzero(~full_rank):
+		for stimulus_ind, Qy in enumerate(reference_bank):
+			r_segments[segment_ind, stimulus_ind] = cca_basis(X[segment_ind], Qy)[0]
+
+	return r_segments
+
 
-		r_pyr = cca(segment.astype(float), y_ref.astype(float))
-		r_segment[0, stimulus_ind] = r_pyr[0]  # r_segment contains one cca correlation for each stimulus frequency
+def get_fbcca_weights(bands_num, power=cnst.fbccaWeightsPower, offset=cnst.fbccaWeightsOffset):
+	"""
+	:return: (numpy.ndarray) The weight of every sub-band of the filter bank cca, n ** -power + offset for the n-th one.
+	"""
+	return np.arange(1, bands_num + 1) ** -power + offset
 
+
+# ... This function calculates the filter bank cca correlations of a segment of data, for all the stimulus freqs
+# ... segment: number_of_samples x number_of_channels
+def calculate_fbcca_correlations(segment, fs, frames_ch, harmonics_num, bands=cnst.fbccaBands, weights=None,
+                                 noise_cancellation=True):
+	r_segment = calculate_fbcca_correlations_batch(segment[np.newaxis], fs, frames_ch, harmonics_num, bands, weights,
+	                                               noise_cancellation)
 	return r_segment
 
 
+def calculate_fbcca_correlations_batch(segments, fs, frames_ch, harmonics_num, bands=cnst.fbccaBands, weights=None,
+                                       noise_cancellation=True):
+	"""
+	Calculates the filter bank cca correlations of many segments at once, for all the stimulus freqs. The segments are
+	decomposed into the sub-bands with one call of :func:`utils.filters.filterBankWindows`, the cca correlations of
+	every band and segment come from one call of :func:`calculate_cca_correlations_batch`, and the squared
+	correlations of the bands are summed with the given weights.
+
+	:param numpy.ndarray segments: Array of shape (number of segments, number of samples, number of channels), not
+	                               band-pass filtered.
+	:param bands: The (lower bound, upper bound) frequencies of every sub-band.
+	:param weights: The weight of every sub-band, :func:`get_fbcca_weights` if None.
+	:param bool noise_cancellation: Remove the mains noise before the sub-band filters.
+	:return: (numpy.ndarray) The correlations, as number of segments x number of stimulus freqs array.
+	"""
+	if weights is None:
+		weights = get_fbcca_weights(len(bands))
+	sub_bands = filterBankWindows(segments, fs, bands, noise_cancellation)
+	r_bands = calculate_cca_correlations_batch(sub_bands.reshape((-1,) + sub_bands.shape[2:]), fs, frames_ch,
+	                                           harmonics_num)
+	r_bands = r_bands.reshape(sub_bands.shape[:2] + r_bands.shape[1:])
+	return np.einsum('b,bwt->wt', np.asarray(weights, dtype=float), r_bands ** 2)
+
+
 # ....This function band-pass filters a number of segments, whether they are training or testing data
-# ....It calculates the cca correlations of all filtered segments and the ground-truth labels
-def calculate_cca_corrs_all_segments(segment_buffer, chan_ind, fs, frames_ch, lowcut, highcut, harmonics_num,
-                                     _dataInFile):
+# ....It returns the filtered segments where the label is the same for all samples and their ground-truth labels
+# ....filtered: the segments are cut from an already filtered signal, see utils.sessionFile.readWindows
+# ....band_pass: band-pass filter the segments, False to only choose their channels
+def filter_all_segments(segment_buffer, chan_ind, fs, lowcut, highcut, _dataInFile, filtered=False, band_pass=True):
 	if _dataInFile.is_set():  # If data are read from file, they are already in a numpy array form
-		segments_num = len(segment_buffer)
+		segments_full = np.asarray(segment_buffer)
 	else:  # else, if we proccess the data right after the presentation, the data lie in a buffer
-		segments_num = segment_buffer.qsize()
+		segments_full = np.array([segment_buffer.get() for segment_ind in range(segment_buffer.qsize())])
 
-	# I sum the frames along axis 1 (i.e. I sum all the elements of each row)
-	frames_np = np.sum(np.array(frames_ch), 1)
-	# I divide the screen refresh rate by the frames_np for each stimulus frequency
-	stimulus_freqs = np.divide(np.full(frames_np.shape[0], refresh_rate), frames_np)
+	if segments_full.shape[0] == 0:
+		return np.zeros((0, 0, len(chan_ind))), np.zeros((0, 1))
 
-	# .....checkerboard invokes double of the stimuli freqs!!!!!!!!!!!!
-	print("stimulus_freqs:", stimulus_freqs)
-	# if refresh_rate == 60:
-	stimulus_freqs = 2 * stimulus_freqs
-
-	ground_truth_full = np.zeros((segments_num, 1))  # Initialize ground truth array
-	r_full = np.zeros((segments_num, stimulus_freqs.shape[0]))  # Initialize array of cca coefficients r
-	# The mask will contain false for all the segments where the label is not the same for all samples
-	mask = np.zeros((segments_num, 1), dtype=bool)
-	# ms = mask.shape[0]
-	# mv = 0
-	# cc_tr = 0
-	# while ms > 0:
-	#     if mask[mv] == True:
-	#         cc_tr = cc_tr +1
-	#     ms = ms - 1
-
-	# print("True labels",cc_tr)
-
-	for segment_ind in range(segments_num):  # Main loop that runs over segments
-
-		if _dataInFile.is_set():
-			segment_full = segment_buffer[segment_ind]
-		else:
-			segment_full = segment_buffer.get()
+	# The mask is true for the segments where the label (last column) is the same for all samples
+	mask = np.all(segments_full[:, :, -1] == segments_full[:, :1, -1], axis=1)
+	# I store the label of the segment, which is in the last (-1) column of the 1st (0) row
+	ground_truth_full = segments_full[:, :1, -1].astype(float)
+	mask &= ground_truth_full[:, 0] < 200
 
-		segment = segment_full[:, np.asarray(chan_ind)]  # choose channels (last column = label, we will use it later)
+	# choose channels and filter all the segments at once
+	segments_filt = segments_full[mask][:, :, np.asarray(chan_ind)]
+	if band_pass and not filtered:
+		segments_filt = filterWindows(segments_filt, fs, lowcut, highcut, noiseCancellation=True)
 
-		mask[segment_ind] = len(set(segment_full[:, -1])) <= 1
-		# I store the label of the segment, which is in the last (-1) column of the 1st (0) row
-		ground_truth_full[segment_ind, 0] = segment_full[0, -1]
+	return segments_filt, ground_truth_full[mask]
 
-		segment_filt, _ = filteringCases(segment, fs, lowcut, highcut,
-		                                 filtered=True,
-		                                 filterType=FilterType.butter_bandpass_filter,
-		                                 noiseCancellation=True)
 
-		r_full[segment_ind, :] = calculate_cca_correlations(segment_filt, fs, frames_ch, harmonics_num)
-
-	# print("Before", ground_truth_full.shape)
-	ground_truth_new = ground_truth_full[np.ravel(mask)]
-	# print("After", ground_truth_new.shape)
-	r_new = r_full[np.ravel(mask)]
-
-	ground_truth = ground_truth_new[np.nonzero(ground_truth_new < 200)[0]]
-	r = r_new[np.nonzero(ground_truth_new < 200)[0]]
+# ....This function band-pass filters a number of segments, whether they are training or testing data
+# ....It calculates the cca correlations of all filtered segments and the ground-truth labels
+# ....filtered: the segments are cut from an already filtered signal, see utils.sessionFile.readWindows
+# ....fbcca: calculate the filter bank cca correlations instead, see calculate_fbcca_correlations_batch
+def calculate_cca_corrs_all_segments(segment_buffer, chan_ind, fs, frames_ch, lowcut, highcut, harmonics_num,
+                                     _dataInFile, filtered=False, fbcca=False):
+	stimulus_freqs = get_stimulus_freqs(frames_ch)
+	# .....checkerboard invokes double of the stimuli freqs!!!!!!!!!!!!
+	print("stimulus_freqs:", stimulus_freqs / 2)
+
+	# the sub-band filters of the filter bank cca replace the band-pass filter
+	segments_filt, ground_truth = filter_all_segments(segment_buffer, chan_ind, fs, lowcut, highcut, _dataInFile,
+	                                                  filtered, band_pass=not fbcca)
+
+	r = np.zeros((segments_filt.shape[0], stimulus_freqs.shape[0]))  # Initialize array of cca coefficients r
+	if segments_filt.shape[0] > 0:
+		# the cca correlations of all the segments at once
+		if fbcca:
+			r[:, :] = calculate_fbcca_correlations_batch(segments_filt, fs, frames_ch, harmonics_num,
+			                                             noise_cancellation=not filtered)
+		else:
+			r[:, :] = calculate_cca_correlations_batch(segments_filt, fs, frames_ch, harmonics_num)
 
 	return r, ground_truth
@@ -0,0 +1,127 @@
+import numpy as np
+from scipy import linalg
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.discriminant_analysis import LinearDiscriminantAnalysis
+from classification.train_processing_cca_3 import get_stimulus_freqs
+from utils.constants import Constants as cnst
+
+
+class TRCAClassifier(BaseEstimator, ClassifierMixin):
+	"""
+	Task-related component analysis (ensemble TRCA) classifier of band-pass filtered windows, with the templates and the
+	spatial filters of every stimulus learned from the windows of the training sessions.
+
+	* The windows slide over a continuous flicker, so they are not locked to the stimulus onset. The windows of every
+	  stimulus are aligned to the phase of its frequency instead. The phase of a window is the angle of its channels,
+	  demodulated at the frequency, combined with the phase filter of the stimulus, the channels' combination keeping
+	  the most of the power of its training windows at the frequency. The aligned window starts at the sample where
+	  this phase is zero, so the aligned windows are shorter than the windows by a period of the frequency.
+	* The template of every stimulus is the average of its aligned training windows, and its spatial filter is the
+	  channels' combination maximizing the covariance between the aligned windows, the generalized eigenvector of
+	  their summed cross and auto covariances.
+	* The features of a window are the correlations of its aligned window, filtered with the spatial filters of all the
+	  stimuli, with the template of every stimulus filtered the same way. A linear discriminant analysis classifier
+	  predicts the class from them, so the classes without stimulus, e.g. stop, are predicted too.
+
+	Once trained, a prediction is a few matrix multiplications with the precomputed phase filters, spatial filters and
+	templates. The windows may be shorter than the training ones, the templates are cut to their length then.
+
+	:param list frames_ch: The frames of every stimulus, see :data:`utils.constants.Constants.frames_ch`.
+	:param int fs: The sampling rate of the windows.
+	:param list targetClasses: The class of every stimulus, in the order of frames_ch, the training classes after the
+	                           stop class if None.
+	"""
+
+	def __init__(self, frames_ch=cnst.frames_ch, fs=cnst.SAMPLE_RATE_250, targetClasses=None):
+		self.frames_ch = frames_ch
+		self.fs = fs
+		self.targetClasses = targetClasses
+
+	def _responses(self, X):
+		# the channels demodulated at every stimulus frequency, as windows x stimuli x channels complex array
+		carriers = np.exp(-2j * np.pi * np.outer(self.frequencies, np.arange(X.shape[1]) / self.fs))
+		return np.einsum('tn,wnc->wtc', carriers, X)
+
+	def _align(self, X, phases, stimulusInd, length):
+		# the windows of the given length starting where the phase of the stimulus frequency is zero
+		shifts = np.round(np.mod(-phases, 2 * np.pi) / (2 * np.pi) * self.fs / self.frequencies[stimulusInd])
+		shifts = shifts.astype(int) % self.periods[stimulusInd]
+		return X[np.arange(X.shape[0])[:, np.newaxis], shifts[:, np.newaxis] + np.arange(length)]
+
+	def fit(self, X, y):
+		"""
+		Learns the phase filters, the templates and the spatial filters of the stimuli and the classifier of their
+		features.
+
+		:param numpy.ndarray X: The band-pass filtered windows, as (number of windows, number of samples, number of
+		                        channels) array.
+		:param numpy.ndarray y: The class of every window.
+		:return: (TRCAClassifier) self.
+		"""
+		X = np.asarray(X, dtype=float)
+		y = np.ravel(y)
+		targetClasses = cnst.trainingClasses[1:] if self.targetClasses is None else self.targetClasses
+		self.frequencies = get_stimulus_freqs(self.frames_ch)
+		# the samples of a period of every stimulus frequency, the longest shift of an aligned window
+		self.periods = np.ceil(self.fs / self.frequencies).astype(int)
+		if X.shape[1] <= self.periods.max():
+			raise ValueError('The windows are shorter than a period of the stimulus frequencies.')
+		X = X - X.mean(axis=1)[:, np.newaxis, :]
+		responses = self._responses(X)
+		channelsNum = X.shape[2]
+		self.phaseFilters = np.zeros((self.frequencies.shape[0], channelsNum), dtype=complex)
+		self.spatialFilters = np.zeros((channelsNum, self.frequencies.shape[0]))
+		self.templates = []
+		for stimulusInd in range(self.frequencies.shape[0]):
+			classWindows = y == targetClasses[stimulusInd]
+			if not np.any(classWindows):
+				raise ValueError('No training windows of class ' + targetClasses[stimulusInd].__str__() + '.')
+			classResponses = responses[classWindows, stimulusInd]
+			# the generalized eigenvector of the largest eigenvalue, the same whatever the phase of every window
+			covariance = np.einsum('wsc,wsd->cd', X[classWindows], X[classWindows])
+			self.phaseFilters[stimulusInd] = linalg.eigh(classResponses.T @ classResponses.conj(), covariance,
+			                                             subset_by_index=[channelsNum - 1, channelsNum - 1])[1][:, 0]
+			phases = np.angle(classResponses @ self.phaseFilters[stimulusInd].conj())
+			aligned = self._align(X[classWindows], phases, stimulusInd, X.shape[1] - self.periods[stimulusInd])
+			aligned = aligned - aligned.mean(axis=1)[:, np.newaxis, :]
+			summed = aligned.sum(axis=0)
+			autoCovariance = np.einsum('wsc,wsd->cd', aligned, aligned)
+			# the covariance between every pair of different windows
+			crossCovariance = summed.T @ summed - autoCovariance
+			self.spatialFilters[:, stimulusInd] = linalg.eigh(crossCovariance, autoCovariance,
+			                                                  subset_by_index=[channelsNum - 1, channelsNum - 1])[1][:, 0]
+			self.templates.append(summed / aligned.shape[0])
+		self.lda = LinearDiscriminantAnalysis().fit(self.transform(X), y)
+		self.classes_ = self.lda.classes_
+		return self
+
+	def transform(self, X):
+		"""
+		:param numpy.ndarray X: The band-pass filtered windows, as (number of windows, number of samples, number of
+		                        channels) array, longer than a period of every stimulus frequency.
+		:return: (numpy.ndarray) The correlation of every window with the template of every stimulus, as number of
+		         windows x number of stimuli array.
+		"""
+		X = np.asarray(X, dtype=float)
+		X = X - X.mean(axis=1)[:, np.newaxis, :]
+		phases = np.angle(np.einsum('wtc,tc->wt', self._responses(X), self.phaseFilters.conj()))
+		features = np.zeros((X.shape[0], len(self.templates)))
+		for stimulusInd, template in enumerate(self.templates):
+			length = min(template.shape[0], X.shape[1] - self.periods[stimulusInd])
+			if length <= 0:
+				raise ValueError('The windows are shorter than a period of the stimulus frequencies.')
+			components = self._align(X, phases[:, stimulusInd], stimulusInd, length) @ self.spatialFilters
+			components -= components.mean(axis=1)[:, np.newaxis, :]
+			templateComponents = template[:length] @ self.spatialFilters
+			templateComponents -= templateComponents.mean(axis=0)
+			features[:, stimulusInd] = np.einsum('wsk,sk->w', components, templateComponents) / np.maximum(
+				np.linalg.norm(components, axis=(1, 2)) * np.linalg.norm(templateComponents), np.finfo(float).tiny)
+		return features
+
+	def predict(self, X):
+		"""
+		:param numpy.ndarray X: The band-pass filtered windows, as (number of windows, number of samples, number of
+		                        channels) array.
+		:return: (numpy.ndarray) The predicted class of every window.
+		"""
+		return self.lda.predict(self.transform(X))
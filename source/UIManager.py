@@ -15,25 +15,22 @@ from utils.coloringPrint import printInfo, printWarning
 from source.writeToFile import writing
 from source.cyton import OpenBCICyton
 from utils.constants import Constants as cnst, TargetPlatform
+from utils.sampleBus import SampleBus, sampleBlockDtype, blockSamples
 from source.online import startOnline
 
 
-def printData(data, _newDataAvailable, _shutdownEvent):
+def printData(sampleBus, _shutdownEvent):
 	"""
-	* Runs simultaneously with the boardEventHandler process and waits for the writeDataEvent, which is set only by the boardEventHandler.
+	* Runs simultaneously with the boardEventHandler process and waits for new blocks of samples in the sampleBus.
 	* Simple process that just printing the data read from cyton board in the terminal.
 
-	:param Queue data: Buffer used for communicating and getting the transmitted data from :py:meth:`source.boardEventHandler.BoardEventHandler.startStreaming`.
-	:param Event _newDataAvailable: The event the method is waiting for, before proceeding to the next step (printing).
+	:param SampleBus sampleBus: Buffer used for getting the transmitted data from :py:meth:`source.boardEventHandler.BoardEventHandler.startStreaming`.
 	:param Event _shutdownEvent: Used as condition for the method to run.
 	:return: None
 	"""
 	while not _shutdownEvent.is_set():
-		_newDataAvailable.wait(1)
-		if _newDataAvailable.is_set():
-			while not data.qsize() == 0:
-				dt = data.get()
-				print(dt)
+		for dt in blockSamples(sampleBus.read(timeout=1)).tolist():
+			print(dt)
 
 
 def signal_handler(signal, frame):
@@ -61,20 +58,16 @@ def uiManager():
 		6. trainingProcess
 
 	:var Event writeDataEvent: Event for allowing :py:meth:`source.writeToFile.writing`, to write data into file
-	:var Event newDataAvailable: Event will be use in :py:meth:`source.boardEventHandler.BoardEventHandler.startStreaming` to inform other process for new streamed data
 	:var Event startTrainingEvent: Event use to start the training procedure when it is set.
 	:var Event startOnlineEvent: Event use to start the online procedure when it is set.
-	:var SyncManager.Queue guiBuffer: Contains the streamed Data for guiProcess
-	:var SyncManager.Queue printBuffer: Contains the streamed Data for guiProcess
-	:var SyncManager.Queue writingBuffer: Contains the streamed Data for writeProcess
-	:var SyncManager.Queue windowingBuffer: Contains the streamed Data for windowingProcess
-	:var SyncManager.Queue windowedDataBuffer: Contains the windowed streamed Data, got from windowingProcess for the writeProcess
+	:var SampleBus sampleBus: Contains the streamed Data for the guiProcess, printDataProcess, writeProcess and windowingProcess, written once by the boardEventHandlerProcess
+	:var SyncManager.Queue windowedDataBuffer: Contains the latest windows of the streamed Data, got from windowingProcess for the onlineProcess
+	:var SyncManager.Queue multiWindowDataBuffer: Contains the windows of every size, got from windowingProcess for the onlineProcess, None unless the multiWindow argument is given
 	:var SyncManager.Queue currentClassBuffer: Contains the training class, the training program showing every frame via :py:mod:`source.training`
+	:var SyncManager.Queue boardCommandBuffer: Contains the board methods the guiProcess wants called, see :py:meth:`source.boardEventHandler.BoardEventHandler.boardCommands`
+	:var BoardState board: The flags and settings of the board shared with every process, see :py:class:`source.boardState.BoardState`
 	"""
 
-	# register the OpenBCICyton class; make its functions accessible via proxy
-	SyncManager.register('OpenBCICyton', OpenBCICyton)
-
 	parser = argparse.ArgumentParser(prog='UIManager',
 	                                #  description='Python scripts that determines which UI will be used for the cyton board '
 	                                 )
@@ -82,6 +75,20 @@ def uiManager():
 	                    required=False)
 	parser.add_argument('-vi', '--VisualInterface', choices=('psychopy', 'unity'), default='psychopy', help='Choose the preferred interface for training and online session.',
 	                    required=False)
+	parser.add_argument('-bs', '--blockSize', type=int, choices=range(1, cnst.maxSampleBlockSize + 1),
+	                    default=cnst.sampleBlockSize, metavar='[1-' + cnst.maxSampleBlockSize.__str__() + ']',
+	                    help='Choose the number of samples published at once to the other processes.', required=False)
+	parser.add_argument('-wi', '--windowIndexes', action='store_true', default=cnst.storeWindowIndexes,
+	                    help='Store only the indexes of the windows in the session files, instead of their samples.',
+	                    required=False)
+	parser.add_argument('-sp', '--storageProfile', choices=tuple(cnst.storageProfiles), default=cnst.storageProfile,
+	                    help='Choose how the session files are stored, see Constants.storageProfiles.', required=False)
+	parser.add_argument('-mw', '--multiWindow', action='store_true',
+	                    help='Create windows of every size in multiWindowSizeList and predict them in online sessions.',
+	                    required=False)
+	parser.add_argument('-fo', '--filterOnce', action='store_true', default=cnst.filterOnce,
+	                    help='Filter the streamed samples once before cutting the windows, instead of every window.',
+	                    required=False)
 	args = parser.parse_args()
 
 
@@ -90,40 +97,38 @@ def uiManager():
 
 	# main events
 	writeDataEvent = Event()
-	newDataAvailable = Event()
 	startTrainingEvent = Event()
 	startOnlineEvent = Event()
 	newWindowAvailable = Event()
 
 	# catch keyboardinterupt exception and just set shutdownEvent
 	signal.signal(signal.SIGINT, signal_handler)
-	# create board through manager so as to have a proxy for the object to _share through processes
 	manager = SyncManager()
 	manager.start()
-	board = manager.OpenBCICyton()
+	# the board is owned by the boardEventHandler process, every other process gets its flags and settings from the
+	# shared memory state, without a proxy round-trip per call
+	cytonBoard = OpenBCICyton()
+	board = cytonBoard.getSharedState()
 
 	# add the board settings in the boardCytonSettings will be given to the boardEventHandler and guiProcess
 	# Through this dictionary, the board settings given from ui, will be applied to board data
 	boardCytonSettings = manager.dict(board.getBoardSettingAttributes())
 
-	# main queue that will read data from board
-	guiBuffer = manager.Queue(maxsize=cnst.maxQueueSize)
-	printBuffer = manager.Queue(maxsize=cnst.maxQueueSize)
-	writingBuffer = manager.Queue(maxsize=cnst.writeDataMaxQueueSize)
-	windowingBuffer = manager.Queue(maxsize=cnst.writeDataMaxQueueSize)
-	windowedDataBuffer = manager.Queue(maxsize=cnst.writeDataMaxQueueSize)
+	# main buffer that will read data from board in blocks
+	sampleBus = SampleBus(cnst.sampleBusSize // args.blockSize,
+	                      sampleBlockDtype(cytonBoard.getSampleDtype(), args.blockSize))
+	windowedDataBuffer = manager.Queue(maxsize=cnst.windowedDataQueueSize)
 	currentClassBuffer = manager.Queue(maxsize=1)
 	groundTruthClassBuffer = manager.Queue(maxsize=1)
 	filenameBuf = manager.Queue(maxsize=100)
-	# Queue for the communication between socket and boardEventHandler
-	# add queues in the list
-	# dataBuffersList = [windowingBuffer, printBuffer, guiBuffer]
-	dataBuffersList = [windowingBuffer, guiBuffer]
+	# windows of every size created together, only if asked since it is only printed in online sessions
+	multiWindowDataBuffer = manager.Queue(maxsize=cnst.multiWindowQueueSize) if args.multiWindow else None
+	# Queue for the board methods the gui wants called by the boardEventHandler
+	boardCommandBuffer = manager.Queue(maxsize=10)
 
 	# Create a BoardEventHandler Instance
-	boardEventHandler = BoardEventHandler(board, boardCytonSettings, newDataAvailable, dataBuffersList,
-	                                      writingBuffer, writeDataEvent, currentClassBuffer, groundTruthClassBuffer,
-	                                      shutdownEvent)
+	boardEventHandler = BoardEventHandler(cytonBoard, boardCytonSettings, sampleBus, writeDataEvent,
+	                                      currentClassBuffer, groundTruthClassBuffer, boardCommandBuffer, shutdownEvent)
 	# events will be used to control board through any gui
 	boardApiCallEvents = boardEventHandler.getBoardHandlerEvents()
 	
@@ -138,7 +143,7 @@ def uiManager():
 		printInfo("Start GUI mode")
 		# create Process for printing Data
 		printDataProcess = Process(target=printData, name='printData',
-		                           args=(printBuffer, newDataAvailable, shutdownEvent))
+		                           args=(sampleBus, shutdownEvent))
 		processesList.append(printDataProcess)
 
 		# create Process for the boardEventHandler
@@ -147,20 +152,20 @@ def uiManager():
 
 		# create Process for the gui
 		guiProcess = Process(target=startGUI, name='startGUI',
-		                     args=(guiBuffer, newDataAvailable, board, boardApiCallEvents, boardCytonSettings,
-		                           shutdownEvent, writeDataEvent, startTrainingEvent, startOnlineEvent,
-		                           filenameBuf))
+		                     args=(sampleBus, board, boardApiCallEvents, boardCytonSettings, boardCommandBuffer,
+		                           shutdownEvent, writeDataEvent, startTrainingEvent, startOnlineEvent, filenameBuf))
 		processesList.append(guiProcess)
 
 		# create Process to write data from board to file
 		writeProcess = Process(target=writing, name='writing',
-		                       args=(board, writingBuffer, windowedDataBuffer, writeDataEvent, shutdownEvent))
+		                       args=(board, sampleBus, writeDataEvent, shutdownEvent, args.windowIndexes,
+		                             args.storageProfile))
 		processesList.append(writeProcess)
 
 		# create Process for the windowing data
 		windowingProcess = Process(target=windowing, name='windowing',
-		                           args=(board, windowingBuffer, windowedDataBuffer, newDataAvailable, shutdownEvent,
-		                                 writeDataEvent, newWindowAvailable))
+		                           args=(board, sampleBus, windowedDataBuffer, shutdownEvent, writeDataEvent,
+		                                 newWindowAvailable, multiWindowDataBuffer, args.filterOnce))
 		processesList.append(windowingProcess)
 
 		# create Process for connecting to unity program socket
@@ -174,7 +179,8 @@ def uiManager():
 		onlineProcess = Process(target=startOnline, name='online',
 		                        args=(board, startOnlineEvent, boardApiCallEvents, shutdownEvent,
 		                              windowedDataBuffer, currentClassBuffer, groundTruthClassBuffer,
-		                              newWindowAvailable, filenameBuf, targetPlatformSoftware))
+		                              newWindowAvailable, filenameBuf, targetPlatformSoftware, True,
+		                              multiWindowDataBuffer, args.filterOnce))
 		processesList.append(onlineProcess)
 
 		# start processes in the processList
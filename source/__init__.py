@@ -1,4 +1,5 @@
 from .cyton import *
+from .boardState import *
 from .UIManager import *
 from .pyGUI import *
 from .boardEventHandler import *
@@ -1,6 +1,8 @@
 import queue
+import threading
 import traceback
-from multiprocessing import Process, Event
+from multiprocessing import Event
+import numpy as np
 from utils import *
 from utils.general import Timer, emptyQueue
 
@@ -13,35 +15,43 @@ class BoardEventHandler:
 		* startStreamingEvent -> startStreaming()
 		* stopStreamingEvent -> stopStreaming()
 		* newBoardSettingsAvailableEvent -> newBoardSettingsAvailable()
+		* boardCommandBuffer -> boardCommands()
+
+	The process running :meth:`start` is the only one owning the board. Every other process gets the board's flags and
+	settings through :meth:`source.cyton.OpenBCICyton.getSharedState`.
 
 	:param OpenBCICyton board: Represents the OpenBCICyton class in BoardEventHandler class
 	:param dict boardSettings: Contains all board settings set by the GUI and used in cyton.py
-	:param Event newDataAvailable:  Event which other process are waiting for to get the new sample read from board
-	:param dataBuffersList: List with every buffer we want to add streaming data into, and pass to other processes
-	:type dataBuffersList: list(Queue)
-	:param Queue writingBuffer:  Buffer to pass the stream data to :py:meth:`source.writeToFile.writing`.
+	:param SampleBus sampleBus:  Shared memory buffer the streamed samples are written into once, in blocks of :func:`utils.sampleBus.sampleBlockDtype`, for every other process to read them, see :class:`utils.sampleBus.SampleBus`. Every sample is packed as :meth:`source.boardState.BoardState.getSampleDtype`.
 	:param Event writeDataEvent:  Event to inform the writeProcess of UImanager.py to start writing the data into an hdf5 file
 	:param Queue currentClassBuffer:  Buffer lets this process to get sample's class, that either the training program showing every frame via :py:mod:`source.training` or the online session using as the predicted command in :py:mod:`source.online`
+	:param Queue boardCommandBuffer:  Buffer with the (method name, arguments) of the board methods other processes want called, e.g. test_signal from the GUI
 	:param Event _shutdownEvent:  Event used to know when to allow every running process terminate
 
 	:var int currentClass: The current training class value read by currentClassBuffer, initialized in :data:`utils.constants.Constants.unknownClass` value
+	:var int blockSize: The number of samples published at once into the sampleBus, given by the sampleBus's dtype
+	:var int blockSequence: The sequence number of the next published block
 	:var Event connectEvent: When this one get set the :py:meth:`source.boardEventHandler.BoardEventHandler.connect` method is allowed to continue to main process
 	:var Event disconnectEvent:  When this one get set the :py:meth:`source.boardEventHandler.BoardEventHandler.disconnect` method is allowed to continue to main process
 	:var Event startStreamingEvent:  When this one get set the :py:meth:`source.boardEventHandler.BoardEventHandler.startStreaming` method is allowed to continue to main process
 	:var Event stopStreamingEvent:  When this one get set the :py:meth:`source.boardEventHandler.BoardEventHandler.stopStreaming` method is allowed to continue to main process
 	:var Event newBoardSettingsAvailableEvent:  When this one get set the :py:meth:`source.boardEventHandler.BoardEventHandler.newBoardSettingsAvailable` method is allowed to continue to main process
+	:var Event closeSessionEvent:  Set by :py:meth:`source.boardEventHandler.BoardEventHandler.stopStreaming` when the streamed session must be written, so :py:meth:`source.boardEventHandler.BoardEventHandler.startStreaming` sets the writeDataEvent once the last samples are published
 	"""
 
-	def __init__(self, board, boardSettings, newDataAvailable, dataBuffersList, writingBuffer, writeDataEvent,
-	             currentClassBuffer, groundTruthClassBuffer, _shutdownEvent):
+	def __init__(self, board, boardSettings, sampleBus, writeDataEvent, currentClassBuffer, groundTruthClassBuffer,
+	             boardCommandBuffer, _shutdownEvent):
 		self.board = board
 		self.boardSettings = boardSettings
-		self.newDataAvailable = newDataAvailable
-		self.dataBuffersList = dataBuffersList
-		self.writingBuffer = writingBuffer
+		self.sampleBus = sampleBus
+		self.blockSize = sampleBus.dtype['samples'].shape[0]
+		self.blockSequence = 0
+		# samples not filling a whole block yet, see publishSamples
+		self.pendingSamples = np.empty(0, dtype=sampleBus.dtype['samples'].base)
 		self.writeDataEvent = writeDataEvent
 		self.currentClassBuffer = currentClassBuffer
 		self.groundTruthClassBuffer = groundTruthClassBuffer
+		self.boardCommandBuffer = boardCommandBuffer
 		self.shutdownEvent = _shutdownEvent
 
 		self.currentClass = cnst.unknownClass
@@ -51,11 +61,12 @@ class BoardEventHandler:
 		self.startStreamingEvent = Event()
 		self.stopStreamingEvent = Event()
 		self.newBoardSettingsAvailableEvent = Event()
+		self.closeSessionEvent = Event()
 		self.myTimer = Timer()
-		
+
 	def connect(self):
 		"""
-		Method runs via connectProcess:
+		Method runs via connectThread:
 			* A loop runs while the shutdownEvent, declared in UIManager.py, is not set
 			* When the connectEvent has been set it is trying to accomplish a connection with the openbci board, only if there is not an existed connection
 			* Regardless succeeding or not, it clears the connectEvent
@@ -74,7 +85,7 @@ class BoardEventHandler:
 
 	def disconnect(self):
 		"""
-		Method runs via disconnectProcess:
+		Method runs via disconnectThread:
 			* A loop runs while not the shutdownEvent, declared in UIManager.py, is not set
 			* When the disconnectEvent has been set it is trying to clear the existing connection with the openbci board, only if board is NOT streaming, which means that board is not transmitting data
 			* Regardless succeeding or not, it clears the disconnectEvent
@@ -99,19 +110,19 @@ class BoardEventHandler:
 
 	def startStreaming(self):
 		"""
-		Method runs via startStreamingProcess:
+		Method runs via startStreamingThread:
 			*   A loop runs while not the shutdownEvent, declared in UIManager.py, is not set
 			*   Regardless succeeding or not, it clears the startStreamingEvent
 			*   When the startStreamingProcess has been set, if there is a valid connection and an active streaming:
 
-			    1. Starts the streaming
-			    2. Appends the training class into the channel_data array, if training is enabled.
-			    3. Puts the read sample, into every buffer contained in the dataBuffersList for the other processes
-			    4. Inform other processes to get tha sample from the buffer, via the newDataAvailable Event
+			    1. Starts the streaming and the board's reader thread, see :meth:`source.cyton.OpenBCICyton.startReading`
+			    2. Gets the samples read so far, via :meth:`source.cyton.OpenBCICyton.read_samples`, and until the board is synched drops them
+			    3. Sets the training class, the ground truth class and the time since the streaming started of every sample read
+			    4. Writes the samples once into the sampleBus in blocks of blockSize samples, via :meth:`publishSamples`, where every other process reads them from
+			    5. Once the streaming stops, publishes the samples left and, if the session must be written, informs the writeProcess of UIManager to close the hdf5 file via writeDataEvent
 
 		"""
-		streamingQueues = [self.writingBuffer, self.currentClassBuffer, self.groundTruthClassBuffer]
-		streamingQueues.extend(self.dataBuffersList)
+		streamingQueues = [self.currentClassBuffer, self.groundTruthClassBuffer]
 		numOfSamples = 0
 		"minor counter, helps to count the number of samples read by the cyton board"
 		printing = False
@@ -126,45 +137,44 @@ class BoardEventHandler:
 					self.currentClass = cnst.unknownClass
 					numOfSamples = 0
 					printing = True
+					self.pendingSamples = self.pendingSamples[:0]
+					# the board reads the serial port on its own thread from now on
+					self.board.startReading()
 					while self.startStreamingEvent.is_set():
 						try:
-							# get sample from board
-							sample = self.board.stream_one_sample()
-							# append training class in the channel data before put in the buffer
-							if self.board.isSynched():
-								# check if training class has been changed, if so then replace
-								if not self.currentClassBuffer.empty():
-									self.currentClass = self.currentClassBuffer.get_nowait()
-								if not self.groundTruthClassBuffer.empty():
-									self.groundTruthClass = self.groundTruthClassBuffer.get_nowait()
-								# append training class in the channel data before put in the buffer
-								if self.board.isTrainingMode():
-									sample.channel_data.append(self.currentClass)
-									sample.channel_data.append(self.groundTruthClass)
-									sample.channel_data.append(float(self.myTimer.checkpoint()))
-
-								# Put the read sample in every buffer contained in the dataBuffersList and then inform other processes via newDataAvailable event
-								for buffer in self.dataBuffersList:
-									buffer.put_nowait(sample.channel_data)
-									self.newDataAvailable.set()
-								if self.board.isTrainingMode():
-									self.writingBuffer.put_nowait(sample.channel_data)
-									self.newDataAvailable.set()
-								numOfSamples += 1
-								self.newDataAvailable.clear()
-							# check for the synching zeros array sample ( [0, 0, 0, 0 ,0 , 0, 0, 0] )
-							elif sample.channel_data == cnst.synchingSignal:
+							# get every sample read from board since the previous call
+							samples = self.board.read_samples(cnst.boardReadBufferSize, timeout=1)
+							if not self.board.isSynched():
+								# check for the synching zeros array sample ( [0, 0, 0, 0 ,0 , 0, 0, 0] )
+								synchingSamples = np.flatnonzero(~samples['channel_data'].any(axis=1))
+								if not synchingSamples.size:
+									continue
 								printInfo('Synching completed')
 								self.board.setSynching(True)
-						except queue.Full:
-							printError("Queue full, stop streaming...")
-							self.stopStreamingEvent.set()
-							printing = False
-							break
+								samples = samples[synchingSamples[0] + 1:]
+							if not samples.size:
+								continue
+							# check once per block if training class has been changed, if so then replace
+							if not self.currentClassBuffer.empty():
+								self.currentClass = self.currentClassBuffer.get_nowait()
+							if not self.groundTruthClassBuffer.empty():
+								self.groundTruthClass = self.groundTruthClassBuffer.get_nowait()
+							# set the training class of the samples before writing them into the bus
+							samples['class'] = self.currentClass
+							samples['groundTruthClass'] = self.groundTruthClass
+							samples['timestamp'] -= self.myTimer.getTime()
+							self.publishSamples(samples)
+							numOfSamples += samples.size
 						except Exception as er:
 							printError('Stop streaming: ' + er.__str__())
 							self.stopStreamingEvent.set()
 							printing = False
+					# publish the last samples, even if they do not fill a whole block
+					self.publishSamples(self.pendingSamples[:0], flush=True)
+					if self.closeSessionEvent.is_set():
+						# every sample of the session is in the sampleBus now
+						self.closeSessionEvent.clear()
+						self.writeDataEvent.set()
 				else:
 					printing = False
 					printWarning("No connection to start streaming from.")
@@ -172,21 +182,47 @@ class BoardEventHandler:
 			else:
 				if self.myTimer.getTime() is not None:
 					self.myTimer.stop()
-				self.newDataAvailable.clear()
 				if printing:
 					printInfo('Total streamed samples received: ' + numOfSamples.__str__())
 					printing = False
 		emptyQueue(streamingQueues)
 
+	def publishSamples(self, samples, flush=False):
+		"""
+		Writes the given samples into the sampleBus in blocks of blockSize samples, each one with its sequence number.
+		The samples not filling a whole block are kept for the next call, unless flush is True.
+
+		:param numpy.ndarray samples: The samples to publish, after the ones kept from the previous call, packed as :meth:`source.boardState.BoardState.getSampleDtype`.
+		:param bool flush: Publish the samples not filling a whole block in a shorter last block.
+		"""
+		samples = np.concatenate((self.pendingSamples, samples))
+		if flush:
+			blocksNum = -(-samples.size // self.blockSize)
+		else:
+			blocksNum = samples.size // self.blockSize
+		publishedNum = min(blocksNum * self.blockSize, samples.size)
+		self.pendingSamples = samples[publishedNum:]
+		if not blocksNum:
+			return
+		blocks = np.zeros(blocksNum, dtype=self.sampleBus.dtype)
+		blocks['sequence'] = np.arange(self.blockSequence, self.blockSequence + blocksNum)
+		blocks['length'] = self.blockSize
+		blocks['length'][-1] = publishedNum - (blocksNum - 1) * self.blockSize
+		paddedSamples = np.zeros(blocksNum * self.blockSize, dtype=samples.dtype)
+		paddedSamples[:publishedNum] = samples[:publishedNum]
+		blocks['samples'] = paddedSamples.reshape(blocks['samples'].shape)
+		self.sampleBus.write(blocks)
+		self.blockSequence += blocksNum
+
 	def stopStreaming(self):
 		"""
-		Method runs via stopStreamingProcess:
+		Method runs via stopStreamingThread:
 			*   A loop runs while not the shutdownEvent, declared in UIManager.py, is not set
 			*   Regardless succeeding or not, it clears the stopStreamingEvent
 			*   When the stopStreamingEvent has been set, if there is a valid connection and an active streaming:
 
 			    1. Stops the streaming
-			    2. Inform the writeProcess of UIManager to start writing the data to hdf5 file via writeDataEvent
+			    2. Inform the writeProcess of UIManager to close the hdf5 file via writeDataEvent, set by :meth:`startStreaming` after the last samples are published
 			    3. Reinitialize the currentClass to :data:`utils.constants.Constants.unknownClass` value
 
 		"""
@@ -197,10 +233,10 @@ class BoardEventHandler:
 				if self.board.isConnected() and self.board.isStreaming():
 					printInfo("Stopping streaming...")
 					try:
-						self.startStreamingEvent.clear()
 						if self.board.isTrainingMode():
-							self.writeDataEvent.set()
+							self.closeSessionEvent.set()
 							self.board.setTrainingMode(False)
+						self.startStreamingEvent.clear()
 						self.board.stopStreaming()
 						self.board.setSynching(False)
 					except:
@@ -214,7 +250,7 @@ class BoardEventHandler:
 
 	def newBoardSettingsAvailable(self):
 		"""
-		Method runs via newBoardSettingsAvailableProcess:
+		Method runs via newBoardSettingsAvailableThread:
 			* A loop runs while not the shutdownEvent, declared in UIManager.py, is not set
 			* When the newBoardSettingsAvailableEvent has been set it is calling the cyton board method :func:`source.cyton.OpenBCICyton.setBoardSettingAttributes` to change the board settings according to GUI
 			* Whether it successes or not, it clears the newBoardSettingsAvailableEvent
@@ -226,6 +262,26 @@ class BoardEventHandler:
 				self.board.setBoardSettingAttributes(self.boardSettings)
 				self.newBoardSettingsAvailableEvent.clear()
 
+	def boardCommands(self):
+		"""
+		Method runs via boardCommandsThread:
+			* A loop runs while not the shutdownEvent, declared in UIManager.py, is not set
+			* Calls the board method named in every (method name, arguments) tuple put in the boardCommandBuffer, e.g. ('test_signal', (1,)) from the GUI, only if there is a valid connection
+		"""
+
+		while not self.shutdownEvent.is_set():
+			try:
+				command, args = self.boardCommandBuffer.get(timeout=1)
+			except queue.Empty:
+				continue
+			if not self.board.isConnected():
+				printWarning("No connection to call " + command + " on.")
+				continue
+			try:
+				getattr(self.board, command)(*args)
+			except Exception as er:
+				printError("Board command " + command + " failed: " + er.__str__())
+
 	def getBoardHandlerEvents(self):
 		"""
 		Returns the events used to start and stop the BoardEventHandler functions in dictionary format
@@ -242,30 +298,38 @@ class BoardEventHandler:
 	def start(self):
 		"""
 		*   Its the only method of BoardEventHandler should be called from outer methods
-		*   its responsible to run the five below methods in 5 independent processes
+		*   its responsible to run the six below methods in 6 threads of the calling process, which owns the board
 			*   :meth:`source.boardEventHandler.BoardEventHandler.connect`
 			*   :meth:`source.boardEventHandler.BoardEventHandler.disconnect`
 			*   :meth:`source.boardEventHandler.BoardEventHandler.startStreaming`
 			*   :meth:`source.boardEventHandler.BoardEventHandler.stopStreaming`
 			*   :meth:`source.boardEventHandler.BoardEventHandler.newBoardSettingsAvailable`
+			*   :meth:`source.boardEventHandler.BoardEventHandler.boardCommands`
 		*   The above methods are completely controlled by their corresponding events when they are triggered (set)
+		*   Disconnects the board when every thread is done
 		"""
-		procList = []
-		connectProcess = Process(target=self.connect)
-		disconnectProcess = Process(target=self.disconnect)
-		startStreamingProcess = Process(target=self.startStreaming)
-		stopStreamingProcess = Process(target=self.stopStreaming)
-		newBoardSettingsAvailableProcess = Process(target=self.newBoardSettingsAvailable)
+		threadList = []
+		connectThread = threading.Thread(target=self.connect, name='connect')
+		disconnectThread = threading.Thread(target=self.disconnect, name='disconnect')
+		startStreamingThread = threading.Thread(target=self.startStreaming, name='startStreaming')
+		stopStreamingThread = threading.Thread(target=self.stopStreaming, name='stopStreaming')
+		newBoardSettingsAvailableThread = threading.Thread(target=self.newBoardSettingsAvailable,
+		                                                   name='newBoardSettingsAvailable')
+		boardCommandsThread = threading.Thread(target=self.boardCommands, name='boardCommands')
+
+		threadList.append(connectThread)
+		threadList.append(disconnectThread)
+		threadList.append(startStreamingThread)
+		threadList.append(stopStreamingThread)
+		threadList.append(newBoardSettingsAvailableThread)
+		threadList.append(boardCommandsThread)
 
-		procList.append(connectProcess)
-		procList.append(disconnectProcess)
-		procList.append(startStreamingProcess)
-		procList.append(stopStreamingProcess)
-		procList.append(newBoardSettingsAvailableProcess)
+		for thread in threadList:
+			thread.start()
 
-		for proc in procList:
-			proc.start()
+		# join threads
+		for thread in threadList:
+			thread.join()
 
-		# join processes
-		for proc in procList:
-			proc.join()
+		if self.board.isConnected():
+			self.board.disconnect()
@@ -0,0 +1,296 @@
+import ctypes
+import numpy as np
+from multiprocessing import RawValue, RawArray, Value
+from utils.constants import Constants as cnts, ElectrodeType
+
+
+def sharedAttribute(name, doc=None):
+	"""
+	Creates a property stored in the given shared value of :py:data:`BoardState._shared`.
+	Every assignment increases the state's version.
+	"""
+
+	def getter(self):
+		return self._shared[name].value
+
+	def setter(self, value):
+		self._shared[name].value = value
+		self._changed()
+
+	return property(getter, setter, doc=doc)
+
+
+class BoardState(object):
+	"""
+	The flags and settings of a board, kept in shared memory instead of a manager process, so any process can read
+	them without a proxy round-trip.
+
+	* :class:`source.cyton.OpenBCICyton` is a BoardState itself. Its state is shared with every process given the
+	  object returned by :meth:`getSharedState`, which has the same getters and setters as the board.
+	* Every change increases a version counter, see :meth:`getVersion`, so readers can cache the settings and
+	  read them again only when they change.
+	* Values are stored as raw shared values without locks, since each one is a single machine word.
+
+	:param str board_type: The version of the board
+	:param int number_of_channels: The number of channels per sample *from the board*
+	:param int sample_rate: The board's sample rate
+	:param int aux_channels_per_sample: The number of AUX channels per sample *from the board*
+	:param int imp_channels_per_sample: The number of impedance channels per sample *from the board*
+	"""
+
+	streaming = sharedAttribute('streaming')
+	connected = sharedAttribute('connected')
+	synched = sharedAttribute('synched')
+	trainingMode = sharedAttribute('trainingMode')
+	filtering_data = sharedAttribute('filtering_data')
+	scaling_output = sharedAttribute('scaling_output')
+	lowerBoundFrequency = sharedAttribute('lowerBoundFrequency')
+	higherBoundFrequency = sharedAttribute('higherBoundFrequency')
+	windowSize = sharedAttribute('windowSize')
+	windowStepSize = sharedAttribute('windowStepSize')
+
+	def __init__(self, board_type, number_of_channels, sample_rate, aux_channels_per_sample,
+	             imp_channels_per_sample=0):
+		self.board_type = board_type
+		self.number_of_channels = number_of_channels
+		self.sample_rate = sample_rate
+		self.aux_channels_per_sample = aux_channels_per_sample
+		self.imp_channels_per_sample = imp_channels_per_sample
+		self._shared = {
+			'streaming': RawValue(ctypes.c_bool, False),
+			'connected': RawValue(ctypes.c_bool, False),
+			'synched': RawValue(ctypes.c_bool, False),
+			'trainingMode': RawValue(ctypes.c_bool, False),
+			'filtering_data': RawValue(ctypes.c_bool, False),
+			'scaling_output': RawValue(ctypes.c_bool, False),
+			'lowerBoundFrequency': RawValue(ctypes.c_int, 0),
+			'higherBoundFrequency': RawValue(ctypes.c_int, 0),
+			'windowSize': RawValue(ctypes.c_int, 0),
+			'windowStepSize': RawValue(ctypes.c_double, 0),
+			# enabledChannels mask, enabledChannelsSet is False while enabledChannels is None
+			'enabledChannels': RawArray(ctypes.c_bool, cnts.NUMBER_OF_CHANNELS_DAISY),
+			'enabledChannelsSet': RawValue(ctypes.c_bool, False),
+			# ElectrodeType value, -1 for None
+			'usingElectrodes': RawValue(ctypes.c_int, -1),
+			'version': Value(ctypes.c_ulong, 0),
+		}
+
+	def _changed(self):
+		with self._shared['version'].get_lock():
+			self._shared['version'].value += 1
+
+	@property
+	def enabledChannels(self):
+		if not self._shared['enabledChannelsSet'].value:
+			return None
+		return [channel for channel, enabled in enumerate(self._shared['enabledChannels']) if enabled]
+
+	@enabledChannels.setter
+	def enabledChannels(self, channelsList):
+		self._shared['enabledChannelsSet'].value = channelsList is not None
+		for channel in range(len(self._shared['enabledChannels'])):
+			self._shared['enabledChannels'][channel] = channelsList is not None and channel in channelsList
+		self._changed()
+
+	@property
+	def usingElectrodes(self):
+		value = self._shared['usingElectrodes'].value
+		return None if value < 0 else ElectrodeType(value)
+
+	@usingElectrodes.setter
+	def usingElectrodes(self, usEl):
+		self._shared['usingElectrodes'].value = -1 if usEl is None else usEl.value
+		self._changed()
+
+	def getSharedState(self):
+		"""
+		Returns a :class:`BoardState` sharing this object's state, meant to be passed to the processes that need the
+		board's flags and settings but must not own the board itself.
+		"""
+		state = BoardState.__new__(BoardState)
+		state.board_type = self.board_type
+		state.number_of_channels = self.number_of_channels
+		state.sample_rate = self.sample_rate
+		state.aux_channels_per_sample = self.aux_channels_per_sample
+		state.imp_channels_per_sample = self.imp_channels_per_sample
+		state._shared = self._shared
+		return state
+
+	def getVersion(self):
+		""" Returns the number of changes made to the state so far """
+		return self._shared['version'].value
+
+	# SET BOARD VARIABLES FUNCTIONS
+	def setLowerBoundFrequency(self, freq):
+		"""
+		Sets the :py:data:`source.cyton.OpenBCICyton.lowerBoundFrequency`
+
+		:param int freq: The desired frequency
+
+		"""
+		self.lowerBoundFrequency = freq
+
+	def setHigherBoundFrequency(self, freq):
+		self.higherBoundFrequency = freq
+
+	def setWindowSize(self, size):
+		self.windowSize = size
+
+	def setEnabledChannels(self, channelsList):
+		"""
+		Enable channels:
+			* Values must be in the range of the board type available channels
+
+				* daisy = 8-15
+				* cyton = 0-7
+
+		:param [] channelsList: List of the channels want to enable.
+
+		E.G. ch = [4,5,6,7] enables the channels 5-8 and disables 1-4
+		"""
+		enabledChannels = []
+		for channel in range(self.number_of_channels):
+			if channel in channelsList:
+				enabledChannels.append(channel)
+		self.enabledChannels = enabledChannels
+
+	def setFilteringData(self, enable):
+		self.filtering_data = enable
+
+	def setScaledOutput(self, enable):
+		self.scaling_output = enable
+
+	def setBoardSettingAttributes(self, settings):
+		if settings["lowerBand"] != self.getLowerBoundFrequency():
+			self.setLowerBoundFrequency(settings["lowerBand"])
+		if settings["upperBand"] != self.getHigherBoundFrequency():
+			self.setHigherBoundFrequency(settings["upperBand"])
+		if settings["windowSize"] != self.getWindowSize():
+			self.setWindowSize(settings["windowSize"])
+		if settings["filtering_data"] != self.isFilteringData():
+			self.setFilteringData(settings["filtering_data"])
+		if settings["windowStepSize"] != self.getWindowStepSize():
+			self.setWindowStepSize(settings["windowStepSize"])
+		if settings["scaling_output"] != self.isScalingOutput():
+			self.setScaledOutput(settings["scaling_output"])
+		if settings["enabledChannels"] != self.getEnabledChannels():
+			self.setEnabledChannels(settings["enabledChannels"])
+		if settings["usingElectrodes"] != self.getUsingElectrodes():
+			self.setUsingElectrodes(settings["usingElectrodes"])
+
+	def setWindowStepSize(self, size):
+		self.windowStepSize = size
+
+	def setSynching(self, st):
+		self.synched = st
+
+	def setTrainingMode(self, st):
+		self.trainingMode = st
+
+	def setUsingElectrodes(self, usEl):
+		self.usingElectrodes = usEl
+
+	# GET BOARD VARIABLES FUNCTIONS
+
+	def getSampleDtype(self):
+		"""
+		Returns the dtype of a streamed sample, used from the board's reader thread to the file written by
+		:py:meth:`source.writeToFile.writing`
+
+			* id: The packet id (0-255)
+			* channel_data: The channels' data
+			* aux_data: The accelerometer data
+			* class: The training class or the predicted command, :data:`utils.constants.Constants.unknownClass` if none
+			* groundTruthClass: The ground truth class, :data:`utils.constants.Constants.unknownClass` if none
+			* timestamp: The host time the sample was read at, in seconds since the streaming started
+		"""
+		return np.dtype([
+			('id', np.int32),
+			('channel_data', np.float64, (self.number_of_channels,)),
+			('aux_data', np.float64, (self.aux_channels_per_sample,)),
+			('class', np.int32),
+			('groundTruthClass', np.int32),
+			('timestamp', np.float64)
+		])
+
+	def getBoardType(self):
+		""" Returns the version of the board """
+		return self.board_type
+
+	def getLowerBoundFrequency(self):
+		return self.lowerBoundFrequency
+
+	def getHigherBoundFrequency(self):
+		return self.higherBoundFrequency
+
+	def getWindowSize(self):
+		return self.windowSize
+
+	def getWindowStepSize(self):
+		return self.windowStepSize
+
+	def getEnabledChannels(self):
+		return self.enabledChannels
+
+	def isFilteringData(self):
+		return self.filtering_data
+
+	def isScalingOutput(self):
+		return self.scaling_output
+
+	def getSampleRate(self):
+		return self.sample_rate
+
+	def getAvailableNbChannels(self):
+		return self.number_of_channels
+
+	def getAvailableNbAUXChannels(self):
+		return self.aux_channels_per_sample
+
+	def getAvailableNbImpChannels(self):
+		return self.imp_channels_per_sample
+
+	def getBoardSettings(self):
+		return {
+			"lowerBand": self.lowerBoundFrequency.__str__(),
+			"upperBand": self.higherBoundFrequency.__str__(),
+			"windowSize": self.windowSize.__str__(),
+			"filtering_data": self.filtering_data.__str__(),
+			"scaling_output": self.scaling_output.__str__(),
+			"enabledChannels": self.enabledChannels.__str__(),
+			"windowStepSize": self.windowStepSize.__str__(),
+			"usingElectrodes": self.usingElectrodes.__str__()
+		}
+
+	def getBoardSettingAttributes(self):
+		return {
+			"lowerBand": self.lowerBoundFrequency,
+			"upperBand": self.higherBoundFrequency,
+			"windowSize": self.windowSize,
+			"filtering_data": self.filtering_data,
+			"scaling_output": self.scaling_output,
+			"enabledChannels": self.enabledChannels,
+			"windowStepSize": self.windowStepSize,
+			"usingElectrodes": self.usingElectrodes
+		}
+
+	def getWindow(self):
+		return int(self.sample_rate * self.windowSize)
+
+	def getWindowStep(self):
+		return int(self.sample_rate * self.windowStepSize)
+
+	def isSynched(self):
+		return self.synched
+
+	def isConnected(self):
+		return self.connected
+
+	def isTrainingMode(self):
+		return self.trainingMode
+
+	def isStreaming(self):
+		return self.streaming
+
+	def getUsingElectrodes(self):
+		return self.usingElectrodes
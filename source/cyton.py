@@ -23,9 +23,12 @@ import timeit
 import atexit
 import threading
 import glob
+import bisect
 import sys
 
 from utils import filters
+from utils.ringBuffer import RingBuffer
+from source.boardState import BoardState
 from utils.coloringPrint import *
 from utils.constants import Constants as cnts, ElectrodeType
 
@@ -51,9 +54,11 @@ command_biasFixed = "~";
 '''
 
 
-class OpenBCICyton(object):
+class OpenBCICyton(BoardState):
 	"""
 	Handle a connection to an OpenBCI board.
+	The board's flags and settings live in shared memory, see :class:`source.boardState.BoardState`, so the other
+	processes read them through :meth:`getSharedState` while only the process streaming the board owns this object.
 
 	:param int port: The port to connect to.
 	:param int baudRate: The baud of the serial connection.
@@ -74,6 +79,16 @@ class OpenBCICyton(object):
 	             daisy=False, aux=False, impedance=False, log=True, timeout=None,
 	             lowerBoundFrequency=0, higherBoundFrequency=0, enabledChannels=None, windowSize=0,
 	             windowStepSize=0, electrodeType: ElectrodeType = None):
+		# number of channels per sample *from the board*
+		if daisy:
+			BoardState.__init__(self, cnts.BOARD_DAISY, cnts.NUMBER_OF_CHANNELS_DAISY, cnts.SAMPLE_RATE_125,
+			                    cnts.RAW_PACKET_ACCEL_NUMBER_AXIS)
+			self.last_odd_sample = OpenBCISample(-1, [], [])  # used for daisy
+		else:
+			BoardState.__init__(self, cnts.BOARD_CYTON, cnts.NUMBER_OF_CHANNELS_CYTON, cnts.SAMPLE_RATE_250,
+			                    cnts.RAW_PACKET_ACCEL_NUMBER_AXIS)
+		# impedance check not supported at the moment, imp_channels_per_sample stays 0
+
 		self.baudRate = baudRate
 		self.timeout = timeout
 		self.log = log  # print_incoming_text needs log
@@ -91,21 +106,8 @@ class OpenBCICyton(object):
 		self.windowSize = windowSize
 		self.windowStepSize = windowStepSize
 		self.enabledChannels = enabledChannels
-
-		# number of channels per sample *from the board*
-		if self.daisy:
-			self.board_type = cnts.BOARD_DAISY
-			self.number_of_channels = cnts.NUMBER_OF_CHANNELS_DAISY
-			self.last_odd_sample = OpenBCISample(-1, [], [])  # used for daisy
-			self.sample_rate = cnts.SAMPLE_RATE_125
-		else:
-			self.board_type = cnts.BOARD_CYTON
-			self.number_of_channels = cnts.NUMBER_OF_CHANNELS_CYTON
-			self.sample_rate = cnts.SAMPLE_RATE_250
-
-		# number of AUX channels per sample *from the board*
-		self.aux_channels_per_sample = cnts.RAW_PACKET_ACCEL_NUMBER_AXIS
-		self.imp_channels_per_sample = 0  # impedance check not supported at the moment
+		# designed on the first filtered sample, see filterChannel
+		self.streamFilter = None
 
 		# TODO: if not needed delete them
 		self.read_state = 0
@@ -115,6 +117,13 @@ class OpenBCICyton(object):
 		self.reconnect_freq = 5
 		self.packets_dropped = 0
 		self.synched = False
+		# bytes of an incomplete packet left over from the last bulk read
+		self.pending_bytes = b''
+		# background thread draining the serial port into readBuffer, see startReading
+		self.readerThread = None
+		self.readBuffer = None
+		# the exception the reader thread stopped with, raised by read_samples
+		self.readerError = None
 		# Disconnects from board when terminated
 		atexit.register(self.disconnect)
 
@@ -127,154 +136,21 @@ class OpenBCICyton(object):
 
 		"""
 		self.lowerBoundFrequency = freq
+		self.streamFilter = None
 
 	def setHigherBoundFrequency(self, freq):
 		self.higherBoundFrequency = freq
-
-	def setWindowSize(self, size):
-		self.windowSize = size
-
-	def setEnabledChannels(self, channelsList):
-		"""
-		Enable channels:
-			* Values must be in the range of the board type available channels
-
-				* daisy = 8-15
-				* cyton = 0-7
-
-		:param [] channelsList: List of the channels want to enable.
-
-		E.G. ch = [4,5,6,7] enables the channels 5-8 and disables 1-4
-		"""
-		self.enabledChannels = []
-		for channel in range(self.number_of_channels):
-			if channel in channelsList:
-				self.enabledChannels.append(channel)
+		self.streamFilter = None
 
 	def setFilteringData(self, enable):
 		self.filtering_data = enable
-
-	def setScaledOutput(self, enable):
-		self.scaling_output = enable
+		if self.streamFilter is not None:
+			self.streamFilter.reset()
 
 	def setImpedance(self, flag):
 		""" Enable/disable impedance measure. Not implemented at the moment on Cyton. """
 		return
 
-	def setBoardSettingAttributes(self, settings):
-		if settings["lowerBand"] != self.getLowerBoundFrequency():
-			self.setLowerBoundFrequency(settings["lowerBand"])
-		if settings["upperBand"] != self.getHigherBoundFrequency():
-			self.setHigherBoundFrequency(settings["upperBand"])
-		if settings["windowSize"] != self.getWindowSize():
-			self.setWindowSize(settings["windowSize"])
-		if settings["filtering_data"] != self.isFilteringData():
-			self.setFilteringData(settings["filtering_data"])
-		if settings["windowStepSize"] != self.getWindowStepSize():
-			self.setWindowStepSize(settings["windowStepSize"])
-		if settings["scaling_output"] != self.isScalingOutput():
-			self.setScaledOutput(settings["scaling_output"])
-		if settings["enabledChannels"] != self.getEnabledChannels():
-			self.setEnabledChannels(settings["enabledChannels"])
-		if settings["usingElectrodes"] != self.getUsingElectrodes():
-			self.setUsingElectrodes(settings["usingElectrodes"])
-
-	def setWindowStepSize(self, size):
-		self.windowStepSize = size
-
-	def setSynching(self, st):
-		self.synched = st
-
-	def setTrainingMode(self, st):
-		self.trainingMode = st
-
-	def setUsingElectrodes(self, usEl):
-		self.usingElectrodes = usEl
-
-	# GET BOARD VARIABLES FUNCTIONS
-
-	def getBoardType(self):
-		""" Returns the version of the board """
-		return self.board_type
-
-	def getLowerBoundFrequency(self):
-		return self.lowerBoundFrequency
-
-	def getHigherBoundFrequency(self):
-		return self.higherBoundFrequency
-
-	def getWindowSize(self):
-		return self.windowSize
-
-	def getWindowStepSize(self):
-		return self.windowStepSize
-
-	def getEnabledChannels(self):
-		return self.enabledChannels
-
-	def isFilteringData(self):
-		return self.filtering_data
-
-	def isScalingOutput(self):
-		return self.scaling_output
-
-	def getSampleRate(self):
-		return self.sample_rate
-
-	def getAvailableNbChannels(self):
-		return self.number_of_channels
-
-	def getAvailableNbAUXChannels(self):
-		return self.aux_channels_per_sample
-
-	def getAvailableNbImpChannels(self):
-		return self.imp_channels_per_sample
-
-	def getBoardSettings(self):
-		return {
-			"lowerBand": self.lowerBoundFrequency.__str__(),
-			"upperBand": self.higherBoundFrequency.__str__(),
-			"windowSize": self.windowSize.__str__(),
-			"filtering_data": self.filtering_data.__str__(),
-			"scaling_output": self.scaling_output.__str__(),
-			"enabledChannels": self.enabledChannels.__str__(),
-			"windowStepSize": self.windowStepSize.__str__(),
-			"usingElectrodes": self.usingElectrodes.__str__()
-		}
-
-	def getBoardSettingAttributes(self):
-		return {
-			"lowerBand": self.lowerBoundFrequency,
-			"upperBand": self.higherBoundFrequency,
-			"windowSize": self.windowSize,
-			"filtering_data": self.filtering_data,
-			"scaling_output": self.scaling_output,
-			"enabledChannels": self.enabledChannels,
-			"windowStepSize": self.windowStepSize,
-			"usingElectrodes": self.usingElectrodes
-		}
-
-	def getWindow(self):
-		return int(self.sample_rate * self.windowSize)
-
-	def getWindowStep(self):
-		return int(self.sample_rate * self.windowStepSize)
-
-	def isSynched(self):
-		return self.synched
-
-	def isConnected(self):
-		return self.connected
-
-	def isTrainingMode(self):
-		return self.trainingMode
-
-	def isStreaming(self):
-		return self.streaming
-
-	def getUsingElectrodes(self):
-		return self.usingElectrodes
-
 	# SERIAL PORT FUNCTIONS
 	def ser_write(self, b):
 		"""Access serial port object for write"""
@@ -325,6 +201,9 @@ class OpenBCICyton(object):
 				self.set_channel(channel, 0)
 
 	def disconnect(self):
+		# a copy of the board in a process that never connected shares the flags but not the serial port
+		if not hasattr(self, 'ser'):
+			return
 		if self.streaming:
 			self.stopStreaming()
 		if hasattr(self, 'ser') and self.ser.isOpen():
@@ -366,9 +245,29 @@ class OpenBCICyton(object):
 				                             sample.channel_data +
 				                             self.last_odd_sample.channel_data,
 				                             avg_aux_data)
-				return whole_sample
+				return self.filterSample(whole_sample)
 		else:
-			return sample
+			return self.filterSample(sample)
+
+	def stream_samples(self):
+		"""
+		Bulk counterpart of :meth:`stream_one_sample`.
+		Reads every byte waiting on the serial port with a single read and decodes all the complete packets found
+		at once via :func:`decode_packets`. With a daisy module attached, the two halves of every sample are
+		concatenated the same way :meth:`stream_one_sample` does.
+
+		:return: (OpenBCISampleBlock) The samples decoded from the read bytes, possibly empty.
+		"""
+		if not self.streaming:
+			self.ser.write(cnts.startStreamingData)
+			self.streaming = True
+
+		ids, channel_data, aux_data = self._read_samples()
+		if self.board_type == cnts.BOARD_DAISY:
+			ids, channel_data, aux_data = self._merge_daisy_packets(ids, channel_data, aux_data)
+		if self.filtering_data and self.synched:
+			channel_data = self.filterChannel(channel_data)
+		return OpenBCISampleBlock(ids, channel_data, aux_data)
 
 	def start_streaming(self, callback, lapse=-1):
 		"""
@@ -415,10 +314,10 @@ class OpenBCICyton(object):
 						                             self.last_odd_sample.channel_data,
 						                             avg_aux_data)
 						for call in callback:
-							call(whole_sample)
+							call(self.filterSample(whole_sample))
 				else:
 					for call in callback:
-						call(sample)
+						call(self.filterSample(sample))
 
 				if 0 < lapse < (timeit.default_timer() - start_time):
 					self.stopStreaming()
@@ -427,9 +326,89 @@ class OpenBCICyton(object):
 		except Exception as ex:
 			printError("There was a problem on starting streaming: " + ex.__str__())
 
+	def startReading(self):
+		"""
+		Starts streaming and a background thread draining the serial port continuously, via :meth:`stream_samples`,
+		into :py:data:`readBuffer`, a preallocated :class:`utils.ringBuffer.RingBuffer` of samples packed as
+		:meth:`getSampleDtype`, with the host time they were read at. Consumers get the samples via :meth:`read_samples`
+		or :meth:`read_block`, so a slow consumer no longer holds back the serial reads. The thread stops with :meth:`stopStreaming`.
+		"""
+		if self.readerThread is not None and self.readerThread.is_alive():
+			return
+		if self.readBuffer is None:
+			self.readBuffer = RingBuffer(cnts.boardReadBufferSize, self.getSampleDtype())
+		self.readBuffer.clear()
+		self.readerError = None
+		if not self.streaming:
+			self.ser.write(cnts.startStreamingData)
+			self.streaming = True
+		self.readerThread = threading.Thread(target=self._readerLoop, name='cytonReader', daemon=True)
+		self.readerThread.start()
+
+	def _readerLoop(self):
+		"""
+		Body of the reader thread started by :meth:`startReading`. The board is considered stalled if no packet arrives
+		for :py:data:`utils.constants.Constants.boardStallTimeouts` serial timeouts, one second without a timeout. The
+		exception the thread stops with is kept in :py:data:`readerError` and raised by :meth:`read_samples`.
+		"""
+		stallTime = cnts.boardStallTimeouts * (self.timeout if self.timeout else 1)
+		lastPacketTime = time.perf_counter()
+		try:
+			while self.streaming:
+				if self.ser.inWaiting() < cnts.RAW_PACKET_SIZE:
+					if time.perf_counter() - lastPacketTime > stallTime:
+						raise TimeoutError('Device appears to be stalled.')
+					time.sleep(cnts.boardReaderPollInterval)
+					continue
+				readTime = time.perf_counter()
+				lastPacketTime = readTime
+				block = self.stream_samples()
+				rows = np.zeros(len(block), dtype=self.readBuffer.data.dtype)
+				rows['id'] = block.ids
+				rows['channel_data'] = block.channel_data
+				rows['aux_data'] = block.aux_data
+				rows['class'] = cnts.unknownClass
+				rows['groundTruthClass'] = cnts.unknownClass
+				# the last sample arrived at read time, the previous ones one sample period apart
+				rows['timestamp'] = readTime - np.arange(len(block))[::-1] / self.sample_rate
+				self.readBuffer.write(rows)
+		except Exception as ex:
+			self.readerError = ex
+			printError("Board reader thread stopped: " + ex.__str__())
+
+	def read_samples(self, max_samples=None, timeout=None):
+		"""
+		Returns the oldest samples read by the reader thread, see :meth:`startReading`.
+
+		:param int max_samples: The maximum number of samples to return, every available sample if None.
+		:param float timeout: Seconds to wait for a sample if none is available, don't wait if None.
+		:return: (numpy.ndarray) The samples packed as :meth:`getSampleDtype`, possibly none.
+		:raises Exception: The exception the reader thread stopped with, e.g. TimeoutError if the board stalled, once
+		                   every sample read before it is returned.
+		"""
+		overrunSamples = self.readBuffer.overrunRows
+		rows = self.readBuffer.read(max_samples, timeout)
+		if self.readBuffer.overrunRows != overrunSamples:
+			self.warn('Read buffer overrun, %d samples lost' % (self.readBuffer.overrunRows - overrunSamples))
+		if not rows.size and self.readerError is not None:
+			raise self.readerError
+		return rows
+
+	def read_block(self, max_samples=None, timeout=None):
+		"""
+		Same as :meth:`read_samples`, but returns the samples as an :class:`OpenBCISampleBlock`.
+		"""
+		rows = self.read_samples(max_samples, timeout)
+		return OpenBCISampleBlock(rows['id'], rows['channel_data'], rows['aux_data'], rows['timestamp'])
+
 	def stopStreaming(self):
 		printInfo("Wait for buffer to flush...")
 		self.streaming = False
+		if self.readerThread is not None and self.readerThread is not threading.current_thread():
+			self.readerThread.join(1)
+			self.readerThread = None
+		if self.streamFilter is not None:
+			self.streamFilter.reset()
 		self.ser.write(cnts.stopStreamingData)
 		printWarning('Stopped streaming')
 
@@ -480,8 +459,6 @@ class OpenBCICyton(object):
 			packet_channel_data = self.get_channel_data_array(packet)
 			packet_aux_data = self.get_aux_data_array(packet)
 			packet_stop_byte = packet[cnts.RAW_PACKET_POSITION_STOP_BYTE]
-			if self.filtering_data:
-				packet_channel_data = self.filterChannel(packet_channel_data)
 			if is_stop_byte(packet_stop_byte):
 				sample = OpenBCISample(packet_id, packet_channel_data, packet_aux_data)
 				self.packets_dropped = 0
@@ -581,6 +558,60 @@ class OpenBCICyton(object):
 					printWarning(log_bytes_in)
 					self.packets_dropped = self.packets_dropped + 1
 
+	def _read_samples(self):
+		"""
+		  BULK PARSER:
+		  Reads whatever is waiting on the serial port (at least one packet's worth of bytes) in one call and
+		  decodes every complete packet found in it. The bytes of a trailing incomplete packet are kept in
+		  :py:data:`pending_bytes` and prepended to the next read.
+
+		  :return: (ids, channel_data, aux_data) as returned by :func:`decode_packets`
+		"""
+		bb = self.ser.read(max(self.ser.inWaiting(), cnts.RAW_PACKET_SIZE))
+		if not bb:
+			raise TimeoutError('Device appears to be stalled.')
+
+		buffer = np.frombuffer(self.pending_bytes + bb, dtype=np.uint8)
+		starts = find_packet_starts(buffer)
+		if starts.size:
+			consumed = starts[-1] + cnts.RAW_PACKET_SIZE
+			skipped = consumed - starts.size * cnts.RAW_PACKET_SIZE
+		else:
+			# nothing complete yet, keep only the bytes that may still become a packet
+			consumed = max(buffer.size - cnts.RAW_PACKET_SIZE + 1, 0)
+			skipped = consumed
+		if skipped:
+			self.warn('Skipped %d bytes before start found' % skipped)
+		self.pending_bytes = buffer[consumed:].tobytes()
+
+		packets = buffer[starts[:, np.newaxis] + np.arange(cnts.RAW_PACKET_SIZE)]
+		self.packets_dropped = 0
+		return decode_packets(packets, self.scaling_output)
+
+	def _merge_daisy_packets(self, ids, channel_data, aux_data):
+		"""
+		Concatenates the main board and daisy halves of every sample read in bulk. An even packet is kept as the
+		first half and the following odd packet completes it, otherwise the packet is dropped, exactly as
+		:meth:`stream_one_sample` does. A first half left at the end of the block is kept in
+		:py:data:`last_odd_sample` until the next call.
+		"""
+		# put back the first half left from the previous block
+		if self.last_odd_sample.id >= 0:
+			ids = np.concatenate(([self.last_odd_sample.id], ids))
+			channel_data = np.concatenate(([self.last_odd_sample.channel_data], channel_data))
+			aux_data = np.concatenate(([self.last_odd_sample.aux_data], aux_data))
+			self.last_odd_sample = OpenBCISample(-1, [], [])
+
+		firstHalf = np.flatnonzero(ids[:-1] % 2 == 0)
+		firstHalf = firstHalf[ids[firstHalf + 1] == ids[firstHalf] + 1]
+		secondHalf = firstHalf + 1
+		if ids.size and ids[-1] % 2 == 0:
+			self.last_odd_sample = OpenBCISample(int(ids[-1]), channel_data[-1], aux_data[-1])
+
+		return (ids[secondHalf],
+		        np.hstack((channel_data[secondHalf], channel_data[firstHalf])),
+		        (aux_data[secondHalf] + aux_data[firstHalf]) / 2)
+
 	def warn(self, text):
 		if self.log:
 			# log how many packets where sent successfully in between warnings
@@ -724,6 +755,7 @@ class OpenBCICyton(object):
 	def reconnect(self):
 		self.packets_dropped = 0
 		self.warn('Reconnecting')
+		wasReading = self.readerThread is not None
 		self.stopStreaming()
 		time.sleep(0.5)
 		self.ser.write(cnts.softReset)
@@ -731,6 +763,8 @@ class OpenBCICyton(object):
 		self.ser.write(cnts.startStreamingData)
 		time.sleep(0.5)
 		self.streaming = True
+		if wasReading:
+			self.startReading()
 
 	# self.attempt_reconnect = False
 
@@ -925,12 +959,30 @@ class OpenBCICyton(object):
 		return channel_data
 
 	def filterChannel(self, channel_data):
-		filteredData = []
-		for i in range(len(channel_data)):
-			filteredData.append(
-				filters.bandpass([channel_data[i]], self.lowerBoundFrequency, self.higherBoundFrequency,
-				                 self.sample_rate).item(0))
-		return filteredData
+		"""
+		Band-pass filters the channel data between the lower and higher bound frequencies through
+		:py:data:`streamFilter`, which keeps the filter state from the previous call. The filter is designed again
+		only when the band changes.
+
+		:param channel_data: The channel data of consecutive samples as (number of samples, number of channels) array.
+		:return: (numpy.ndarray) The filtered channel data
+		"""
+		if self.streamFilter is None:
+			self.streamFilter = filters.StreamingFilter(self.lowerBoundFrequency, self.higherBoundFrequency,
+			                                            self.sample_rate)
+		return self.streamFilter.filter(channel_data)
+
+	def filterSample(self, sample):
+		"""
+		Filters the channel data of a single sample via :meth:`filterChannel`, only if filtering is enabled.
+		Samples are filtered once the board is synched, so the synching zeros array reaches the handler as is.
+
+		:param OpenBCISample sample: The sample read from the board.
+		:return: (OpenBCISample) The same sample
+		"""
+		if self.filtering_data and self.synched and sample is not None:
+			sample.channel_data = self.filterChannel([sample.channel_data])[0].tolist()
+		return sample
 
 
 def is_stop_byte(byte):
@@ -976,6 +1028,59 @@ def interpret_24_bit_as_int_32(three_byte_buffer):
 	return struct.unpack('>i', three_byte_buffer)[0]
 
 
+def find_packet_starts(buffer):
+	"""
+	Locates every complete packet in a buffer of raw bytes read from the board. A packet is a start byte
+	followed, :data:`utils.constants.Constants.RAW_PACKET_SIZE` - 1 bytes later, by a stop byte (see :func:`is_stop_byte`).
+
+	:param numpy.ndarray buffer: The read bytes as an uint8 array.
+	:return: (numpy.ndarray) The positions of the non overlapping packets' start bytes, in ascending order.
+	"""
+	lastStart = buffer.size - cnts.RAW_PACKET_SIZE
+	if lastStart < 0:
+		return np.empty(0, dtype=np.intp)
+	candidates = np.flatnonzero((buffer[:lastStart + 1] == cnts.RAW_BYTE_START) &
+	                            ((buffer[cnts.RAW_PACKET_SIZE - 1:] & 0xF0) == cnts.RAW_BYTE_STOP))
+	# usual case, the packets are back to back
+	if np.all(np.diff(candidates) >= cnts.RAW_PACKET_SIZE):
+		return candidates
+	# a start byte may also appear inside a packet's data. Out of the overlapping candidates prefer the ones
+	# adjacent to another packet, then the first one
+	chained = np.isin(candidates + cnts.RAW_PACKET_SIZE, candidates) | \
+	          np.isin(candidates - cnts.RAW_PACKET_SIZE, candidates)
+	starts = []
+	for candidate in np.concatenate((candidates[chained], candidates[~chained])).tolist():
+		position = bisect.bisect(starts, candidate)
+		if (position == 0 or starts[position - 1] + cnts.RAW_PACKET_SIZE <= candidate) and \
+				(position == len(starts) or candidate + cnts.RAW_PACKET_SIZE <= starts[position]):
+			starts.insert(position, candidate)
+	return np.array(starts, dtype=np.intp)
+
+
+def decode_packets(packets, scaled_output=True):
+	"""
+	Vectorized equivalent of :meth:`OpenBCICyton.get_channel_data_array` and :meth:`OpenBCICyton.get_aux_data_array`
+	for many packets at once.
+
+	:param numpy.ndarray packets: The packets as an uint8 array of shape (number of packets, :data:`utils.constants.Constants.RAW_PACKET_SIZE`).
+	:param bool scaled_output: Scale the data with the uVolts and G per count factors.
+	:return: (ids, channel_data, aux_data) - arrays of shape (N,), (N, 8) and (N, 3).
+	"""
+	ids = packets[:, cnts.RAW_PACKET_POSITION_SAMPLE_NUMBER].astype(int)
+	# 3 byte big endian ints in 2s complement
+	channelBytes = packets[:, cnts.RAW_PACKET_POSITION_CHANNEL_DATA_START:cnts.RAW_PACKET_POSITION_CHANNEL_DATA_STOP + 1]
+	channelBytes = channelBytes.reshape(-1, cnts.NUMBER_OF_CHANNELS_CYTON, 3).astype(np.int32)
+	channel_data = (channelBytes[:, :, 0] << 16) | (channelBytes[:, :, 1] << 8) | channelBytes[:, :, 2]
+	channel_data = ((channel_data ^ 0x800000) - 0x800000).astype(float)
+	# 2 byte big endian shorts
+	auxBytes = packets[:, cnts.RAW_PACKET_POSITION_START_AUX:cnts.RAW_PACKET_POSITION_STOP_AUX + 1]
+	aux_data = np.ascontiguousarray(auxBytes).view('>i2').astype(float)
+	if scaled_output:
+		channel_data *= scale_fac_uVolts_per_count
+		aux_data *= scale_fac_accel_G_per_count
+	return ids, channel_data, aux_data
+
+
 class OpenBCISample(object):
 	"""
 	Object encapsulating a single sample from the OpenBCI board.
@@ -991,3 +1096,31 @@ class OpenBCISample(object):
 		self.channel_data = channel_data
 		self.aux_data = aux_data
 		self.imp_data = []
+
+
+class OpenBCISampleBlock(object):
+	"""
+	Object encapsulating the samples decoded at once by :meth:`OpenBCICyton.stream_samples`
+	or read via :meth:`OpenBCICyton.read_block`.
+
+	:param numpy.ndarray ids: The packets ids (0-255), shape (N,).
+	:param numpy.ndarray channel_data: The channel data, shape (N, number of channels).
+	:param numpy.ndarray aux_data: The accelerometer data, shape (N, 3).
+	:param numpy.ndarray timestamps: The host time each sample was read at, shape (N,), when read via :meth:`OpenBCICyton.read_block`.
+
+	"""
+
+	def __init__(self, ids, channel_data, aux_data, timestamps=None):
+		self.ids = ids
+		self.channel_data = channel_data
+		self.aux_data = aux_data
+		self.timestamps = timestamps
+
+	def __len__(self):
+		return self.ids.size
+
+	def __iter__(self):
+		""" Yields the block's samples one by one as :class:`OpenBCISample` objects """
+		for packet_id, channel_data, aux_data in zip(self.ids.tolist(), self.channel_data.tolist(),
+		                                             self.aux_data.tolist()):
+			yield OpenBCISample(packet_id, channel_data, aux_data)
@@ -27,7 +27,9 @@ from source import OpenBCICyton
 from utils.coloringPrint import printError, printHeader, printInfo, printWarning
 from utils.constants import Constants as cnst, getSessionFilename, TargetPlatform
 from utils.filters import *
-from classification.train_processing_cca_3 import calculate_cca_correlations
+from classification.train_processing_cca_3 import calculate_cca_correlations, calculate_fbcca_correlations
+from classification.trca import TRCAClassifier
+from classification.slidingCca import SlidingCCA
 from utils.general import emptyQueue
 from source.SSVEPexperiment import SSVEP_online_SCREEN_session
 from source.arduino_run import arduino
@@ -63,7 +65,7 @@ def socketConnect(board, boardApiCallEvents, socketConnection, startOnlineEvent,
 
 	* When the connection could not be established then wait for 10 sec and then retrying.
 
-	:param OpenBCICyton board: Represents the OpenBCICyton object created from :py:class:`source.UIManager`.
+	:param BoardState board: The shared state of the OpenBCICyton object created from :py:class:`source.UIManager`, see :class:`source.boardState.BoardState`.
 	:param list[Event] boardApiCallEvents: Events used in :py:class:`source.boardEventHandler.BoardEventHandler`
 	:param Event socketConnection: Used as flag so the processes :py:meth:`source.online.startTargetApp` :py:meth:`source.online.onlineProcessing` :py:meth:`source.online.debugPredict` :py:meth:`source.online.wheelSerialPredict` can proceed.
 	:param Event startOnlineEvent: Event for which this method will be waiting. This Event is set only by the :py:meth:`source.pyGUI.GUI.onlineButtonClick`
@@ -184,8 +186,54 @@ def startTargetApp(socketConnection, fileNotFound, _shutdownEvent):
 			
 
 
+def predictCommand(clf, segment_full, chan_ind, lowcut, highcut, fs, frames_ch, filtered=False, fbcca=False,
+                   slidingCca=None):
+	"""
+	Filters the enabled channels of the given window, calculates its cca correlations and returns the command the
+	classifier predicts for them.
+
+	:param segment_full: The window, a numpy array of samples with :meth:`source.boardState.BoardState.getSampleDtype`.
+	:param bool filtered: The window is already filtered, see the filterOnce argument of :meth:`source.windowing.windowing`.
+	:param bool fbcca: Calculate the filter bank cca correlations instead, see :py:meth:`classification.train_processing_cca_3.calculate_fbcca_correlations`. Ignored by a :py:class:`classification.trca.TRCAClassifier`, which predicts from the filtered window itself.
+	:param SlidingCCA slidingCca: Updates the cca correlations of the stream's previous window with the window's new samples, see :py:class:`classification.slidingCca.SlidingCCA`, None to calculate them from the whole window. Only for filtered windows.
+	:return: (int) The predicted command.
+	"""
+	# choose channels (last column = label, it doesn't apply in online mode)
+	segmentFiltered = segment_full['channel_data'][:, np.asarray(chan_ind)]
+	if fbcca and not isinstance(clf, TRCAClassifier):
+		# the sub-band filters replace the band-pass filter
+		r_segment = calculate_fbcca_correlations(segment=segmentFiltered,
+		                                         fs=fs,
+		                                         frames_ch=frames_ch,
+		                                         harmonics_num=cnst.harmonics_num,
+		                                         noise_cancellation=not filtered)
+		return int(clf.predict(r_segment)[0])
+	# filter the data
+	if not filtered:
+		segmentFiltered = butter_bandpass_filter(data=segmentFiltered,
+		                                         lowcut=lowcut,
+		                                         highcut=highcut,
+		                                         fs=fs,
+		                                         order=cnst.onlineFilterOrder)
+	if isinstance(clf, TRCAClassifier):
+		return int(clf.predict(segmentFiltered[np.newaxis])[0])
+	# calculate cca correlations
+	if slidingCca is not None and filtered:
+		r_segment = slidingCca.update(segmentFiltered, segment_full['timestamp'])
+	else:
+		r_segment = calculate_cca_correlations(segment=segmentFiltered,
+		                                       fs=fs,
+		                                       frames_ch=frames_ch,
+		                                       harmonics_num=cnst.harmonics_num)
+	# predict
+	tmp_command_predicted = clf.predict(r_segment)
+	return int(tmp_command_predicted[0])
+
+
 def onlineProcessing(board, boardApiCallEvents, windowedDataBuffer, predictBuffer, socketConnection, newWindowAvailable,
-                     _shutdownEvent, startOnlineEvent, targetPlatform, predictedCommand, robotMode, filenameBuf):
+                     _shutdownEvent, startOnlineEvent, targetPlatform, predictedCommand, robotMode, filenameBuf,
+                     multiWindowDataBuffer=None, filterOnce=cnst.filterOnce, fbcca=cnst.fbcca,
+                     slidingCca=cnst.slidingCca):
 	"""
 
 		* waits until :py:attr:`socketConnection` get set by :py:meth:`source.training.connectTraining`
@@ -194,13 +242,18 @@ def onlineProcessing(board, boardApiCallEvents, windowedDataBuffer, predictBuffe
 		* calculates the cca correlations through :py:meth:`classification.train_processing_cca_3.calculate_cca_correlations`
 		* predicts the likely target class through "joblib"
 		* pass the predicted class to :py:attr:`predictBuffer`
+		* if :py:attr:`multiWindowDataBuffer` is given, predicts the class of the latest windows of every size too and prints them, for choosing the window size that suits the subject
 
-		:param OpenBCICyton board: Represents the OpenBCICyton object created from :py:class:`source.UIManager`.
+		:param BoardState board: The shared state of the OpenBCICyton object created from :py:class:`source.UIManager`, see :class:`source.boardState.BoardState`.
 		:param Queue windowedDataBuffer: Buffer used for communicating and getting the windowed Data data from :py:meth:`source.windowing.windowing`.
 		:param Queue predictBuffer: Buffer used for communicating and passing the predicted data to :py:meth:`source.online.wheelSerialPredict`.
 		:param Event socketConnection: Used as flag so the method can proceed to start the online application.
 		:param Event newWindowAvailable: Event used to know when there is new window available data in :py:attr:`windowedDataBuffer` from :py:meth:`source.windowing.windowing`. It is set by :py:meth:`source.windowing.windowing`
 		:param Event _shutdownEvent: Event used to know when to allow every running process terminate
+		:param Queue multiWindowDataBuffer: Buffer used for getting the windows of every size from :py:meth:`source.windowing.windowing`, None if it does not create them.
+		:param bool filterOnce: The windows are already filtered by :py:meth:`source.windowing.windowing`.
+		:param bool fbcca: Predict from the filter bank cca correlations, the classifier must be trained on them too, see :py:meth:`classification.classificationOpenBCI.classify`.
+		:param bool slidingCca: Update the cca correlations of every window with the samples of the step, through :py:class:`classification.slidingCca.SlidingCCA`, instead of calculating them from the whole window. Needs filterOnce.
 
 		"""
 
@@ -208,6 +261,9 @@ def onlineProcessing(board, boardApiCallEvents, windowedDataBuffer, predictBuffe
 		waitingEvent = socketConnection
 	elif targetPlatform == TargetPlatform.PSYCHOPY:
 		waitingEvent = startOnlineEvent
+	# the windows filtered one by one do not share their samples
+	if slidingCca and not filterOnce:
+		printWarning('slidingCca needs filterOnce, the cca correlations are calculated from every whole window.')
 	while not _shutdownEvent.is_set():
 		# wait event based on the target platform 
 		waitingEvent.wait(1)
@@ -217,6 +273,7 @@ def onlineProcessing(board, boardApiCallEvents, windowedDataBuffer, predictBuffe
 		highcut = board.getHigherBoundFrequency()
 		fs = board.getSampleRate()
 		chan_ind = board.getEnabledChannels()
+		ccaEngine = SlidingCCA(fs, frames_ch, cnst.harmonics_num) if slidingCca and filterOnce else None
 		while not filenameBuf.empty():
 			classifierFilename = filenameBuf.get()
 			clf = joblib.load(classifierFilename)
@@ -224,7 +281,7 @@ def onlineProcessing(board, boardApiCallEvents, windowedDataBuffer, predictBuffe
 			newWindowAvailable.wait(1)
 			try:
 				if newWindowAvailable.is_set() and waitingEvent.is_set():
-					segment_full = np.array(windowedDataBuffer.get())
+					segment_full = windowedDataBuffer.get()
 
 					# # I sum the frames along axis 1 (i.e. I sum all the elements of each row)
 					# frames_np = np.sum(np.array(frames_ch), 1)
@@ -232,27 +289,22 @@ def onlineProcessing(board, boardApiCallEvents, windowedDataBuffer, predictBuffe
 					# stimulus_freqs = np.divide(np.full(frames_np.shape[0], 60.), frames_np)
 					# # checkerboard invokes double of the stimuli freqs!!!!!!!!!!!!
 					# stimulus_freqs = 2 * stimulus_freqs
-					# choose channels (last column = label, it doesn't apply in online mode)
-					segment = segment_full[:, np.asarray(chan_ind)]
-					# filter the data
-					segmentFiltered = butter_bandpass_filter(data=segment,
-					                                         lowcut=lowcut,
-					                                         highcut=highcut,
-					                                         fs=fs,
-					                                         order=10)
-					# calculate cca correlations
-					r_segment = calculate_cca_correlations(segment=segmentFiltered,
-					                                       fs=fs,
-					                                       frames_ch=frames_ch,
-					                                       harmonics_num=cnst.harmonics_num)
-					# predict
-					tmp_command_predicted = clf.predict(r_segment)
-					command_predicted = int(tmp_command_predicted[0])
+					command_predicted = predictCommand(clf, segment_full, chan_ind, lowcut, highcut, fs, frames_ch,
+					                                   filterOnce, fbcca, ccaEngine)
 					printInfo('command predicted: ' + command_predicted.__str__())
 					#  put prediction into the buffer
 					predictBuffer.put_nowait(command_predicted)
 					if robotMode:
 						predictedCommand.put_nowait(command_predicted)
+					# predict the latest windows of every size, ending at the same sample
+					multiWindow = None
+					while multiWindowDataBuffer is not None and not multiWindowDataBuffer.empty():
+						multiWindow = multiWindowDataBuffer.get_nowait()
+					for windowSize, windowEnd, window in multiWindow or []:
+						printInfo(windowSize.__str__() + ' s window ending at sample ' + windowEnd.__str__() +
+						          ', command predicted: ' +
+						          predictCommand(clf, window, chan_ind, lowcut, highcut, fs, frames_ch,
+						                         filterOnce, fbcca).__str__())
 			except queue.Full:
 				printError('predictBuffer is Full.')
 				emptyQueue(predictBuffer)
@@ -598,7 +650,8 @@ def wheelSerialPredict(socketConnection, predictBuffer, usb_port_,
 
 
 def startOnline(board, startOnlineEvent, boardApiCallEvents, _shutdownEvent, windowedDataBuffer, currentClassBuffer,
-                groundTruthBuffer, newWindowAvailable, filenameBuf, targetPlatform=TargetPlatform.PSYCHOPY, debugMode=True ):
+                groundTruthBuffer, newWindowAvailable, filenameBuf, targetPlatform=TargetPlatform.PSYCHOPY, debugMode=True,
+                multiWindowDataBuffer=None, filterOnce=cnst.filterOnce, fbcca=cnst.fbcca, slidingCca=cnst.slidingCca):
 	"""
 	* Method runs via onlineProcess in :py:mod:`source.UIManager`
 	* Runs simultaneously with the boardEventHandler process and waits for the startOnlineEvent, which is set only by the boardEventHandler.
@@ -612,7 +665,7 @@ def startOnline(board, startOnlineEvent, boardApiCallEvents, _shutdownEvent, win
 			* :py:meth:`source.online.debugPredict`
 			* :py:meth:`source.online.wheelSerialPredict`
 
-	:param OpenBCICyton board: Represents the OpenBCICyton object created from :py:class:`source.UIManager`.
+	:param BoardState board: The shared state of the OpenBCICyton object created from :py:class:`source.UIManager`, see :class:`source.boardState.BoardState`.
 	:param Event startOnlineEvent: Event which this process will be waiting for, before starting the above processes. This Event is set only by the :py:meth:`source.pyGUI.GUI.onlineButtonClick`
 	:param [Event] boardApiCallEvents:  Events used in :py:class:`source.boardEventHandler.BoardEventHandler`
 	:param Event _shutdownEvent: Event used to know when to let every running process terminate
@@ -622,6 +675,10 @@ def startOnline(board, startOnlineEvent, boardApiCallEvents, _shutdownEvent, win
 	:param Event emergencyKeyboardEvent: Event will be used for enable keyboard controlling of the wheelchair.
 	:param Queue keyboardBuffer: Buffer for getting pressed key from :py:mod:`source.keyboardMove' and used it for wheelchair movement
 	:param TargetPlatform targetPlatform: Choose whether the target will executed using unity or psychopy library. 
+	:param Queue multiWindowDataBuffer: Buffer with the windows of every size from :py:meth:`source.windowing.windowing`, given to :py:meth:`source.online.onlineProcessing`, None if they are not created.
+	:param bool filterOnce: The windows are already filtered by :py:meth:`source.windowing.windowing`, given to :py:meth:`source.online.onlineProcessing`.
+	:param bool fbcca: Predict from the filter bank cca correlations, given to :py:meth:`source.online.onlineProcessing`.
+	:param bool slidingCca: Update the cca correlations of every window with the samples of the step, given to :py:meth:`source.online.onlineProcessing`.
 	"""
 	procList = []
 	mngr = SyncManager()
@@ -643,7 +700,8 @@ def startOnline(board, startOnlineEvent, boardApiCallEvents, _shutdownEvent, win
 	                                  args=(
 	                                  board, boardApiCallEvents, windowedDataBuffer, predictBuffer, socketConnection,
 	                                  newWindowAvailable, _shutdownEvent, startOnlineEvent, targetPlatform,
-	                                  predictedCommand, robotMode, filenameBuf))
+	                                  predictedCommand, robotMode, filenameBuf, multiWindowDataBuffer, filterOnce,
+	                                  fbcca, slidingCca))
 	procList.append(onlineProcessingProcess)
 
 	if targetPlatform == TargetPlatform.UNITY:
@@ -11,6 +11,7 @@ from utils import filters
 from utils.coloringPrint import printError, printInfo
 from utils.constants import Constants as cnst, ElectrodeType
 from utils import fft_analysis
+from utils.sampleBus import blockSamples
 
 
 class ComboBox(QComboBox):
@@ -139,13 +140,12 @@ class CustomDialog(QDialog):
 
 
 class GUI(QMainWindow):
-	def __init__(self, guiBuffer, newDataAvailableEvent, board, boardApiCallEvents, boardCytonSettings, _shutdownEvent,
-	             writeDataEvent, startTrainingEvent, startOnlineEvent, filenameBuf):
+	def __init__(self, sampleBus, board, boardApiCallEvents, boardCytonSettings,
+	             boardCommandBuffer, _shutdownEvent, writeDataEvent, startTrainingEvent, startOnlineEvent, filenameBuf):
 		super().__init__()
 		# pg.setConfigOption('background', 'w')
 		# pg.setConfigOption('foreground', 'k')
-		self.guiBuffer = guiBuffer
-		self.newDataAvailableEvent = newDataAvailableEvent
+		self.sampleBus = sampleBus
 		self.board = board
 		self.boardApiCallEvents = boardApiCallEvents
 		self.shutdownEvent = _shutdownEvent
@@ -154,6 +154,7 @@ class GUI(QMainWindow):
 		self.startOnlineEvent = startOnlineEvent
 		self.filenameBuf = filenameBuf
 		self.boardCytonSettings = boardCytonSettings
+		self.boardCommandBuffer = boardCommandBuffer
 		self.graphData = []
 		self.channelDataGraphWidgets = []
 		self.channelFftWidget = None
@@ -585,18 +586,11 @@ class GUI(QMainWindow):
 
 	def acquirePlottingData(self):
 		while not self.shutdownEvent.is_set():
-			self.newDataAvailableEvent.wait(1)
-			if self.newDataAvailableEvent.is_set():
-				try:
-					dt = self.guiBuffer.get()[0:8]
-					if len(self.graphData) < self.board.getSampleRate() * 4:
-						self.graphData.append(dt)
-					else:
-						del self.graphData[
-						    0:len(self.graphData) - self.board.getSampleRate() * 4 + 1]
-						self.graphData.append(dt)
-				except queue.Empty:
-					pass
+			blocks = self.sampleBus.read(timeout=1)
+			if blocks.size:
+				self.graphData.extend(blockSamples(blocks)['channel_data'][:, 0:8].tolist())
+				# keep the last 4 seconds
+				del self.graphData[0:max(len(self.graphData) - self.board.getSampleRate() * 4, 0)]
 
 	def graphUpdater(self):
 		if not self.shutdownEvent.is_set():
@@ -647,17 +641,18 @@ class GUI(QMainWindow):
 
 	def startTest(self, signal):
 		print(signal)
-		self.board.test_signal(signal)
+		# the board is owned by the boardEventHandler process, see BoardEventHandler.boardCommands
+		self.boardCommandBuffer.put(('test_signal', (signal,)))
 
 	def printBoardInfo(self):
-		self.board.print_register_settings()
+		self.boardCommandBuffer.put(('print_register_settings', ()))
 
 
-def startGUI(guiBuffer, newDataAvailableEvent, board, boardApiCallEvents, boardCytonSettings, _shutdownEvent,
+def startGUI(sampleBus, board, boardApiCallEvents, boardCytonSettings, boardCommandBuffer, _shutdownEvent,
              writeDataEvent, startTrainingEvent, startOnlineEvent, filenameBuf):
 	app = QApplication(sys.argv)
-	gui = GUI(guiBuffer, newDataAvailableEvent, board, boardApiCallEvents, boardCytonSettings, _shutdownEvent,
-	          writeDataEvent, startTrainingEvent, startOnlineEvent, filenameBuf)
+	gui = GUI(sampleBus, board, boardApiCallEvents, boardCytonSettings, boardCommandBuffer,
+	          _shutdownEvent, writeDataEvent, startTrainingEvent, startOnlineEvent, filenameBuf)
 	gui.show()
 	sys.exit(app.exec_())
 
@@ -32,7 +32,7 @@ def connectTraining(board, boardApiCallEvents, startTrainingEvent, currentClassB
 
 	* When the connection could not be established then wait for 10 sec and then retrying.
 
-	:param OpenBCICyton board: Represents the OpenBCICyton object created from :py:class:`source.UIManager`.
+	:param BoardState board: The shared state of the OpenBCICyton object created from :py:class:`source.UIManager`, see :class:`source.boardState.BoardState`.
 	:param [Event] boardApiCallEvents: Events used in :py:class:`source.boardEventHandler.BoardEventHandler`
 	:param Event startTrainingEvent: Event for which this method will be waiting. This Event is set only by the :py:meth:`source.pyGUI.GUI.trainingButtonClick`
 	:param Queue currentClassBuffer: Buffer used to 'give' the training class to :meth:`source.boardEventHandler.BoardEventHandler.startStreaming`.
@@ -148,7 +148,7 @@ def startTraining(board, startTrainingEvent, boardApiCallEvents, _shutdownEvent,
 		1. socketProcess runs :py:meth:`source.training.connectTraining`
 		2. startTRainingApp :py:meth:`source.training.startTrainingApp`
 
-	:param OpenBCICyton board: Represents the OpenBCICyton object created from :py:class:`source.UIManager`.
+	:param BoardState board: The shared state of the OpenBCICyton object created from :py:class:`source.UIManager`, see :class:`source.boardState.BoardState`.
 	:param Event startTrainingEvent: Event for which socketProcess will be waiting, This Event is set only by the :py:meth:`source.pyGUI.GUI.trainingButtonClick`
 	:param [Event] boardApiCallEvents:  Events used in :py:class:`source.boardEventHandler.BoardEventHandler`
 	:param Event _shutdownEvent: Event used to know when to let every running process terminate
@@ -1,44 +1,92 @@
-import numpy as np
 from threading import Event
-from utils.general import emptyQueue
+from utils.constants import Constants as cnst
+from utils.filters import StreamingFilter
+from utils.general import emptyQueue, putLatest
+from utils.sampleBus import blockSamples
+from utils.windowBuffer import WindowBuffer
 
 
-def windowing(board, windowingBuf, windowedData, newDataAvailable, _shutdownEvent, writeDataEvent, newWindowAvailable):
+def windowing(board, sampleBus, windowedData, _shutdownEvent, writeDataEvent, newWindowAvailable,
+              multiWindowData=None, filterOnce=cnst.filterOnce):
 	"""
-	* Runs simultaneously with the boardEventHandler process and waits for the newDataAvailable event.
-	* Creates windows according to :py:data:`board` object's windowSize and stepSize.
-	* Puts every created window into the :py:data:`windowedData` buffer.
+	* Runs simultaneously with the boardEventHandler process and waits for new blocks of samples in the sampleBus.
+	* Creates windows according to :py:data:`board` object's windowSize and stepSize, read again only when the board's settings change.
+	* Puts every created window into the :py:data:`windowedData` buffer, dropping the oldest windows in it if it is full.
 	* Every created window is a 3d numpy array as [number of windows][window size][sample size].
+	* The windows are cut from a :class:`utils.windowBuffer.WindowBuffer` without copying, the only copy of a window is the one put into the :py:data:`windowedData` buffer.
+	* If :py:data:`filterOnce` is set, the mains noise is removed from the channel data of the streamed samples and they are band-pass filtered causally once, between the board's band bounds, as the sessions are filtered for training, before the windows are cut from them, see :class:`utils.filters.StreamingFilter`, so the windows are already filtered. The windows of every size starting in the first :py:data:`utils.constants.Constants.filterTransient` seconds after the filter starts are left out. The filter starts over only when the band bounds or the sample rate change, or samples are lost.
+	* If :py:data:`multiWindowData` is given, every time a window is created, the windows of every size in :py:data:`utils.constants.Constants.multiWindowSizeList` ending at the same sample are cut from the same buffer and put into it together, as a list of (window size in seconds, end sample index, window). The end sample index is the number of samples read from the sampleBus before the end of the window, the sizes with not enough samples yet are left out.
 
-	:param OpenBCICyton board: Represents the OpenBCICyton object created from :py:class:`source.UIManager`.
-	:param Queue windowingBuf: Buffer used for communicating and getting the transmitted data from :py:meth:`source.boardEventHandler.BoardEventHandler.startStreaming`.
-	:param Queue windowedData: Buffer used for communicating and passing the windowed data to :py:meth:`source.writeToFile.writing`.
-	:param Event newDataAvailable: The event the method is waiting for, before proceeding to the next step (windowing).
+	:param BoardState board: The shared state of the OpenBCICyton object created from :py:class:`source.UIManager`, see :class:`source.boardState.BoardState`.
+	:param SampleBus sampleBus: Buffer used for getting the transmitted data from :py:meth:`source.boardEventHandler.BoardEventHandler.startStreaming`.
+	:param Queue windowedData: Buffer used for communicating and passing the windowed data to :py:meth:`source.online.onlineProcessing`.
 	:param Event _shutdownEvent: Used as condition for the method to run.
 	:param Event writeDataEvent: Event that it is set only when streaming data written into a file.
 	:param Event newWindowAvailable: Event for informing other processes, that there is new data in the windowedData buffer.
+	:param Queue multiWindowData: Buffer used for passing the windows of every size to :py:meth:`source.online.onlineProcessing`, None to create only the board's window size.
+	:param bool filterOnce: Filter the streamed samples once, before cutting the windows.
 	"""
+	windowBuffer = WindowBuffer(cnst.windowBufferSize, sampleBus.dtype['samples'].base)
+	multiWindowSizes = cnst.multiWindowSizeList if multiWindowData is not None else []
+	settingsVersion = None
+	lastSequence = None
+	streamFilter = None
+	# the (lower band, upper band, sample rate) the stream filter was designed for
+	filterSettings = None
+	# the first sample windows can start with, after the filter's transient
+	transientEnd = 0
 	while not _shutdownEvent.is_set():
 		if not board.isStreaming() and not writeDataEvent.is_set():
 			emptyQueue(windowedData)
-			windowCounter = 0
-			currentWindowList = []
-		# the desired package-window size (windowSize*sampleRate) EG: 1*250
-		window = board.getWindow()
-		# the desired step size for each package
-		step = board.getWindowStep()
-		newDataAvailable.wait(1)
-		if newDataAvailable.is_set():
-			while not windowingBuf.empty():
-				newWindowAvailable.clear()
-				dt = windowingBuf.get()
-				currentWindowList.append(dt)
-				# append until the package size, then put in queue and remove the first "step" samples
-				if len(currentWindowList) == window:
-					# printWarning("created window No." + windowCounter.__str__())
-					windowCounter += 1
-					windowedData.put(np.copy(currentWindowList))
-					newWindowAvailable.set()
-					del currentWindowList[0:step]
+			if multiWindowData is not None:
+				emptyQueue(multiWindowData)
+			windowBuffer.clear()
+			lastSequence = None
+			sampleBus.clear()
+		if settingsVersion != board.getVersion():
+			settingsVersion = board.getVersion()
+			# the desired package-window size (windowSize*sampleRate) EG: 1*250 and the desired step size for each package
+			windowBuffer.setWindow(board.getWindow(), board.getWindowStep(),
+			                       [int(board.getSampleRate() * size) for size in multiWindowSizes])
+			# the other settings, e.g. the enabled channels, leave the filter and its state as they are
+			if filterOnce and filterSettings != (board.getLowerBoundFrequency(), board.getHigherBoundFrequency(),
+			                                     board.getSampleRate()):
+				filterSettings = (board.getLowerBoundFrequency(), board.getHigherBoundFrequency(), board.getSampleRate())
+				streamFilter = StreamingFilter(*filterSettings, order=cnst.onlineFilterOrder,
+				                               mainsFrequency=cnst.mainsFrequency)
+				transientEnd = windowBuffer.writeCount + int(cnst.filterTransient * board.getSampleRate())
+		blocks = sampleBus.read(timeout=1)
+		if not blocks.size:
+			continue
+		# a window must not span over lost blocks, start over after them
+		if lastSequence is None or blocks['sequence'][0] != lastSequence + 1:
+			windowBuffer.clear()
+			if streamFilter is not None:
+				streamFilter.reset()
+				transientEnd = windowBuffer.writeCount + int(cnst.filterTransient * board.getSampleRate())
+		lastSequence = blocks['sequence'][-1]
+		newWindowAvailable.clear()
+		samples = blockSamples(blocks)
+		if streamFilter is not None:
+			samples['channel_data'] = streamFilter.filter(samples['channel_data'])
+		# put every full package in queue, putting a window copies it out of the windowBuffer
+		for ends in windowBuffer.push(samples):
+			if streamFilter is not None:
+				ends = ends[ends - windowBuffer.window >= transientEnd]
+			windows = windowBuffer.getWindows(ends)
+			# a window longer than the board's one may start in the filter's transient, even if the board's one does not
+			multiWindows = [windowBuffer.getWindows(ends[ends - length >= transientEnd], length)
+			                for length in windowBuffer.lengths]
+			# the windows of a size are the last ones of the ends, there may be not enough samples for the first ones
+			for endIndex in range(-windows.shape[0], 0):
+				# printWarning("created window No." + windowBuffer.windowsNum.__str__())
+				putLatest(windowedData, windows[endIndex])
+				if multiWindowData is not None:
+					putLatest(multiWindowData, [(size, int(ends[endIndex]), sizeWindows[endIndex])
+					                            for size, sizeWindows in zip(multiWindowSizes, multiWindows)
+					                            if -endIndex <= sizeWindows.shape[0]])
+				newWindowAvailable.set()
 	# empty buffers
 	emptyQueue(windowedData)
+	if multiWindowData is not None:
+		emptyQueue(multiWindowData)
@@ -1,54 +1,340 @@
+import argparse
+import glob
+import json
+import os
+import shutil
+import sys
+import time
 import h5py
 import numpy as np
-from utils.coloringPrint import printInfo
+
+sys.path.append('..')
+from source.boardState import BoardState
+from utils.coloringPrint import printError, printInfo, printWarning
 from utils.constants import Constants as cnst, getSessionFilename
+from utils.sampleBus import blockSamples
+from utils.sessionFile import createDataset, appendRows, classRuns, parseSettings
+from utils.windowBuffer import WindowBuffer
+
+
+def samplesToSignal(samples):
+	"""
+	Lays out samples packed as :meth:`source.boardState.BoardState.getSampleDtype` in the columns of the "signal" and
+	"packages" datasets: the channel data followed by the class, the ground truth class and the time, see
+	:data:`utils.constants.Constants.signalClassColumn`.
+
+	:param numpy.ndarray samples: Array of samples of any shape.
+	:return: (numpy.ndarray) Float array of the samples' shape plus one dimension for the columns.
+	"""
+	return np.concatenate((samples['channel_data'],
+	                       samples['class'][..., np.newaxis],
+	                       samples['groundTruthClass'][..., np.newaxis],
+	                       samples['timestamp'][..., np.newaxis]), axis=-1).astype(float)
+
+
+class SegmentRecorder:
+	"""
+	Keeps a crash-safe copy of the samples of a session, next to its hdf5 file, until the file is closed.
+
+	* The samples are appended as raw records of the sample dtype into segment files, a new one every
+	  :data:`utils.constants.Constants.segmentSize` samples. A crash loses at most the samples not written by the
+	  operating system yet, and a record cut by the crash is dropped when recovering.
+	* The journal file holds one json object per line: the session settings when the session starts, every closed
+	  segment and every lost block of samples.
+	* :func:`recoverSession` rebuilds the session file from the segments and the journal.
+
+	:param str directory: The directory of the segments and the journal, created if it does not exist.
+	:param numpy.dtype sampleDtype: The dtype of a sample.
+	:param dict session: The session settings written into the journal, see :class:`SessionWriter`.
+	"""
+
+	def __init__(self, directory, sampleDtype, session):
+		self.directory = directory
+		os.makedirs(directory, exist_ok=True)
+		self.journal = open(os.path.join(directory, cnst.journalFilename), 'a')
+		self.samplesNum = 0
+		self.segmentsNum = 0
+		self.segment = None
+		self.segmentSamplesNum = 0
+		self.log(dict(session, event='start', dtype=np.lib.format.dtype_to_descr(np.dtype(sampleDtype))))
+
+	def log(self, entry):
+		""" Appends the given entry into the journal """
+		self.journal.write(json.dumps(entry) + '\n')
+		self.journal.flush()
+
+	def append(self, samples):
+		"""
+		Appends the given samples into the current segment, starting a new one if it is full.
+
+		:param numpy.ndarray samples: Array of samples with the sample dtype.
+		"""
+		if self.segment is None or self.segmentSamplesNum >= cnst.segmentSize:
+			self.closeSegment()
+			self.segment = open(os.path.join(self.directory, cnst.segmentFilename % self.segmentsNum), 'wb')
+			self.segmentsNum += 1
+		self.segment.write(samples.tobytes())
+		self.segment.flush()
+		self.segmentSamplesNum += samples.shape[0]
+		self.samplesNum += samples.shape[0]
+
+	def skip(self):
+		""" Logs that samples were lost before the next appended sample """
+		self.log({'event': 'skip', 'sample': self.samplesNum})
+
+	def closeSegment(self):
+		""" Closes the current segment, if there is one, and syncs it and the journal to the disk """
+		if self.segment is None:
+			return
+		os.fsync(self.segment.fileno())
+		self.segment.close()
+		self.log({'event': 'segment', 'name': os.path.basename(self.segment.name), 'samples': self.segmentSamplesNum})
+		os.fsync(self.journal.fileno())
+		self.segment = None
+		self.segmentSamplesNum = 0
+
+	def close(self):
+		""" Deletes the segments and the journal, once the session file is closed """
+		if self.segment is not None:
+			self.segment.close()
+		self.journal.close()
+		shutil.rmtree(self.directory)
 
 
-def writing(board, writeBuf, windowedData, writeDataEvent, _shutdownEvent):
+def recoverSession(directory, filename=None):
 	"""
-	* Runs simultaneously with the boardEventHandler process and waits for the writeDataEvent, which is set only by the boardEventHandler.
-	* Creates an hdf5 file with name specified by dateTime.
-	* The hdf5 file contains 2 datasets
+	Rebuilds the session file of a session that was not closed, from the segments and the journal kept by its
+	:class:`SegmentRecorder`, as :class:`SessionWriter` would have written it with the settings the session started with.
+
+	:param str directory: The directory of the segments and the journal.
+	:param str filename: The recovered file name without the extension, the session's file name followed by
+		"_recovered" if None.
+	:return: (str) The recovered file name.
+	"""
+	with open(os.path.join(directory, cnst.journalFilename)) as journal:
+		entries = [json.loads(line) for line in journal if line.endswith('\n')]
+	session = entries[0]
+	skips = [entry['sample'] for entry in entries if entry['event'] == 'skip']
+	sampleDtype = np.lib.format.descr_to_dtype([tuple(field) for field in session['dtype']])
+	board = BoardState(session['boardType'], session['channelsNum'], session['sampleRate'], session['auxChannelsNum'])
+	board.setWindowSize(session['windowSize'])
+	board.setWindowStepSize(session['windowStepSize'])
+	if filename is None:
+		filename = os.path.splitext(session['filename'])[0] + '_recovered'
+	sessionWriter = SessionWriter(filename, board, session['windowIndexes'], session['profile'], segments=False)
+	samplesNum = 0
+	# the closed segments are in the journal, only the last one may be left open by the crash
+	segmentNames = [entry['name'] for entry in entries if entry['event'] == 'segment']
+	openSegments = sorted(os.path.basename(name) for name in
+	                      glob.glob(os.path.join(glob.escape(directory), cnst.segmentFilename.replace('%05d', '*')))
+	                      if not segmentNames or os.path.basename(name) > segmentNames[-1])
+	segmentNames += openSegments[:1]
+	for segmentName in segmentNames:
+		with open(os.path.join(directory, segmentName), 'rb') as segment:
+			data = segment.read()
+		# drop the last record if the crash cut it
+		samples = np.frombuffer(data, dtype=sampleDtype, count=len(data) // sampleDtype.itemsize)
+		# the windows start over after every lost block of samples
+		for skip in skips:
+			if samplesNum <= skip < samplesNum + samples.shape[0]:
+				sessionWriter.append(samples[:skip - samplesNum])
+				sessionWriter.skip()
+				samples = samples[skip - samplesNum:]
+				samplesNum = skip
+		sessionWriter.append(samples)
+		samplesNum += samples.shape[0]
+	sessionWriter.close(session['boardSettings'])
+	return sessionWriter.filename
+
+
+class SessionWriter:
+	"""
+	Writes the samples of a session into an hdf5 file as they arrive, so neither the samples nor the windows of the
+	session are kept in memory and closing the file at the end of the session is immediate.
+
+	* The "signal" and "packages" datasets are created empty, chunked and resizable, and every call of :meth:`append`
+	  appends the given samples to "signal" and the windows they complete to "packages".
+	* The windows are cut with the board's window size and step at the start of the session, so every window in
+	  "packages" has the same size, see :class:`utils.windowBuffer.WindowBuffer`.
+	* With windowIndexes, the "windows" dataset replaces "packages", holding only the [start, end) "signal" row indexes
+	  of every window, with the window size and step in samples as its attributes. Read the windows of both layouts
+	  with :func:`utils.sessionFile.readWindows`.
+	* The "classIndex" dataset holds the runs of consecutive samples of the same class as [class, start, end) "signal"
+	  rows, see :func:`utils.sessionFile.getClassRuns`.
+	* The board settings are stored as typed attributes of the file too, see
+	  :func:`utils.sessionFile.getSessionSettings`.
+	* The datasets are stored as the given storage profile says, see :data:`utils.constants.Constants.storageProfiles`.
+	* The file is flushed every :data:`utils.constants.Constants.writeFlushInterval` seconds.
+	* With segments, the samples are kept by a :class:`SegmentRecorder` too, in the directory with the file name followed
+	  by ".segments", until the file is closed. If the application dies, the file may be unreadable, and
+	  :func:`recoverSession` rebuilds it from the segments.
+
+	:param str filename: The file name without the extension.
+	:param BoardState board: The shared state of the board, see :class:`source.boardState.BoardState`.
+	:param bool windowIndexes: Store the indexes of the windows instead of their samples.
+	:param str profile: The name of the storage profile.
+	:param bool segments: Keep a crash-safe copy of the samples until the file is closed.
+	"""
+
+	def __init__(self, filename, board, windowIndexes=cnst.storeWindowIndexes, profile=cnst.storageProfile,
+	             segments=True):
+		self.filename = filename + '.hdf5'
+		self.segmentRecorder = None
+		if segments:
+			self.segmentRecorder = SegmentRecorder(filename + '.segments', board.getSampleDtype(), {
+				'filename': self.filename,
+				'boardType': board.getBoardType(),
+				'channelsNum': board.getAvailableNbChannels(),
+				'sampleRate': board.getSampleRate(),
+				'auxChannelsNum': board.getAvailableNbAUXChannels(),
+				'windowSize': board.getWindowSize(),
+				'windowStepSize': board.getWindowStepSize(),
+				'windowIndexes': windowIndexes,
+				'profile': profile,
+				'boardSettings': board.getBoardSettings()
+			})
+		self.hf = h5py.File(self.filename, 'w')
+		columnsNum = board.getAvailableNbChannels() - cnst.signalClassColumn
+		window = board.getWindow()
+		self.windowIndexes = windowIndexes
+		self.signal = createDataset(self.hf, "signal", (0, columnsNum),
+		                            (cnst.storageProfiles[profile]['chunkSize'], columnsNum), profile)
+		if windowIndexes:
+			self.windows = createDataset(self.hf, "windows", (0, 2), (cnst.windowsChunkSize, 2), profile, np.int64)
+			self.windows.attrs['windowSize'] = window
+			self.windows.attrs['windowStepSize'] = board.getWindowStep()
+		else:
+			self.windows = createDataset(self.hf, "packages", (0, window, columnsNum), (1, max(window, 1), columnsNum),
+			                             profile)
+		self.classIndex = createDataset(self.hf, "classIndex", (0, 3), (cnst.classIndexChunkSize, 3), profile, np.int64)
+		# the run of the last appended sample, still growing
+		self.classRun = None
+		self.hf.attrs['boardType'] = board.getBoardType()
+		self.hf.attrs['sampleRate'] = board.getSampleRate()
+		self.hf.attrs['channelsNum'] = board.getAvailableNbChannels()
+		self.windowBuffer = WindowBuffer(cnst.windowBufferSize, board.getSampleDtype())
+		self.windowBuffer.setWindow(window, board.getWindowStep())
+		self.lastFlush = time.monotonic()
+
+	def append(self, samples):
+		"""
+		Appends the given samples to "signal" and the windows they complete to "packages", or their indexes to
+		"windows".
+
+		:param numpy.ndarray samples: Array of samples with :meth:`source.boardState.BoardState.getSampleDtype`.
+		"""
+		if self.segmentRecorder is not None:
+			self.segmentRecorder.append(samples)
+		runs = classRuns(samples['class'], self.signal.shape[0])
+		if runs.shape[0]:
+			if self.classRun is not None and self.classRun[0] == runs[0, 0]:
+				runs[0, 1] = self.classRun[1]
+			elif self.classRun is not None:
+				appendRows(self.classIndex, self.classRun[np.newaxis])
+			appendRows(self.classIndex, runs[:-1])
+			self.classRun = runs[-1]
+		appendRows(self.signal, samplesToSignal(samples))
+		for ends in self.windowBuffer.push(samples):
+			windows = self.windowBuffer.getWindows(ends)
+			if self.windowIndexes:
+				# the buffer counts the samples from the first one of the file, as the "signal" rows
+				ends = ends[ends.shape[0] - windows.shape[0]:]
+				appendRows(self.windows, np.stack((ends - self.windowBuffer.window, ends), axis=1))
+			else:
+				appendRows(self.windows, samplesToSignal(windows))
+		if time.monotonic() - self.lastFlush > cnst.writeFlushInterval:
+			self.hf.flush()
+			self.lastFlush = time.monotonic()
+
+	def skip(self):
+		""" Informs the writer that samples were lost, so the next window starts with the next appended sample """
+		if self.segmentRecorder is not None:
+			self.segmentRecorder.skip()
+		self.windowBuffer.clear()
+
+	def close(self, boardSettings):
+		"""
+		Writes the "StreamSettings" dataset and the settings attributes, closes the file and deletes the segments kept
+		until then.
+
+		:param dict boardSettings: The board settings, as returned by :meth:`source.boardState.BoardState.getBoardSettings`.
+		"""
+		utf8_type = h5py.string_dtype('utf-8', 100)
+		self.hf.create_dataset("StreamSettings", data=np.array(list(boardSettings.items()), dtype=utf8_type))
+		settings = parseSettings(boardSettings)
+		settings['enabledChannels'] = np.array(settings['enabledChannels'], dtype=np.int64)
+		self.hf.attrs.update(settings)
+		if self.classRun is not None:
+			appendRows(self.classIndex, self.classRun[np.newaxis])
+		self.hf.close()
+		if self.segmentRecorder is not None:
+			self.segmentRecorder.close()
+
+
+def writing(board, sampleBus, writeDataEvent, _shutdownEvent, windowIndexes=cnst.storeWindowIndexes,
+            profile=cnst.storageProfile):
+	"""
+	* Runs simultaneously with the boardEventHandler process and reads the samples streamed from the sampleBus.
+	* When the training mode starts, creates an hdf5 file with name specified by dateTime, and appends the samples streamed in training mode into it, see :class:`SessionWriter`.
+	* Waits for the writeDataEvent, which is set only by the boardEventHandler once the last samples of the session are in the sampleBus, to close the file.
+	* The hdf5 file contains 3 datasets
 
 		1. The unfiltered and unprocessed data samples as read by the cyton board, named ”signal”.
-		2. The same data as “signal” but in this dataset the data are broken into windows, named “packages”.
+		2. The same data as “signal” but in this dataset the data are broken into windows, named “packages”. With windowIndexes, only the indexes of the windows in “signal”, named “windows”.
+		3. The board settings, named "StreamSettings".
 
-	:param OpenBCICyton board: Represents the OpenBCICyton object created from :py:class:`source.UIManager`.
-	:param Queue writeBuf: Buffer used for communicating and getting the transmitted data from :py:meth:`source.boardEventHandler.BoardEventHandler.startStreaming`.
-	:param Queue windowedData: Buffer used for communicating and getting the windowed Data data from :py:meth:`source.windowing.windowing`.
-	:param Event writeDataEvent: The event the method is waiting for, before proceeding to the next step (writing into the file). Sets only by :py:meth:`source.boardEventHandler.BoardEventHandler.stopStreaming`
+	:param BoardState board: The shared state of the OpenBCICyton object created from :py:class:`source.UIManager`, see :class:`source.boardState.BoardState`.
+	:param SampleBus sampleBus: Buffer used for getting the transmitted data from :py:meth:`source.boardEventHandler.BoardEventHandler.startStreaming`.
+	:param Event writeDataEvent: The event the method is waiting for, before closing the file. Sets only by :py:meth:`source.boardEventHandler.BoardEventHandler.startStreaming`, after the last samples are published
 	:param Event _shutdownEvent: Used as condition for the method to run.
+	:param bool windowIndexes: Store the indexes of the windows instead of their samples, see :class:`SessionWriter`.
+	:param str profile: The name of the storage profile of the session files, see :data:`utils.constants.Constants.storageProfiles`.
 
 	:return: None
 	"""
+	sessionWriter = None
+	lastSequence = None
 	while not _shutdownEvent.is_set():
-		writeDataEvent.wait(1)
+		# keep reading the bus while streaming, so no sample gets overwritten before written into the file
+		blocks = sampleBus.read(timeout=1)
+		if sessionWriter is None and (board.isTrainingMode() or writeDataEvent.is_set()):
+			sessionWriter = SessionWriter(getSessionFilename(training=board.isTrainingMode()), board, windowIndexes, profile)
+			printInfo('Start writing data into ' + sessionWriter.filename)
+		if sessionWriter is not None and blocks.size:
+			if lastSequence is not None and blocks['sequence'][0] != lastSequence + 1:
+				printWarning('%d blocks of samples lost' % (blocks['sequence'][0] - lastSequence - 1))
+				sessionWriter.skip()
+			sessionWriter.append(blockSamples(blocks))
+		if blocks.size:
+			lastSequence = blocks['sequence'][-1]
 		if writeDataEvent.is_set():
-			printInfo('Start writing data into file...')
-			signal = []
-			windowedSignal = []
-			filename = getSessionFilename(training=board.isTrainingMode())
-			hf = h5py.File(filename + '.hdf5', 'w')
-			printInfo('signal buffer size: ' + writeBuf.qsize().__str__())
-			while not writeBuf.qsize() == 0:
-				dt = writeBuf.get()
-				signal.append(dt)
-			signal = np.array(signal).astype(float)
-			hf.create_dataset("signal", data=signal)
-			printInfo("Finish with signal")
-			printInfo('windowData buffer size: ' + windowedData.qsize().__str__())
-			while not windowedData.qsize() == 0:
-				dt = windowedData.get()
-				windowedSignal.append(dt)
-			windowedSignal = np.array(windowedSignal).astype(float)
-			hf.create_dataset("packages", data=windowedSignal)
-			printInfo("Finish with windowed signal")
-			utf8_type = h5py.string_dtype('utf-8', 100)
-			boardSettings = np.array(list(board.getBoardSettings().items()), dtype=utf8_type)
-			hf.create_dataset("StreamSettings", data=boardSettings)
-			printInfo("Finish with settings")
-			hf.close()
+			# the blocks published up to the last one of the session, read before closing the file
+			blocks = sampleBus.read()
+			if blocks.size:
+				if lastSequence is not None and blocks['sequence'][0] != lastSequence + 1:
+					printWarning('%d blocks of samples lost' % (blocks['sequence'][0] - lastSequence - 1))
+					sessionWriter.skip()
+				sessionWriter.append(blockSamples(blocks))
+				lastSequence = blocks['sequence'][-1]
+			printInfo('signal size: ' + sessionWriter.signal.shape[0].__str__())
+			printInfo('windowed signal size: ' + sessionWriter.windows.shape[0].__str__())
+			sessionWriter.close(board.getBoardSettings())
+			printInfo('Data save in ' + sessionWriter.filename)
+			sessionWriter = None
 			writeDataEvent.clear()
-			printInfo('Data save in ' + filename)
-		if _shutdownEvent.is_set():
-			break
+	# keep the session written until the shutdown
+	if sessionWriter is not None:
+		sessionWriter.close(board.getBoardSettings())
+		printInfo('Data save in ' + sessionWriter.filename)
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(prog='writeToFile',
+	                                 description='Rebuilds the file of a session that was not closed, from its segments')
+	parser.add_argument('directory', help='The ".segments" directory of the session')
+	parser.add_argument('-o', '--output', help='The recovered file name without the extension', default=None)
+	args = parser.parse_args()
+	if not os.path.exists(os.path.join(args.directory, cnst.journalFilename)):
+		printError('No journal found in ' + args.directory)
+		sys.exit(1)
+	printInfo('Session recovered in ' + recoverSession(args.directory, args.output))
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the modules import each other from the repository's root, as when the application runs from it
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,134 @@
+import numpy as np
+import pytest
+from source.cyton import OpenBCICyton, OpenBCISample, find_packet_starts, decode_packets
+from utils.constants import Constants as cnst
+
+
+class FakeSerial:
+	"""
+	Serial port reading the given bytes, with at most the next of the given chunk sizes waiting at a time.
+	"""
+
+	def __init__(self, data, chunks=()):
+		self.data = data
+		self.position = 0
+		self.chunks = iter(chunks)
+
+	def read(self, n):
+		bb = self.data[self.position:self.position + n]
+		self.position += len(bb)
+		return bb
+
+	def inWaiting(self):
+		return min(next(self.chunks, 1), len(self.data) - self.position)
+
+	def write(self, b):
+		pass
+
+	def isOpen(self):
+		return False
+
+
+def makePackets(rng, packetsNum, firstId=0):
+	packets = rng.integers(0, 256, size=(packetsNum, cnst.RAW_PACKET_SIZE), dtype=np.uint8)
+	packets[:, cnst.RAW_PACKET_POSITION_START_BYTE] = cnst.RAW_BYTE_START
+	packets[:, cnst.RAW_PACKET_POSITION_SAMPLE_NUMBER] = (firstId + np.arange(packetsNum)) % 256
+	# the stop byte's low bits are the packet type
+	packets[:, cnst.RAW_PACKET_POSITION_STOP_BYTE] = cnst.RAW_BYTE_STOP | rng.integers(0, 16, size=packetsNum)
+	return packets
+
+
+def makeStream(rng, packets):
+	# junk bytes between some of the packets, without start bytes, as the baseline parser skips them one by one
+	stream = b''
+	for packet in packets:
+		if rng.random() < 0.2:
+			junk = rng.integers(0, 256, size=rng.integers(1, 40), dtype=np.uint8)
+			stream += junk[junk != cnst.RAW_BYTE_START].tobytes()
+		stream += packet.tobytes()
+	return stream
+
+
+def makeBoard(daisy=False, scaled_output=True):
+	board = OpenBCICyton(daisy=daisy, filter_data=False, scaled_output=scaled_output, log=False)
+	board.streaming = True
+	return board
+
+
+@pytest.mark.parametrize('scaled_output', [True, False])
+def test_decodePackets(scaled_output):
+	packets = makePackets(np.random.default_rng(0), 500)
+	board = makeBoard(scaled_output=scaled_output)
+	ids, channel_data, aux_data = decode_packets(packets, scaled_output)
+	assert np.array_equal(ids, packets[:, cnst.RAW_PACKET_POSITION_SAMPLE_NUMBER])
+	for packet, channels, aux in zip(packets, channel_data, aux_data):
+		assert channels.tolist() == board.get_channel_data_array(packet.tolist())
+		assert aux.tolist() == board.get_aux_data_array(packet.tolist())
+
+
+def test_findPacketStarts():
+	rng = np.random.default_rng(1)
+	packets = makePackets(rng, 300)
+	stream = np.frombuffer(makeStream(rng, packets), dtype=np.uint8)
+	starts = find_packet_starts(stream)
+	assert np.array_equal(stream[starts[:, np.newaxis] + np.arange(cnst.RAW_PACKET_SIZE)], packets)
+	# an incomplete packet is not found
+	assert np.array_equal(find_packet_starts(stream[:starts[-1] + cnst.RAW_PACKET_SIZE - 1]), starts[:-1])
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_readSamples(seed):
+	rng = np.random.default_rng(seed)
+	packets = makePackets(rng, 1000)
+	stream = makeStream(rng, packets)
+
+	# the baseline single sample parser
+	board = makeBoard()
+	board.ser = FakeSerial(stream)
+	samples = [board._read_sample() for _ in range(packets.shape[0])]
+
+	# the bulk parser, reading the bytes in chunks that cut the packets anywhere
+	bulkBoard = makeBoard()
+	bulkBoard.ser = FakeSerial(stream, rng.integers(1, 200, size=len(stream)))
+	blocks = []
+	while bulkBoard.ser.position < len(stream):
+		blocks.append(bulkBoard._read_samples())
+	ids, channel_data, aux_data = (np.concatenate(arrays) for arrays in zip(*blocks))
+
+	assert ids.tolist() == [sample.id for sample in samples]
+	assert channel_data.tolist() == [sample.channel_data for sample in samples]
+	assert aux_data.tolist() == [sample.aux_data for sample in samples]
+
+
+def test_readSamplesStalled():
+	board = makeBoard()
+	board.ser = FakeSerial(b'')
+	with pytest.raises(TimeoutError):
+		board._read_samples()
+
+
+def test_mergeDaisyPackets():
+	rng = np.random.default_rng(3)
+	# some of the halves are lost
+	packets = makePackets(rng, 2000, firstId=1)
+	packets = packets[rng.random(packets.shape[0]) > 0.05]
+	ids, channel_data, aux_data = decode_packets(packets)
+
+	# the baseline, one packet at a time
+	board = makeBoard(daisy=True)
+	packetSamples = iter([OpenBCISample(int(packet_id), channels.tolist(), aux.tolist())
+	                      for packet_id, channels, aux in zip(ids, channel_data, aux_data)])
+	board._read_sample = lambda: next(packetSamples)
+	samples = [sample for sample in (board.stream_one_sample() for _ in range(ids.shape[0])) if sample is not None]
+
+	# in blocks that may split a sample's halves
+	bulkBoard = makeBoard(daisy=True)
+	cuts = np.cumsum(rng.integers(1, 50, size=ids.shape[0]))
+	cuts = cuts[cuts < ids.shape[0]]
+	blocks = [bulkBoard._merge_daisy_packets(*block) for block in
+	          zip(np.split(ids, cuts), np.split(channel_data, cuts), np.split(aux_data, cuts))]
+	mergedIds, mergedChannels, mergedAux = (np.concatenate(arrays) for arrays in zip(*blocks))
+
+	assert mergedIds.tolist() == [sample.id for sample in samples]
+	assert mergedChannels.tolist() == [sample.channel_data for sample in samples]
+	assert np.allclose(mergedAux, [sample.aux_data for sample in samples])
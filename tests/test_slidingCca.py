@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+from classification.slidingCca import SlidingCCA
+from classification.train_processing_cca_3 import cca, create_reference_signals, get_stimulus_freqs
+from utils.constants import Constants as cnst
+
+fs = cnst.SAMPLE_RATE_250
+
+
+def ccaCorrelations(window):
+	""" The correlations of the baseline, the references built and decomposed for the window """
+	return np.array([[cca(window, create_reference_signals(stimulusFreq, cnst.harmonics_num, window.shape[0], fs))[0]
+	                  for stimulusFreq in get_stimulus_freqs(cnst.frames_ch)]])
+
+
+def makeStream(samplesNum, channelsNum=8):
+	rng = np.random.default_rng(0)
+	times = np.arange(samplesNum) / fs
+	# the first stimulus frequency on every channel, with a different phase, and noise
+	signal = np.sin(2 * np.pi * get_stimulus_freqs(cnst.frames_ch)[0] * times[:, np.newaxis] +
+	                rng.uniform(0, 2 * np.pi, size=channelsNum))
+	return signal + rng.normal(size=(samplesNum, channelsNum)), times
+
+
+def cutWindows(stream, timestamps, settings):
+	""" Yields the windows of every (first window end, window size, step, windows number) setting """
+	for end, window, step, windowsNum in settings:
+		for windowInd in range(windowsNum):
+			windowEnd = end + windowInd * step
+			yield stream[windowEnd - window:windowEnd], timestamps[windowEnd - window:windowEnd]
+
+
+def assertSameCorrelations(slidingCca, stream, timestamps, settings):
+	windowsNum = 0
+	for window, windowTimestamps in cutWindows(stream, timestamps, settings):
+		assert np.allclose(slidingCca.update(window, windowTimestamps), ccaCorrelations(window), atol=1e-8)
+		windowsNum += 1
+	assert windowsNum == sum(setting[3] for setting in settings)
+
+
+def test_consecutiveWindows():
+	stream, timestamps = makeStream(5000)
+	slidingCca = SlidingCCA(fs)
+	assertSameCorrelations(slidingCca, stream, timestamps, [(250, 250, 25, 150)])
+	# every window after the first one was updated, not calculated from the whole window
+	assert slidingCca.steps == 149
+
+
+@pytest.mark.parametrize('refreshSteps', [1, 7, 600])
+def test_gapsAndSettingsChanges(refreshSteps):
+	stream, timestamps = makeStream(10000)
+	assertSameCorrelations(SlidingCCA(fs, refreshSteps=refreshSteps), stream, timestamps, [
+		(250, 250, 25, 40),
+		# samples lost, the windows start over
+		(1500, 250, 25, 20),
+		# longer windows, sharing the samples of the last one
+		(2000, 500, 25, 20),
+		# a longer step, then shorter windows
+		(2500, 500, 125, 10),
+		(3750, 125, 50, 20),
+		# the step equal to the window, no overlap
+		(5000, 250, 250, 10),
+		# a step longer than the window, samples skipped
+		(7750, 250, 300, 5),
+	])
+
+
+def test_flatChannel():
+	stream, timestamps = makeStream(3000)
+	stream[:, 2] = 0
+	assertSameCorrelations(SlidingCCA(fs), stream, timestamps, [(250, 250, 25, 40)])
+
+
+def test_reset():
+	stream, timestamps = makeStream(3000)
+	slidingCca = SlidingCCA(fs)
+	assertSameCorrelations(slidingCca, stream, timestamps, [(250, 250, 25, 20)])
+	slidingCca.reset()
+	# the same samples again, as a new stream
+	assertSameCorrelations(slidingCca, stream, timestamps, [(250, 250, 25, 20)])
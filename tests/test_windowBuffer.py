@@ -0,0 +1,103 @@
+import numpy as np
+from utils.windowBuffer import WindowBuffer
+
+sampleDtype = np.dtype([('id', np.int64), ('channel_data', np.float64, 2)])
+
+
+def listWindows(stream, settings):
+	"""
+	The windows of the baseline windowing, a list of samples cut every time it holds a window and trimmed by the step,
+	with the window and step read again before every block of samples, as the windowing process does.
+	"""
+	windows = []
+	currentWindowList = []
+	for block, (window, step) in zip(stream, settings):
+		for sample in block:
+			currentWindowList.append(sample)
+			while len(currentWindowList) >= window:
+				windows.append(np.array(currentWindowList[:window]))
+				del currentWindowList[0:step]
+	return windows
+
+
+def bufferWindows(windowBuffer, stream, settings, lengths=()):
+	windows = []
+	otherWindows = {length: [] for length in lengths}
+	for block, (window, step) in zip(stream, settings):
+		if (window, step) != (windowBuffer.window, windowBuffer.step):
+			windowBuffer.setWindow(window, step, lengths)
+		for ends in windowBuffer.push(block):
+			# the windows are views, valid until the next iteration
+			windows += list(np.copy(windowBuffer.getWindows(ends)))
+			for length in lengths:
+				otherWindows[length].append((ends, np.copy(windowBuffer.getWindows(ends, length))))
+	return windows, otherWindows
+
+
+def makeStream(rng, samplesNum, maxBlock):
+	samples = np.zeros(samplesNum, dtype=sampleDtype)
+	samples['id'] = np.arange(samplesNum)
+	samples['channel_data'] = rng.normal(size=(samplesNum, 2))
+	cuts = np.cumsum(rng.integers(1, maxBlock, size=samplesNum))
+	return samples, np.split(samples, cuts[cuts < samplesNum])
+
+
+def assertSameWindows(windows, expected):
+	assert len(windows) == len(expected)
+	for window, expectedWindow in zip(windows, expected):
+		assert np.array_equal(window, expectedWindow)
+
+
+def test_fixedWindow():
+	_, stream = makeStream(np.random.default_rng(0), 5000, 40)
+	settings = [(250, 25)] * len(stream)
+	windows, _ = bufferWindows(WindowBuffer(300, sampleDtype), stream, settings)
+	assertSameWindows(windows, listWindows(stream, settings))
+
+
+def test_blocksLongerThanBuffer():
+	# a block larger than the buffer completes several windows, written in parts
+	_, stream = makeStream(np.random.default_rng(1), 5000, 1200)
+	settings = [(125, 50)] * len(stream)
+	windows, _ = bufferWindows(WindowBuffer(250, sampleDtype), stream, settings)
+	assertSameWindows(windows, listWindows(stream, settings))
+
+
+def test_setWindowWhileStreaming():
+	rng = np.random.default_rng(2)
+	_, stream = makeStream(rng, 20000, 60)
+	choices = [(250, 25), (250, 125), (500, 50), (125, 25), (375, 250), (250, 250)]
+	# the settings change every few blocks, the buffer grows for the longest windows
+	settings = [choices[i] for i in np.repeat(rng.integers(len(choices), size=len(stream) // 10 + 1), 10)]
+	windows, _ = bufferWindows(WindowBuffer(100, sampleDtype), stream, settings)
+	assertSameWindows(windows, listWindows(stream, settings))
+
+
+def test_otherLengths():
+	samples, stream = makeStream(np.random.default_rng(3), 5000, 40)
+	settings = [(250, 25)] * len(stream)
+	lengths = (125, 500)
+	_, otherWindows = bufferWindows(WindowBuffer(300, sampleDtype), stream, settings, lengths)
+	for length in lengths:
+		windowsNum = 0
+		for ends, windows in otherWindows[length]:
+			# the windows starting before the first sample are left out
+			ends = ends[ends >= length]
+			assert windows.shape == (ends.shape[0], length)
+			for end, window in zip(ends, windows):
+				assert np.array_equal(window, samples[end - length:end])
+			windowsNum += windows.shape[0]
+		assert windowsNum == np.count_nonzero(np.arange(250, 5001, 25) >= length)
+
+
+def test_clear():
+	_, stream = makeStream(np.random.default_rng(4), 3000, 40)
+	windowBuffer = WindowBuffer(300, sampleDtype)
+	windowBuffer.setWindow(250, 25)
+	half = len(stream) // 2
+	first, _ = bufferWindows(windowBuffer, stream[:half], [(250, 25)] * half)
+	windowBuffer.clear()
+	second, _ = bufferWindows(windowBuffer, stream[half:], [(250, 25)] * (len(stream) - half))
+	# the windows start over with the first sample after clear
+	assertSameWindows(first, listWindows(stream[:half], [(250, 25)] * half))
+	assertSameWindows(second, listWindows(stream[half:], [(250, 25)] * (len(stream) - half)))
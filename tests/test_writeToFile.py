@@ -0,0 +1,123 @@
+import os
+import h5py
+import numpy as np
+import pytest
+from source.boardState import BoardState
+from source.writeToFile import SessionWriter, recoverSession
+from utils.constants import Constants as cnst
+
+
+def makeBoard():
+	board = BoardState(cnst.BOARD_CYTON, cnst.NUMBER_OF_CHANNELS_CYTON, cnst.SAMPLE_RATE_250,
+	                   cnst.RAW_PACKET_ACCEL_NUMBER_AXIS)
+	board.setWindowSize(1)
+	board.setWindowStepSize(0.2)
+	return board
+
+
+def makeSamples(board, samplesNum):
+	rng = np.random.default_rng(0)
+	samples = np.zeros(samplesNum, dtype=board.getSampleDtype())
+	samples['id'] = np.arange(samplesNum) % 256
+	samples['channel_data'] = rng.normal(size=samples['channel_data'].shape)
+	samples['class'] = np.repeat(rng.integers(0, 5, size=samplesNum // 500 + 1), 500)[:samplesNum]
+	samples['groundTruthClass'] = samples['class']
+	samples['timestamp'] = np.arange(samplesNum) / board.getSampleRate()
+	return samples
+
+
+def writeSession(sessionWriter, samples, skips):
+	""" Appends the samples in blocks, the samples before every skip lost """
+	blocks = np.split(samples, np.arange(0, samples.shape[0], 37)[1:])
+	for block, start in zip(blocks, range(0, samples.shape[0], 37)):
+		for skip in skips:
+			if start <= skip < start + block.shape[0]:
+				sessionWriter.append(block[:skip - start])
+				sessionWriter.skip()
+				block, start = block[skip - start:], skip
+		sessionWriter.append(block)
+
+
+def assertSameSessions(filename, expectedFilename):
+	with h5py.File(filename, 'r') as hf, h5py.File(expectedFilename, 'r') as expected:
+		assert set(hf.keys()) == set(expected.keys())
+		for name in expected.keys():
+			assert np.array_equal(hf[name][()], expected[name][()]), name
+		assert set(hf.attrs.keys()) == set(expected.attrs.keys())
+		for name, value in expected.attrs.items():
+			assert np.array_equal(hf.attrs[name], value), name
+
+
+def crash(sessionWriter):
+	""" Leaves the session as the application dying would, the file not closed and the segments kept """
+	sessionWriter.hf.close()
+	recorder = sessionWriter.segmentRecorder
+	if recorder.segment is not None:
+		recorder.segment.close()
+	recorder.journal.close()
+	return recorder.directory
+
+
+@pytest.fixture
+def segmentSize(monkeypatch):
+	monkeypatch.setattr(cnst, 'segmentSize', 1000)
+	return 1000
+
+
+@pytest.mark.parametrize('windowIndexes', [False, True])
+@pytest.mark.parametrize('skips', [[], [1234, 2900]])
+def test_recoverSession(tmp_path, segmentSize, windowIndexes, skips):
+	board = makeBoard()
+	samples = makeSamples(board, 3500)
+
+	expectedWriter = SessionWriter(str(tmp_path / 'expected'), board, windowIndexes, cnst.storageProfile,
+	                               segments=False)
+	writeSession(expectedWriter, samples, skips)
+	expectedWriter.close(board.getBoardSettings())
+
+	sessionWriter = SessionWriter(str(tmp_path / 'session'), board, windowIndexes, cnst.storageProfile)
+	writeSession(sessionWriter, samples, skips)
+	directory = crash(sessionWriter)
+	# the last segment is still open, the others are in the journal
+	assert len(os.listdir(directory)) == 1 + int(np.ceil(samples.shape[0] / segmentSize))
+
+	filename = recoverSession(directory, str(tmp_path / 'recovered'))
+	assert filename == str(tmp_path / 'recovered') + '.hdf5'
+	assertSameSessions(filename, expectedWriter.filename)
+
+
+def test_recoverSessionCutRecord(tmp_path, segmentSize):
+	board = makeBoard()
+	samples = makeSamples(board, 3500)
+
+	expectedWriter = SessionWriter(str(tmp_path / 'expected'), board, False, cnst.storageProfile, segments=False)
+	writeSession(expectedWriter, samples[:-1], [])
+	expectedWriter.close(board.getBoardSettings())
+
+	sessionWriter = SessionWriter(str(tmp_path / 'session'), board, False, cnst.storageProfile)
+	writeSession(sessionWriter, samples[:-1], [])
+	# the crash cuts the last record, and leaves files the segments are not
+	sessionWriter.segmentRecorder.segment.write(samples[-1:].tobytes()[:samples.dtype.itemsize // 2])
+	directory = crash(sessionWriter)
+	open(os.path.join(directory, '.DS_Store'), 'w').close()
+	with open(os.path.join(directory, cnst.segmentFilename % 1 + '~'), 'wb') as backup:
+		backup.write(samples[:10].tobytes())
+
+	assertSameSessions(recoverSession(directory, str(tmp_path / 'recovered')), expectedWriter.filename)
+
+
+def test_recoverSessionFullSegments(tmp_path, segmentSize):
+	# the crash after the last segment was closed, no segment left open
+	board = makeBoard()
+	samples = makeSamples(board, 3 * segmentSize)
+
+	expectedWriter = SessionWriter(str(tmp_path / 'expected'), board, False, cnst.storageProfile, segments=False)
+	writeSession(expectedWriter, samples, [])
+	expectedWriter.close(board.getBoardSettings())
+
+	sessionWriter = SessionWriter(str(tmp_path / 'session'), board, False, cnst.storageProfile)
+	writeSession(sessionWriter, samples, [])
+	sessionWriter.segmentRecorder.closeSegment()
+	directory = crash(sessionWriter)
+
+	assertSameSessions(recoverSession(directory, str(tmp_path / 'recovered')), expectedWriter.filename)
@@ -0,0 +1,411 @@
+import argparse
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing import Event, Process, Queue
+from multiprocessing.managers import SyncManager
+
+import h5py
+import numpy as np
+
+sys.path.append('..')
+from utils import filters
+from utils.constants import Constants as cnst
+from utils.coloringPrint import printHeader, printInfo
+from utils.sampleBus import SampleBus, sampleBlockDtype, blockSamples
+from utils.sessionFile import createDataset, readWindows
+from utils.windowBuffer import WindowBuffer
+
+
+class LoopbackSerial:
+	"""
+	Stand-in for the board's serial port, used to benchmark without a board.
+	Always has the next packets of an endless synthetic stream waiting, so the readers run as fast as they can.
+
+	:param int packetsWaiting: The number of packets reported by :meth:`inWaiting`.
+	"""
+
+	def __init__(self, packetsWaiting=50):
+		self.packetsWaiting = packetsWaiting
+		packets = np.random.randint(0, 0x80, (256, cnst.RAW_PACKET_SIZE), dtype=np.uint8)
+		packets[:, cnst.RAW_PACKET_POSITION_START_BYTE] = cnst.RAW_BYTE_START
+		packets[:, cnst.RAW_PACKET_POSITION_SAMPLE_NUMBER] = np.arange(256)
+		packets[:, cnst.RAW_PACKET_POSITION_STOP_BYTE] = cnst.RAW_BYTE_STOP
+		self.stream = packets.tobytes()
+		self.offset = 0
+
+	def inWaiting(self):
+		return self.packetsWaiting * cnst.RAW_PACKET_SIZE
+
+	def read(self, n=1):
+		bb = bytearray()
+		while len(bb) < n:
+			chunk = self.stream[self.offset:self.offset + n - len(bb)]
+			bb += chunk
+			self.offset = (self.offset + len(chunk)) % len(self.stream)
+		return bytes(bb)
+
+	def write(self, b):
+		pass
+
+	def isOpen(self):
+		return True
+
+	def close(self):
+		pass
+
+
+def createLoopbackBoard():
+	"""
+	Returns an :class:`source.cyton.OpenBCICyton` board, connected and synched, reading from a :class:`LoopbackSerial`
+	"""
+	from source.cyton import OpenBCICyton
+	board = OpenBCICyton(log=False, lowerBoundFrequency=4, higherBoundFrequency=40, enabledChannels=[])
+	board.ser = LoopbackSerial()
+	board.connected = True
+	board.setSynching(True)
+	return board
+
+
+def proxiedStreaming(seconds, readersNum):
+	"""
+	The streaming loop of :meth:`source.boardEventHandler.BoardEventHandler.startStreaming` as it was when the board
+	lived in a SyncManager process: one sample and three proxy calls at a time, put into one manager queue per reader.
+
+	:return: (int) The number of samples put in the buffers.
+	"""
+	SyncManager.register('OpenBCICyton', createLoopbackBoard)
+	manager = SyncManager()
+	manager.start()
+	dataBuffersList = [manager.Queue() for _ in range(readersNum)]
+	board = manager.OpenBCICyton()
+	numOfSamples = 0
+	stopTime = time.perf_counter() + seconds
+	while time.perf_counter() < stopTime:
+		sample = board.stream_one_sample()
+		if board.isSynched():
+			if board.isTrainingMode():
+				sample.channel_data.append(cnst.unknownClass)
+			for buffer in dataBuffersList:
+				buffer.put_nowait(sample.channel_data)
+			numOfSamples += 1
+	board.stopStreaming()
+	manager.shutdown()
+	return numOfSamples
+
+
+def countBusSamples(sampleBus, stopEvent, counts):
+	""" Reads the sampleBus until the stopEvent is set and appends the number of read samples into counts """
+	numOfSamples = 0
+	while not stopEvent.is_set():
+		numOfSamples += blockSamples(sampleBus.read(timeout=0.1)).size
+	counts.put(numOfSamples + blockSamples(sampleBus.read()).size)
+
+
+def handlerStreaming(seconds, readersNum, blockSize=cnst.sampleBlockSize):
+	"""
+	Runs :meth:`source.boardEventHandler.BoardEventHandler.startStreaming` on a board owned by the calling process,
+	with one process per reader reading the :class:`utils.sampleBus.SampleBus` in blocks of blockSize samples.
+
+	:return: (int) The number of samples read by the slowest reader.
+	"""
+	from source.boardEventHandler import BoardEventHandler
+	board = createLoopbackBoard()
+	sampleBus = SampleBus(cnst.sampleBusSize // blockSize, sampleBlockDtype(board.getSampleDtype(), blockSize))
+	shutdownEvent = Event()
+	stopReadersEvent = Event()
+	counts = Queue()
+	readers = [Process(target=countBusSamples, args=(sampleBus, stopReadersEvent, counts)) for _ in range(readersNum)]
+	for reader in readers:
+		reader.start()
+	handler = BoardEventHandler(board, {}, sampleBus, Event(), queue.Queue(maxsize=1), queue.Queue(maxsize=1),
+	                            queue.Queue(), shutdownEvent)
+	streamingThread = threading.Thread(target=handler.startStreaming)
+	streamingThread.start()
+	handler.startStreamingEvent.set()
+	time.sleep(seconds)
+	handler.startStreamingEvent.clear()
+	board.stopStreaming()
+	shutdownEvent.set()
+	streamingThread.join()
+	stopReadersEvent.set()
+	numOfSamples = min(counts.get() for _ in readers)
+	for reader in readers:
+		reader.join()
+	return numOfSamples
+
+
+def handlerBenchmark(seconds, readersNum, blockSizes):
+	"""
+	Prints the samples per second the streaming loop sustains, with the board behind a SyncManager proxy feeding one
+	manager queue per reader, and with the board owned by the handler process, see
+	:class:`source.boardState.BoardState`, writing once into a :class:`utils.sampleBus.SampleBus` for each of the
+	given block sizes.
+	"""
+	printHeader('Streaming loop throughput, ' + seconds.__str__() + ' seconds each, ' + readersNum.__str__() +
+	            ' readers')
+	proxiedRate = proxiedStreaming(seconds, readersNum) / seconds
+	printInfo('%-30s %10.1f samples/s' % ('proxied board', proxiedRate))
+	for blockSize in blockSizes:
+		rate = handlerStreaming(seconds, readersNum, blockSize) / seconds
+		printInfo('%-30s %10.1f samples/s, speedup %.1fx' % ('handler-owned board, K=' + blockSize.__str__(), rate,
+		                                                     rate / proxiedRate))
+
+
+def copiedWindows(blocks, window, step):
+	"""
+	The windowing loop of :func:`source.windowing.windowing` as it was before the
+	:class:`utils.windowBuffer.WindowBuffer`: the samples are appended to the current window and every window is copied.
+
+	:return: (int) The number of created windows.
+	"""
+	windowsNum = 0
+	currentWindow = blocks[0][:0]
+	for samples in blocks:
+		currentWindow = np.concatenate((currentWindow, samples))
+		while window <= currentWindow.shape[0]:
+			np.copy(currentWindow[:window])
+			windowsNum += 1
+			currentWindow = currentWindow[step:]
+	return windowsNum
+
+
+def bufferedWindows(blocks, window, step):
+	"""
+	The windowing loop of :func:`source.windowing.windowing`, cutting the windows from a
+	:class:`utils.windowBuffer.WindowBuffer`.
+
+	:return: (int) The number of created windows.
+	"""
+	windowBuffer = WindowBuffer(cnst.windowBufferSize, blocks[0].dtype)
+	windowBuffer.setWindow(window, step)
+	for samples in blocks:
+		for ends in windowBuffer.push(samples):
+			windowBuffer.getWindows(ends)
+	return windowBuffer.windowsNum
+
+
+def windowingBenchmark(seconds, windowSize, windowStepSize, blockSize):
+	"""
+	Prints the time spent cutting the given seconds of streamed samples in windows, arriving in blocks of blockSize
+	samples, with and without the :class:`utils.windowBuffer.WindowBuffer`.
+	"""
+	board = createLoopbackBoard()
+	window = int(board.getSampleRate() * windowSize)
+	step = int(board.getSampleRate() * windowStepSize)
+	blocks = [np.zeros(blockSize, dtype=board.getSampleDtype())
+	          for _ in range(int(seconds * board.getSampleRate()) // blockSize)]
+	printHeader('Windowing ' + seconds.__str__() + ' seconds of streaming, ' + windowSize.__str__() + ' s windows, ' +
+	            windowStepSize.__str__() + ' s steps, K=' + blockSize.__str__())
+	for name, loop in (('copied windows', copiedWindows), ('window buffer', bufferedWindows)):
+		startTime = time.perf_counter()
+		windowsNum = loop(blocks, window, step)
+		elapsed = time.perf_counter() - startTime
+		printInfo('%-30s %10.3f s, %d windows, %8.1f us/window' % (name, elapsed, windowsNum,
+		                                                            elapsed / windowsNum * 1e6))
+
+
+def storageBenchmark(filename, profiles, blockSize):
+	"""
+	Prints the file size, the write time and the read time of the "signal" and "packages" datasets of the given
+	recorded session, written with each of the given storage profiles, see
+	:data:`utils.constants.Constants.storageProfiles`. The samples are written in blocks of blockSize samples and the
+	windows one at a time, as while streaming.
+	"""
+	with h5py.File(filename, 'r') as fl:
+		signal = fl['signal'][:]
+		packages = np.asarray(readWindows(fl))
+	printHeader('Storage of ' + os.path.basename(filename) + ', ' + signal.shape[0].__str__() + ' samples, ' +
+	            packages.shape[0].__str__() + ' windows')
+	printInfo('%-10s %10s %12s %12s %12s %12s' % ('profile', 'size MB', 'write sig s', 'write pkg s', 'read sig s',
+	                                            'read pkg s'))
+	for profile in profiles:
+		with tempfile.TemporaryDirectory() as directory:
+			profileFilename = os.path.join(directory, profile + '.hdf5')
+			with h5py.File(profileFilename, 'w') as hf:
+				startTime = time.perf_counter()
+				dataset = createDataset(hf, 'signal', (0, signal.shape[1]),
+				                        (cnst.storageProfiles[profile]['chunkSize'], signal.shape[1]), profile)
+				for start in range(0, signal.shape[0], blockSize):
+					block = signal[start:start + blockSize]
+					dataset.resize(dataset.shape[0] + block.shape[0], axis=0)
+					dataset[-block.shape[0]:] = block
+				signalWriteTime = time.perf_counter() - startTime
+				startTime = time.perf_counter()
+				dataset = createDataset(hf, 'packages', (0,) + packages.shape[1:], (1,) + packages.shape[1:], profile)
+				for window in packages:
+					dataset.resize(dataset.shape[0] + 1, axis=0)
+					dataset[-1] = window
+				packagesWriteTime = time.perf_counter() - startTime
+			size = os.path.getsize(profileFilename)
+			with h5py.File(profileFilename, 'r') as fl:
+				startTime = time.perf_counter()
+				fl['signal'][:]
+				signalReadTime = time.perf_counter() - startTime
+				startTime = time.perf_counter()
+				fl['packages'][:]
+				packagesReadTime = time.perf_counter() - startTime
+		printInfo('%-10s %10.1f %12.3f %12.3f %12.3f %12.3f' % (profile, size / 1e6, signalWriteTime, packagesWriteTime,
+		                                                        signalReadTime, packagesReadTime))
+
+
+def filteringBenchmark(windowsNum, windowSize, channelsNum, order):
+	"""
+	Prints the time spent band-pass filtering the given number of windows one at a time, as while streaming, with the
+	filter designed for every window and with the designs kept by :func:`utils.filters.designFilter`, and all of them
+	at once with :func:`utils.filters.filterWindows`. The filters designed one window at a time are counted as the
+	misses of the design cache, before it is cleared.
+	"""
+	sampleRate = cnst.SAMPLE_RATE_250
+	windows = np.random.default_rng(0).normal(size=(windowsNum, int(windowSize * sampleRate), channelsNum))
+	printHeader('Filtering ' + windowsNum.__str__() + ' windows of ' + windowSize.__str__() + ' s, ' +
+	            channelsNum.__str__() + ' channels, order ' + order.__str__())
+	for name, cached in (('designed every window', False), ('cached design', True)):
+		filters.clearFilterCache()
+		designsNum = 0
+		startTime = time.perf_counter()
+		for window in windows:
+			if not cached:
+				# clearing the cache resets its statistics too
+				designsNum += filters.filterCacheInfo().misses
+				filters.clearFilterCache()
+			filters.butter_bandpass_filter(window, 4, 40, sampleRate, order=order)
+		elapsed = time.perf_counter() - startTime
+		designsNum += filters.filterCacheInfo().misses
+		printInfo('%-30s %10.3f s, %8.1f us/window, %d filter designs' % (name, elapsed, elapsed / windowsNum * 1e6,
+		                                                                  designsNum))
+	startTime = time.perf_counter()
+	filters.filterWindows(windows, sampleRate, 4, 40, noiseCancellation=False, order=order)
+	elapsed = time.perf_counter() - startTime
+	printInfo('%-30s %10.3f s, %8.1f us/window' % ('batched windows', elapsed, elapsed / windowsNum * 1e6))
+
+
+def ccaBenchmark(windowsNum, windowSize, channelsNum, windowStepSize):
+	"""
+	Prints the time spent calculating the cca correlations of the given number of windows one at a time, as while
+	streaming, with the reference signals built and decomposed for every window and with the reference bank of
+	:func:`classification.train_processing_cca_3.get_reference_bank`, and all of them at once, as while training, with
+	:func:`classification.train_processing_cca_3.calculate_cca_correlations_batch`. The filter bank cca, sub-band
+	filters included, is timed the same ways and its slowest window is compared with the window step, the time an
+	online prediction has. The prediction of a :class:`classification.trca.TRCAClassifier`, trained on the same windows,
+	is timed one window at a time too. Last, the windows are cut from one stream every window step, as while streaming,
+	and the correlations calculated from every whole window are compared with the ones updated with the samples of
+	every step by :class:`classification.slidingCca.SlidingCCA`.
+	"""
+	from classification import train_processing_cca_3 as cca
+	from classification.slidingCca import SlidingCCA
+	from classification.trca import TRCAClassifier
+
+	sampleRate = cnst.SAMPLE_RATE_250
+	windows = np.random.default_rng(0).normal(size=(windowsNum, int(windowSize * sampleRate), channelsNum))
+	stimulusFreqs = cca.get_stimulus_freqs(cnst.frames_ch)
+
+	def referencesPerWindow(window):
+		return [cca.cca(window, cca.create_reference_signals(stimulusFreq, cnst.harmonics_num, window.shape[0],
+		                                                     sampleRate))[0] for stimulusFreq in stimulusFreqs]
+
+	def referenceBank(window):
+		return cca.calculate_cca_correlations(window, sampleRate, cnst.frames_ch, cnst.harmonics_num)
+
+	def filterBank(window):
+		return cca.calculate_fbcca_correlations(window, sampleRate, cnst.frames_ch, cnst.harmonics_num)
+
+	classifier = TRCAClassifier(cnst.frames_ch, sampleRate)
+	classifier.fit(windows, np.resize(cnst.trainingClasses, windowsNum))
+
+	def trca(window):
+		return classifier.predict(window[np.newaxis])
+
+	printHeader('CCA of ' + windowsNum.__str__() + ' windows of ' + windowSize.__str__() + ' s, ' +
+	            channelsNum.__str__() + ' channels, ' + stimulusFreqs.shape[0].__str__() + ' targets, ' +
+	            len(cnst.fbccaBands).__str__() + ' filter bank cca sub-bands')
+	slowestWindow = 0
+	for name, correlations in (('references every window', referencesPerWindow), ('reference bank', referenceBank),
+	                           ('filter bank cca', filterBank), ('trca prediction', trca)):
+		windowTimes = np.zeros(windowsNum)
+		for windowInd, window in enumerate(windows):
+			startTime = time.perf_counter()
+			correlations(window)
+			windowTimes[windowInd] = time.perf_counter() - startTime
+		if correlations is filterBank:
+			slowestWindow = windowTimes.max()
+		printInfo('%-30s %10.3f s, %8.1f us/window, slowest %8.1f us' %
+		          (name, windowTimes.sum(), windowTimes.mean() * 1e6, windowTimes.max() * 1e6))
+	for name, correlations in (('batched', cca.calculate_cca_correlations_batch),
+	                           ('filter bank cca batched', cca.calculate_fbcca_correlations_batch)):
+		startTime = time.perf_counter()
+		correlations(windows, sampleRate, cnst.frames_ch, cnst.harmonics_num)
+		elapsed = time.perf_counter() - startTime
+		printInfo('%-30s %10.3f s, %8.1f us/window' % (name, elapsed, elapsed / windowsNum * 1e6))
+	budget = 'within' if slowestWindow < windowStepSize else 'OVER'
+	printInfo('slowest filter bank cca window %.1f ms, %s the %.1f ms window step' %
+	          (slowestWindow * 1e3, budget, windowStepSize * 1e3))
+
+	step = max(int(windowStepSize * sampleRate), 1)
+	stream = np.random.default_rng(0).normal(size=(windows.shape[1] + (windowsNum - 1) * step, channelsNum))
+	timestamps = np.arange(stream.shape[0]) / sampleRate
+	starts = np.arange(windowsNum) * step
+	slidingCca = SlidingCCA(sampleRate, cnst.frames_ch, cnst.harmonics_num)
+	printHeader('CCA of ' + windowsNum.__str__() + ' windows of a stream, every ' + step.__str__() + ' samples')
+	for name, correlations in (
+			('whole window', lambda start: referenceBank(stream[start:start + windows.shape[1]])),
+			('sliding', lambda start: slidingCca.update(stream[start:start + windows.shape[1]],
+			                                            timestamps[start:start + windows.shape[1]]))):
+		startTime = time.perf_counter()
+		correlationsList = [correlations(start) for start in starts]
+		elapsed = time.perf_counter() - startTime
+		printInfo('%-30s %10.3f s, %8.1f us/window' % (name, elapsed, elapsed / windowsNum * 1e6))
+	printInfo('largest difference of the sliding correlations %.2e' %
+	          np.abs(np.concatenate(correlationsList) -
+	                 np.concatenate([referenceBank(stream[start:start + windows.shape[1]]) for start in starts])).max())
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(prog='benchmarks', description='Performance benchmarks of the acquisition pipeline')
+	subparsers = parser.add_subparsers(dest='benchmark', required=True)
+	handlerParser = subparsers.add_parser('handler', help='Samples per second sustained by the board event handler')
+	handlerParser.add_argument('-s', '--seconds', type=float, default=5, help='Duration of each run')
+	handlerParser.add_argument('-r', '--readers', type=int, default=4, help='Number of processes reading the samples')
+	handlerParser.add_argument('-bs', '--blockSizes', type=int, nargs='+', default=[1, cnst.sampleBlockSize,
+	                                                                                 cnst.maxSampleBlockSize],
+	                           help='Numbers of samples published at once')
+	windowingParser = subparsers.add_parser('windowing', help='Time spent cutting the streamed samples in windows')
+	windowingParser.add_argument('-s', '--seconds', type=float, default=600, help='Duration of the streaming')
+	windowingParser.add_argument('-w', '--windowSize', type=float, default=cnst.initWindowSizeValue,
+	                             help='Window size in seconds')
+	windowingParser.add_argument('-st', '--windowStepSize', type=float, default=cnst.initStepSizeValue,
+	                             help='Window step in seconds')
+	windowingParser.add_argument('-bs', '--blockSize', type=int, default=cnst.sampleBlockSize,
+	                             help='Number of samples published at once')
+	storageParser = subparsers.add_parser('storage', help='Size, write and read time of a session per storage profile')
+	storageParser.add_argument('filename', help='A recorded session file')
+	storageParser.add_argument('-p', '--profiles', nargs='+', choices=tuple(cnst.storageProfiles),
+	                           default=list(cnst.storageProfiles), help='The storage profiles to compare')
+	storageParser.add_argument('-bs', '--blockSize', type=int, default=cnst.sampleBlockSize,
+	                           help='Number of samples written at once')
+	filteringParser = subparsers.add_parser('filtering', help='Time spent filtering the windows')
+	filteringParser.add_argument('-n', '--windowsNum', type=int, default=1000, help='Number of windows')
+	filteringParser.add_argument('-w', '--windowSize', type=float, default=cnst.initWindowSizeValue,
+	                             help='Window size in seconds')
+	filteringParser.add_argument('-c', '--channels', type=int, default=8, help='Number of channels')
+	filteringParser.add_argument('-o', '--order', type=int, default=10, help='Order of the band-pass filter')
+	ccaParser = subparsers.add_parser('cca', help='Time spent calculating the cca correlations of the windows')
+	ccaParser.add_argument('-n', '--windowsNum', type=int, default=500, help='Number of windows')
+	ccaParser.add_argument('-w', '--windowSize', type=float, default=cnst.initWindowSizeValue,
+	                       help='Window size in seconds')
+	ccaParser.add_argument('-c', '--channels', type=int, default=3, help='Number of channels')
+	ccaParser.add_argument('-st', '--windowStepSize', type=float, default=cnst.initStepSizeValue,
+	                       help='Window step in seconds, the time an online prediction has')
+	args = parser.parse_args()
+	if args.benchmark == 'handler':
+		handlerBenchmark(args.seconds, args.readers, args.blockSizes)
+	elif args.benchmark == 'windowing':
+		windowingBenchmark(args.seconds, args.windowSize, args.windowStepSize, args.blockSize)
+	elif args.benchmark == 'storage':
+		storageBenchmark(args.filename, args.profiles, args.blockSize)
+	elif args.benchmark == 'filtering':
+		filteringBenchmark(args.windowsNum, args.windowSize, args.channels, args.order)
+	elif args.benchmark == 'cca':
+		ccaBenchmark(args.windowsNum, args.windowSize, args.channels, args.windowStepSize)
@@ -206,7 +206,7 @@ class Constants:
 	initBandPassFreqList = "4-40"
 	windowSizeList = [1, 2, 3, 4, 5]
 	initWindowSizeValue = 3
-	windowStepSizeList = [0.5, 1, 1.5, 0.99, 0.35]
+	windowStepSizeList = [0.5, 1, 1.5, 0.99, 0.35, 0.1]
 	initStepSizeValue = 0.5
 	synchingSignal = [0, 0, 0, 0, 0, 0, 0, 0]
 	initEnabledChannels = [0, 1, 2]
@@ -229,7 +229,65 @@ class Constants:
 
 	""" Queue size """
 	maxQueueSize = 2500
-	writeDataMaxQueueSize = maxQueueSize * 100  # approximate 15 minutes of streaming
+	windowedDataQueueSize = 10  # windows kept for the online processing, the oldest are dropped
+
+	""" Board reader thread """
+	boardReadBufferSize = maxQueueSize  # samples kept until read_block, approximate 10 seconds of streaming
+	boardReaderPollInterval = 0.002  # seconds to sleep when less than a packet is waiting on the serial port
+	boardStallTimeouts = 5  # serial timeouts without a packet before the board is considered stalled
+
+	""" Sample bus """
+	sampleBusSize = maxQueueSize  # samples kept for the slowest reader, approximate 10 seconds of streaming
+	sampleBlockSize = 10  # samples published at once, from 1 to maxSampleBlockSize
+	maxSampleBlockSize = 25
+
+	""" Windowing """
+	windowBufferSize = maxQueueSize  # samples kept for cutting windows, grows if a window does not fit
+	multiWindowSizeList = windowSizeList  # window sizes in seconds created together, see windowing.windowing
+	multiWindowQueueSize = 10  # steps of windows of every size kept, the oldest are dropped
+
+	""" Writing into file """
+	writeFlushInterval = 1  # seconds between two flushes of the session file
+	storeWindowIndexes = False  # store the [start, end) indexes of the windows instead of the "packages" dataset
+	windowsChunkSize = 1024  # windows per chunk of the "windows" dataset
+	classIndexChunkSize = 256  # runs per chunk of the "classIndex" dataset
+	segmentSize = 15000  # samples per segment file kept until the session file is closed, approximate 1 minute
+	segmentFilename = 'segment_%05d.bin'
+	journalFilename = 'journal.jsonl'
+	# how the session datasets are stored, see sessionFile.createDataset. chunkSize is the samples per chunk of the
+	# signal dataset, a window is a chunk of the packages dataset, so both are read in time order chunk by chunk
+	# a chunk must fit in h5py's 1 MB chunk cache, or every appended block compresses the whole chunk again
+	storageProfiles = {
+		'default': {'dtype': 'float64', 'chunkSize': 250, 'compression': None, 'compression_opts': None,
+		            'shuffle': False},
+		'fast': {'dtype': 'float64', 'chunkSize': 2500, 'compression': 'lzf', 'compression_opts': None,
+		         'shuffle': True},
+		'compact': {'dtype': 'float32', 'chunkSize': 2500, 'compression': 'gzip', 'compression_opts': 4,
+		            'shuffle': True},
+	}
+	storageProfile = 'default'
+	sessionCatalogFilename = 'sessions.sqlite'  # the session catalog in a data directory, see sessionCatalog
+
+	""" Converting OpenBCI GUI recordings, see txtToHdf5 """
+	txtConversionChannels = [0, 1, 2, 3]
+	txtChunkLines = 100000  # lines of a recording parsed at a time
+
+	""" Signal dataset columns, after the channel data, see writeToFile.samplesToSignal """
+	signalClassColumn = -3
+	signalGroundTruthColumn = -2
+	signalTimeColumn = -1
+
+	""" Filtering, see filters """
+	filterCacheSize = 32  # filter designs kept by filters.designFilter
+	onlineFilterOrder = 10  # order of the band-pass filter of the online windows
+	# the mains noise is removed with a butterworth band-stop filter around the mains frequency, as brainflow does
+	mainsFrequency = 50  # 50 or 60 Hz, depending on the country
+	mainsNotchWidth = 4  # Hz
+	mainsNotchOrder = 4
+	# filter the continuous signal once and cut the windows from it, instead of filtering every window
+	filterOnce = False
+	filterTransient = 1  # seconds at the start of a filtered signal without windows, in filter once mode
+	filterBankOrder = 4  # order of the band-pass filters of filters.filterBankWindows
 
 	""" GUI """
 	# the order of the channels' color  is the same order as the wires' colors in the equivalent pin
@@ -260,6 +318,22 @@ class Constants:
 	frames_ch[2] = [9, 9]  # for frequency=3.33 Hz  lower left
 	frames_ch[3] = [7, 7]  # for frequency=4.28 Hz  lower right
 	harmonics_num = 2
+	referenceBankCacheSize = 8  # cca reference banks kept, one per window size, see train_processing_cca_3
+	# filter bank cca, the correlations of every sub-band combined, instead of the cca of the board's band
+	fbcca = False
+	# sub-bands starting below the lowest stimulus frequency (6 Hz) and its harmonics
+	fbccaBands = [(4, 40), (10, 40), (16, 40)]
+	# weight of the n-th sub-band: n ** -fbccaWeightsPower + fbccaWeightsOffset
+	fbccaWeightsPower = 1.25
+	fbccaWeightsOffset = 0.25
+	# train a task-related component analysis classifier, with the templates and the spatial filters of every stimulus
+	# learned from the training windows, see classification.trca, instead of the linear discriminant analysis of the cca
+	# correlations
+	trca = False
+	# update the cca correlations of the online windows with the samples of every step, see classification.slidingCca,
+	# only for streams filtered once
+	slidingCca = False
+	slidingCcaRefreshSteps = 600  # windows updated before the sums are calculated from the whole window again
 
 	""" online Streaming Commands """
 	# 4 target classes
@@ -16,6 +16,8 @@ from utils.constants import Constants as cnst, getShuffledTargetsLength
 from classification.classificationOpenBCI import classify
 from csv import DictWriter
 from utils.coloringPrint import printError, printWarning
+from utils.sessionFile import getWindowsNum, getClassRuns
+from utils.sessionCatalog import SessionCatalog
 
 channel_1_Index = 0
 channel_2_Index = 1
@@ -25,9 +27,9 @@ channel_5_Index = 4
 channel_6_Index = 5
 channel_7_Index = 6
 channel_8_Index = 7
-predictedClass_Index = 8
-groundTruth_index = 9
-timer_index = 10
+predictedClass_Index = cnst.signalClassColumn
+groundTruth_index = cnst.signalGroundTruthColumn
+timer_index = cnst.signalTimeColumn
 
 
 lowcut = 4
@@ -52,165 +54,56 @@ def calcalate_ITR(N,P,Cn,T):
 	
 
 def getListOfFiles(dirName,drivenTime=False, classification=False, calcEveryClassCombination=False):
-	# create a list of file and sub directories 
-	# names in the given directory 
-	listOfFile = os.listdir(dirName)
-	allFiles = list()
-	# Iterate over all the entries
-	for entry in listOfFile:
-		# Create full path
-		# print(entry)
-		fullPath = os.path.join(dirName, entry)
-		# If entry is a directory then get the list of files in this directory 
-		if os.path.isdir(fullPath):
-			# check if the directory is numeric, in other words subject data
-			if entry.isnumeric():
-				# print(entry)
-				getListOfFiles(fullPath,drivenTime, classification, calcEveryClassCombination)
-			# check if the directory is wet results
-			elif entry.lower() == 'wet':
-				usedChannels = None 
-				trainingFiles = []
-				# get the first 4 files contain 'streaming' in their name, for the classification
-				for trainingFile in os.listdir(fullPath):
-					trainingFilePath = os.path.join(fullPath, trainingFile)
-					if classification:
-						if 'streaming' in trainingFile.lower():
-							# check if the used channels in this trials are the same as the previous ones
-							with h5py.File(trainingFilePath, 'r') as fl:
-								fileUsedChannels = fl['StreamSettings'][5,1].decode('UTF-8')
-							# Converting string to list
-							fileUsedChannels = fileUsedChannels.strip('][').split(', ')
-							fileUsedChannels = list(map(int, fileUsedChannels)) 
-							if usedChannels is None:
-								usedChannels = fileUsedChannels
-							elif usedChannels != fileUsedChannels:
-								printError('Not the same number of electrodes in every session. No classifier created!')
-								return
-							trainingFiles.append(trainingFilePath)
-						if len(trainingFiles) == 4:
-							if calcEveryClassCombination:
-								classificationCombinations = dataInListCombinations(trainingFiles)
-								for classificationCombination in classificationCombinations:
-									for cntr, channelCombination in enumerate(dataInListCombinations(usedChannels)):
-										print('Classifying...' + cntr.__str__())
-										subject = os.path.abspath(os.path.join(fullPath, os.pardir)).split('/')[-1]
-										results = classify(fileNames=classificationCombination,
-															enabledChannels=channelCombination,
-															lowcut=lowcut,
-															highcut=highcut,
-															fs=samplingRate,
-															saveClassifier=False,
-															subject=subject)
-										ITR = calcalate_ITR(ITR_numberOfTargets,
-															float(results['LDA Accuracy']),
-															ITR_Cn,
-															ITR_T)
-										results['ITR'] = ITR
-										writeDictInFile('wetResults2', results)
-							else:
-								for cntr, channelCombination in enumerate(dataInListCombinations(usedChannels)):
-									print('Classifying...' + cntr.__str__())
-									subject = os.path.abspath(os.path.join(fullPath, os.pardir)).split('/')[-1]
-									results = classify(fileNames=trainingFiles,
-														enabledChannels=channelCombination,
-														lowcut=lowcut,
-														highcut=highcut,
-														fs=samplingRate,
-														saveClassifier=False,
-														subject=subject)
-									ITR = calcalate_ITR(ITR_numberOfTargets,
-														float(results['LDA Accuracy']),
-														ITR_Cn,
-														ITR_T)
-									results['ITR'] = ITR
-									writeDictInFile('wetResults2', results)
-								
-							break
-					
-					if trainingFile.lower() == 'driving.hdf5' and drivenTime:
-						print(trainingFilePath)
-						totalTime = calculateDrivingTime(trainingFilePath)
-						with h5py.File(trainingFilePath, 'r') as fl:
-							dtElectroType = fl['StreamSettings'][7,1].decode('UTF-8').split('.')[1]
-						subject = os.path.abspath(os.path.join(fullPath, os.pardir)).split('/')[-1]
+	# the results' files of every electrodes directory
+	resultsFiles = {'wet': 'wetResults2', 'dry': 'dryResuts'}
+	with SessionCatalog(dirName) as catalog:
+		catalog.update()
+		for subject in catalog.subjects():
+			for electrodesDirectory in resultsFiles.keys():
+				if classification:
+					# get the first 4 sessions contain 'streaming' in their name, for the classification
+					trainingSessions = catalog.query(subject=subject, directory=electrodesDirectory,
+					                                 nameContains='streaming', limit=4)
+					# check if the used channels in this trials are the same as the previous ones
+					usedChannels = trainingSessions[0]['enabledChannels'] if trainingSessions else None
+					if any(session['enabledChannels'] != usedChannels for session in trainingSessions):
+						printError('Not the same electrodes in every session. No classifier created!')
+						return
+					trainingFiles = [session['path'] for session in trainingSessions]
+					if len(trainingFiles) == 4:
+						if calcEveryClassCombination:
+							classificationCombinations = dataInListCombinations(trainingFiles)
+						else:
+							classificationCombinations = [trainingFiles]
+						for classificationCombination in classificationCombinations:
+							for cntr, channelCombination in enumerate(dataInListCombinations(usedChannels)):
+								print('Classifying...' + cntr.__str__())
+								results = classify(fileNames=classificationCombination,
+													enabledChannels=channelCombination,
+													lowcut=lowcut,
+													highcut=highcut,
+													fs=samplingRate,
+													saveClassifier=False,
+													subject=subject)
+								ITR = calcalate_ITR(ITR_numberOfTargets,
+													float(results['LDA Accuracy']),
+													ITR_Cn,
+													ITR_T)
+								results['ITR'] = ITR
+								writeDictInFile(resultsFiles[electrodesDirectory], results)
+
+				if drivenTime:
+					for session in catalog.query(subject=subject, directory=electrodesDirectory):
+						if session['name'].lower() != 'driving.hdf5':
+							continue
+						print(session['path'])
+						totalTime = calculateDrivingTime(session['path'])
 						durationResults = {
 							'Subject': subject,
-							'Electrodes': dtElectroType,
+							'Electrodes': session['electrodeType'],
 							'Total time': totalTime
 						}
 						writeDictInFile('onlineDuration', durationResults)
-			# check if the directory is dry results
-			elif entry.lower() == 'dry':
-				usedChannels = None    
-				trainingFiles = []
-				# get the first 4 files contain 'streaming' in their name, for the classification
-				for trainingFile in os.listdir(fullPath):
-					trainingFilePath = os.path.join(fullPath, trainingFile)
-					if classification:
-						if 'streaming' in trainingFile.lower():
-							# check if the used channels in this trials are the same as the previous ones
-							with h5py.File(trainingFilePath, 'r') as fl:
-								fileUsedChannels = fl['StreamSettings'][5,1].decode('UTF-8')
-							# Converting string to list
-							fileUsedChannels = fileUsedChannels.strip('][').split(', ')
-							fileUsedChannels = list(map(int, fileUsedChannels)) 
-							if usedChannels is None:
-								usedChannels = fileUsedChannels
-							elif usedChannels != fileUsedChannels:
-								printError('Not the same electrodes in every session. No classifier created!')
-								return
-							trainingFiles.append(trainingFilePath)
-						if len(trainingFiles) == 4:
-							if calcEveryClassCombination:
-								classificationCombinations = dataInListCombinations(trainingFiles)
-								for classificationCombination in classificationCombinations:
-									for cntr, channelCombination in enumerate(dataInListCombinations(usedChannels)):
-										print('Classifying...' + cntr.__str__())
-										subject = os.path.abspath(os.path.join(fullPath, os.pardir)).split('/')[-1]
-										results = classify(fileNames=classificationCombination,
-															enabledChannels=channelCombination,
-															lowcut=lowcut,
-															highcut=highcut,
-															fs=samplingRate,
-															saveClassifier=False,
-															subject=subject)
-										ITR = calcalate_ITR(ITR_numberOfTargets,
-															float(results['LDA Accuracy']),
-															ITR_Cn,
-															ITR_T)
-										results['ITR'] = ITR					
-										writeDictInFile('dryResuts', results)
-							else: 
-								for channelCombination in dataInListCombinations(usedChannels):
-									print('Classifying...')
-									subject = os.path.abspath(os.path.join(fullPath, os.pardir)).split('/')[-1]
-									results = classify(fileNames=trainingFiles,
-														enabledChannels=channelCombination,
-														lowcut=lowcut,
-														highcut=highcut,
-														fs=samplingRate,
-														saveClassifier=False,
-														subject=subject)
-									ITR = calcalate_ITR(ITR_numberOfTargets,
-														float(results['LDA Accuracy']),
-														ITR_Cn,
-														ITR_T)
-									results['ITR'] = ITR					
-									writeDictInFile('dryResuts', results)
-							break
-					if trainingFile.lower() == 'driving.hdf5' and drivenTime:
-						print(trainingFilePath)
-						totalTime = calculateDrivingTime(trainingFilePath)
-						with h5py.File(trainingFilePath, 'r') as fl:
-							dtElectroType = fl['StreamSettings'][7,1].decode('UTF-8').split('.')[1]
-						subject = os.path.abspath(os.path.join(fullPath, os.pardir)).split('/')[-1]
-						durationResults = {
-							'Subject': subject,
-							'Electrodes': dtElectroType,
-							'Total time': totalTime
-						}
-						writeDictInFile('onlineDuration', durationResults)			
 
 
 def writeDictInFile(filename=None, fieldsDict=None):
@@ -253,26 +146,20 @@ def dataInListCombinations(data):
 
 def calculateDrivingTime(fileName):
 	with h5py.File(fileName, 'r') as fl:
-		signalPredicted = fl['signal'][:,8]
-		signalTotalTime = fl['signal'][:,10]
-		curPrediction = -1
-		prevPrediction = -2
-		for index in range(len(signalPredicted)):
-			curPrediction = signalPredicted[index]
-			if curPrediction != prevPrediction:
-				prevPrediction = curPrediction
-				terminationTimeIndex = index
+		# the driving ends with the last prediction
+		curPrediction, terminationTimeIndex, _ = getClassRuns(fl)[-1]
 		if curPrediction != 300:
 			printError('Fix time duration!!')
 			print(curPrediction ,terminationTimeIndex)	
 			
-		timeInMinutes = datetime.timedelta(seconds=signalTotalTime[terminationTimeIndex]).__str__().split(':',1)[1]
+		terminationTime = float(fl['signal'][terminationTimeIndex, timer_index])
+		timeInMinutes = datetime.timedelta(seconds=terminationTime).__str__().split(':',1)[1]
 	return timeInMinutes
 					
 					
 def checkWindowedDataLength(fileName):
 	with h5py.File(fileName, 'r') as fl:
-		totalWindowedData = fl['packages'][:,:,0:9].shape[0]
+		totalWindowedData = getWindowsNum(fl)
 		if totalWindowedData != 219:
 			printError('windowedDataLength is not 219!')
 			print(fileName ,totalWindowedData)	
@@ -280,41 +167,20 @@ def checkWindowedDataLength(fileName):
 	return totalWindowedData
 	
 
-def getCorrelationFiles(dirName):
-	# create a list of file and sub directories 
-	# names in the given directory 
-	dryFileName = None
-	wetFileName = None
-	listOfFile = os.listdir(dirName)
-	for entry in listOfFile:
-		# Create full path
-		# print(entry)
-		fullPath = os.path.join(dirName, entry)
-		# If entry is a directory then get the list of files in this directory 
-		if os.path.isdir(fullPath):
-			# check if the directory is numeric, in other words subject data
-			if entry.isnumeric():
-				# print(entry)
-				getCorrelationFiles(fullPath)
-			elif entry.lower() == 'wet':
-				for trainingFile in os.listdir(fullPath):
-					trainingFilePath = os.path.join(fullPath, trainingFile)
-					if 'streaming' in trainingFile.lower():
-						wetFileName = trainingFilePath
-						break
-			elif entry.lower() == 'dry':
-				for trainingFile in os.listdir(fullPath):
-					trainingFilePath = os.path.join(fullPath, trainingFile)
-					if 'streaming' in trainingFile.lower():
-						dryFileName = trainingFilePath
-						break		
-				
+def getCorrelationFiles(dirName, subject):
+	# the first file contains 'streaming' in its name, of every electrodes directory of the subject
+	with SessionCatalog(dirName) as catalog:
+		catalog.update()
+		dryFiles = catalog.query(subject=subject, directory='dry', nameContains='streaming', limit=1)
+		wetFiles = catalog.query(subject=subject, directory='wet', nameContains='streaming', limit=1)
+	dryFileName = dryFiles[0]['path'] if dryFiles else None
+	wetFileName = wetFiles[0]['path'] if wetFiles else None
 	return dryFileName, wetFileName		
 	
 
 def calcCorrelation(directory, subj):
 	
-	fileNameDry,fileNameWet = getCorrelationFiles(directory + "{:02d}".format(subj))
+	fileNameDry,fileNameWet = getCorrelationFiles(directory, "{:02d}".format(subj))
 	with h5py.File(fileNameDry, 'r') as fl:    
 		signalDry = fl['signal'][:,:]
 		
@@ -330,74 +196,31 @@ def calcCorrelation(directory, subj):
 	
 
 def variousClassifications(dirName):
-	# create a list of file and sub directories 
-	# names in the given directory 
-	listOfFile = os.listdir(dirName)
-	allFiles = list()
-	# Iterate over all the entries
-	for entry in listOfFile:
-		# Create full path
-		# print(entry)
-		fullPath = os.path.join(dirName, entry)
-		# If entry is a directory then get the list of files in this directory 
-		if os.path.isdir(fullPath):
-			# check if the directory is numeric, in other words subject data
-			if entry.isnumeric():
-				# print(entry)
-				variousClassifications(fullPath)
-			# check if the directory is wet results
-			elif entry.lower() == 'wet':
+	# the results' files of every electrodes directory
+	resultsFiles = {'wet': 'wetResults2', 'dry': 'dryResuts2'}
+	with SessionCatalog(dirName) as catalog:
+		catalog.update()
+		for subject in catalog.subjects():
+			for electrodesDirectory in resultsFiles.keys():
 				trainingFiles = []
 				# get the first 4 files contain 'streaming' in their name, for the classification
-				for trainingFile in os.listdir(fullPath):
-					trainingFilePath = os.path.join(fullPath, trainingFile)
-					if len(trainingFiles) == 4:
-						break
-					if 'streaming' in trainingFile.lower():
-						trainingFiles.append(trainingFilePath)
-						print('Classifying...' + len(trainingFiles).__str__())
-						subject = os.path.abspath(os.path.join(fullPath, os.pardir)).split('/')[-1]
-						results = classify(fileNames=trainingFiles,
-											enabledChannels=[0,1,2],
-											lowcut=lowcut,
-											highcut=highcut,
-											fs=samplingRate,
-											saveClassifier=False,
-											subject=subject)
-						ITR = calcalate_ITR(ITR_numberOfTargets,
-											float(results['LDA Accuracy']),
-											ITR_Cn,
-											ITR_T)
-						results['ITR'] = ITR
-						writeDictInFile('wetResults2', results)
-					
-				
-			# check if the directory is dry results
-			elif entry.lower() == 'dry':
-				usedChannels = None    
-				trainingFiles = []
-				# get the first 4 files contain 'streaming' in their name, for the classification
-				for trainingFile in os.listdir(fullPath):
-					trainingFilePath = os.path.join(fullPath, trainingFile)
-					if len(trainingFiles) == 4:
-						break
-					if 'streaming' in trainingFile.lower():
-						trainingFiles.append(trainingFilePath)
-						print('Classifying...' + len(trainingFiles).__str__())
-						subject = os.path.abspath(os.path.join(fullPath, os.pardir)).split('/')[-1]
-						results = classify(fileNames=trainingFiles,
-											enabledChannels=[0,1,2],
-											lowcut=lowcut,
-											highcut=highcut,
-											fs=samplingRate,
-											saveClassifier=False,
-											subject=subject)
-						ITR = calcalate_ITR(ITR_numberOfTargets,
-											float(results['LDA Accuracy']),
-											ITR_Cn,
-											ITR_T)
-						results['ITR'] = ITR					
-						writeDictInFile('dryResuts2', results)
+				for session in catalog.query(subject=subject, directory=electrodesDirectory, nameContains='streaming',
+				                             limit=4):
+					trainingFiles.append(session['path'])
+					print('Classifying...' + len(trainingFiles).__str__())
+					results = classify(fileNames=trainingFiles,
+										enabledChannels=[0,1,2],
+										lowcut=lowcut,
+										highcut=highcut,
+										fs=samplingRate,
+										saveClassifier=False,
+										subject=subject)
+					ITR = calcalate_ITR(ITR_numberOfTargets,
+										float(results['LDA Accuracy']),
+										ITR_Cn,
+										ITR_T)
+					results['ITR'] = ITR
+					writeDictInFile(resultsFiles[electrodesDirectory], results)
 						
 
 
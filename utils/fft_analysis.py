@@ -7,6 +7,7 @@ from brainflow import DataFilter, NoiseTypes, WindowFunctions, FilterTypes
 from utils.constants import Constants as cnst, FilterType, FftType
 from utils.constants import ElectrodeType
 from utils import filters, filteringCases
+from utils.sessionFile import getClassRuns
 import sys
 
 sys.path.append('..')
@@ -178,14 +179,15 @@ def printFFT(fileNames, lowCut=4, highCut=40, fs=250, enabledChannel=None,
 		enabledChannel = [0, 1, 2, 3]
 
 	for fileName in fileNames:
-		with h5py.File(fileName, 'r') as f:
-			signalData = f['signal'][:]
-
 		signalDataInClassPackages = []
-		for trClass in cnst.trainingClasses:
-			if trClass == 0:
-				continue
-			signalDataInClassPackages.append([sample for sample in signalData if sample[8] == trClass])
+		with h5py.File(fileName, 'r') as f:
+			classRuns = getClassRuns(f)
+			for trClass in cnst.trainingClasses:
+				if trClass == 0:
+					continue
+				# read only the samples of the class
+				signalDataInClassPackages.append(
+					[sample for _, start, end in classRuns[classRuns[:, 0] == trClass] for sample in f['signal'][start:end]])
 
 		fig, axs = plt.subplots(2, 2)
 		fig.suptitle(os.path.basename(fileName))
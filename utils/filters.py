@@ -1,22 +1,88 @@
+import functools
 from scipy import signal
 import numpy as np
-from brainflow import DataFilter, NoiseTypes, FilterTypes
-from utils.constants import FilterType
+from brainflow import DataFilter, FilterTypes
+from utils.constants import Constants as cnst, FilterType
+
+
+@functools.lru_cache(maxsize=cnst.filterCacheSize)
+def _designFilter(filterType, order, lowcut, highcut, fs):
+	nyq = 0.5 * fs
+	if filterType == 'ba':
+		coefficients = signal.butter(order, np.array([lowcut, highcut]) / nyq, btype='bandpass')
+	elif filterType == 'bandstop':
+		coefficients = (signal.butter(order, [lowcut / nyq, highcut / nyq], btype='bandstop', output='sos'),)
+	else:
+		coefficients = (signal.butter(order, [lowcut / nyq, highcut / nyq], analog=False, btype='band', output='sos'),)
+	return coefficients
+
+
+def designFilter(filterType, order, lowcut, highcut, fs):
+	"""
+	Returns the butterworth band-pass filter with the given parameters, designed only the first time it is asked for.
+	The last :data:`utils.constants.Constants.filterCacheSize` designs are kept, see :func:`filterCacheInfo`.
+
+	:param str filterType: 'sos' for second-order sections, 'ba' for the numerator and denominator, 'bandstop' for the
+	                       second-order sections of a band-stop filter instead.
+	:param int order: The order of the filter.
+	:param lowcut: The lower bound frequency of the band.
+	:param highcut: The upper bound frequency of the band.
+	:param fs: The sampling rate.
+	:return: (tuple) The (sos,) or (b, a) arrays, copies of the kept ones, since scipy needs them writeable.
+	"""
+	return tuple(np.copy(array) for array in _designFilter(filterType, int(order), float(lowcut), float(highcut),
+	                                                       float(fs)))
+
+
+def filterCacheInfo():
+	"""
+	:return: (functools._CacheInfo) The hits, misses and size of the filter design cache, see :func:`designFilter`.
+	"""
+	return _designFilter.cache_info()
+
+
+def clearFilterCache():
+	""" Drops every filter design kept """
+	_designFilter.cache_clear()
+
+
+def mainsNotch(samplingRate, mainsFrequency=cnst.mainsFrequency):
+	"""
+	Returns the band-stop filter removing the mains noise, :data:`utils.constants.Constants.mainsNotchWidth` Hz wide
+	around the mains frequency, the same filter brainflow's remove_environmental_noise designs on every call.
+
+	:param int samplingRate: The sampling rate.
+	:param int mainsFrequency: 50 or 60 Hz.
+	:return: (numpy.ndarray) The second-order sections of the filter.
+	"""
+	sos, = designFilter('bandstop', cnst.mainsNotchOrder, mainsFrequency - cnst.mainsNotchWidth / 2,
+	                    mainsFrequency + cnst.mainsNotchWidth / 2, samplingRate)
+	return sos
+
+
+def removeMainsNoise(data, samplingRate, mainsFrequency=cnst.mainsFrequency, axis=0):
+	"""
+	Removes the mains noise from every channel at once, along the time axis, see :func:`mainsNotch`. Gives the same
+	result as brainflow's remove_environmental_noise on every channel, which filters each one from rest.
+
+	:param numpy.ndarray data: The data, e.g. (number of samples, number of channels).
+	:param int samplingRate: The sampling rate.
+	:param int mainsFrequency: 50 or 60 Hz.
+	:param int axis: The time axis.
+	:return: (numpy.ndarray) The filtered data, same shape as data.
+	"""
+	return signal.sosfilt(mainsNotch(samplingRate, mainsFrequency), data, axis=axis)
 
 
 # Bandpass filter
 def bandpass(data, start, stop, fs):
-	bp_Hz = np.array([start, stop])
-	b, a = signal.butter(5, bp_Hz / (fs / 2.0), btype='bandpass')
+	b, a = designFilter('ba', 5, start, stop, fs)
 	return signal.lfilter(b, a, data, axis=0)
 
 
 def butter_bandpass(lowcut, highcut, fs, order=5):
 	# ************************************************** Resolve the order issue!!! ********************************
-	nyq = 0.5 * fs
-	low = lowcut / nyq
-	high = highcut / nyq
-	sos = signal.butter(order, [low, high], analog=False, btype='band', output='sos')
+	sos, = designFilter('sos', order, lowcut, highcut, fs)
 	return sos
 
 
@@ -28,6 +94,109 @@ def butter_bandpass_filter(data, lowcut, highcut, fs, order=5):
 	return y
 
 
+def filterWindows(windows, samplingRate, lowBandBound, highBandBound, noiseCancellation, order=10,
+                  mainsFrequency=cnst.mainsFrequency):
+	"""
+	Filters many windows at once, the same as :func:`filteringCases` with the butter band-pass filter filters each one
+	of them. The band-pass filter runs once along the time axis of the whole array.
+
+	:param numpy.ndarray windows: Array of shape (number of windows, number of samples, number of channels).
+	:param int samplingRate: The sampling rate of the windows.
+	:param lowBandBound: The lower bound frequency of the band.
+	:param highBandBound: The upper bound frequency of the band.
+	:param bool noiseCancellation: Remove the mains noise before the band-pass filter.
+	:param int order: The order of the butterworth band-pass filter.
+	:param int mainsFrequency: The frequency of the mains noise, 50 or 60 Hz.
+	:return: (numpy.ndarray) The filtered windows, same shape as windows.
+	"""
+	data = np.array(windows, dtype=float)
+	if noiseCancellation:
+		data = removeMainsNoise(data, samplingRate, mainsFrequency, axis=1)
+	sos = butter_bandpass(lowBandBound, highBandBound, samplingRate, order=order)
+	return signal.sosfiltfilt(sos, data, axis=1)
+
+
+def filterBankWindows(windows, samplingRate, bands, noiseCancellation, order=cnst.filterBankOrder,
+                      mainsFrequency=cnst.mainsFrequency):
+	"""
+	Decomposes many windows at once into the given sub-bands, with a butterworth band-pass filter per band. The mains
+	noise is removed once, before the bands, and every band-pass filter runs once along the time axis of the whole
+	array. The filter designs are cached, see :func:`designFilter`.
+
+	:param numpy.ndarray windows: Array of shape (number of windows, number of samples, number of channels).
+	:param int samplingRate: The sampling rate of the windows.
+	:param bands: The (lower bound, upper bound) frequencies of every sub-band, e.g. [(4, 40), (10, 40)].
+	:param bool noiseCancellation: Remove the mains noise before the band-pass filters.
+	:param int order: The order of the butterworth band-pass filters.
+	:param int mainsFrequency: The frequency of the mains noise, 50 or 60 Hz.
+	:return: (numpy.ndarray) The filtered windows of every band, as (number of bands,) + windows.shape array.
+	"""
+	data = np.array(windows, dtype=float)
+	if noiseCancellation:
+		data = removeMainsNoise(data, samplingRate, mainsFrequency, axis=1)
+	return np.stack([signal.sosfiltfilt(butter_bandpass(lowBandBound, highBandBound, samplingRate, order=order), data,
+	                                    axis=1) for lowBandBound, highBandBound in bands])
+
+
+def filterSignal(signalData, samplingRate, lowBandBound, highBandBound, noiseCancellation, order=10,
+                 mainsFrequency=cnst.mainsFrequency):
+	"""
+	Filters a whole continuous signal at once, zero-phase, the same way :func:`filterWindows` filters every window, so
+	the windows cut from it afterwards are filtered once and without edge effects, apart from the signal's edges.
+
+	:param numpy.ndarray signalData: Array of shape (number of samples, number of channels).
+	:return: (numpy.ndarray) The filtered signal, same shape as signalData.
+	"""
+	return filterWindows(signalData[np.newaxis], samplingRate, lowBandBound, highBandBound, noiseCancellation,
+	                     order=order, mainsFrequency=mainsFrequency)[0]
+
+
+class StreamingFilter:
+	"""
+	Causal butterworth band-pass filter for data arriving in consecutive blocks of samples.
+	The filter is designed once, at creation, and the per-channel filter state is kept between the calls of
+	:meth:`filter`, so filtering a stream block by block gives the same result as filtering it at once.
+	With a mains frequency, the mains noise is removed before the band-pass filter, see :func:`mainsNotch`.
+
+	:param lowcut: The lower bound frequency of the band.
+	:param highcut: The upper bound frequency of the band.
+	:param fs: The sampling rate of the stream.
+	:param int order: The order of the butterworth filter.
+	:param int mainsFrequency: The frequency of the mains noise, 50 or 60 Hz, None to keep it.
+	"""
+
+	def __init__(self, lowcut, highcut, fs, order=5, mainsFrequency=None):
+		self.lowcut = lowcut
+		self.highcut = highcut
+		self.fs = fs
+		self.order = order
+		self.sos = butter_bandpass(lowcut, highcut, fs, order=order)
+		if mainsFrequency is not None:
+			# both filters in one cascade of second-order sections, sharing the state
+			self.sos = np.concatenate((mainsNotch(fs, mainsFrequency), self.sos))
+		self.zi = None
+
+	def reset(self):
+		""" Forgets the filter state, the next block is treated as the start of a new stream """
+		self.zi = None
+
+	def filter(self, data):
+		"""
+		Filters the next block of the stream.
+
+		:param numpy.ndarray data: The block as (number of samples, number of channels) array.
+		:return: (numpy.ndarray) The filtered block, same shape as data.
+		"""
+		data = np.asarray(data, dtype=float)
+		if data.shape[0] == 0:
+			return data
+		if self.zi is None or self.zi.shape[2:] != data.shape[1:]:
+			# start from the steady state of the first sample to avoid the step response
+			self.zi = signal.sosfilt_zi(self.sos)[(...,) + (np.newaxis,) * (data.ndim - 1)] * data[0]
+		filtered, self.zi = signal.sosfilt(self.sos, data, axis=0, zi=self.zi)
+		return filtered
+
+
 def filterDryElectrodes(signalData, samplingRate, lowBandBound, highBandBound, order=None):
 	filteredData, _ = filteringCases(signalData, samplingRate, lowBandBound, highBandBound, filtered=True,
 	                                 filterType=FilterType.butter_bandpass_filter, noiseCancellation=True, order=order)
@@ -41,18 +210,15 @@ def filterWetElectrodes(signalData, samplingRate, lowBandBound, highBandBound, o
 
 
 def filteringCases(signalData, samplingRate, lowBandBound, highBandBound, filtered: bool, filterType: FilterType,
-                   noiseCancellation: bool, centerFreq=None, bandwidth=None, order=None):
+                   noiseCancellation: bool, centerFreq=None, bandwidth=None, order=None,
+                   mainsFrequency=cnst.mainsFrequency):
 	data = np.copy(signalData)
 	filterTypeFigureText = ', without filtering'
 	noiseCancellationFigureText = ', without noise cancellation'
 
 	if noiseCancellation:
-		if signalData.ndim > 1:
-			for column in range(signalData.shape[1]):
-				DataFilter.remove_environmental_noise(data[:, column], samplingRate, NoiseTypes.FIFTY.value)
-		else:
-			DataFilter.remove_environmental_noise(data, samplingRate, NoiseTypes.FIFTY.value)
-		noiseCancellationFigureText = ', noise Cancellation applied (brainflow remove_environmental_noise)'
+		data = removeMainsNoise(data, samplingRate, mainsFrequency)
+		noiseCancellationFigureText = ', noise Cancellation applied (' + mainsFrequency.__str__() + ' Hz notch)'
 
 	if filtered:
 		if filterType == FilterType.brainflow_bandpass:
@@ -1,5 +1,6 @@
 import logging
 import multiprocessing
+import multiprocessing.queues
 import queue
 import traceback
 from multiprocessing.managers import BaseProxy
@@ -19,7 +20,7 @@ def emptyQueue(q):
 	try:
 		if isinstance(q, list):
 			for buf in q:
-				if isinstance(buf, BaseProxy) or isinstance(q, Queue):
+				if isinstance(buf, BaseProxy) or isinstance(buf, Queue):
 					logger.info('Manager Queue from list emptying') if not buf.empty() else None
 					while not buf.empty():
 						buf.get()
@@ -42,6 +43,26 @@ def emptyQueue(q):
 		logger.error(error)
 
 
+def putLatest(q, item):
+	"""
+	Puts the given item into the given Queue, dropping its oldest items if it is full, so a slow reader always gets the
+	latest ones.
+
+	:param manager.Queue, queue.Queue, multiprocessing.Queue q:
+	:param item: The item to put.
+	:return: None
+	"""
+	while True:
+		try:
+			q.put_nowait(item)
+			return
+		except queue.Full:
+			try:
+				q.get_nowait()
+			except queue.Empty:
+				pass
+
+
 class TimerError(Exception):
 	"""A custom exception used to report errors in use of Timer class"""
 
@@ -0,0 +1,84 @@
+import threading
+import numpy as np
+
+
+class RingBuffer:
+	"""
+	Preallocated circular buffer of fixed size rows, shared between exactly one writer and one reader thread.
+
+	* The writer first advances :py:data:`writeStarted` past the new rows, copies them in the buffer and only then
+	  advances :py:data:`writeCount`.
+	* The reader copies the unread rows and only then advances :py:data:`readCount`.
+
+	Every counter is written by one side only, so no lock is needed. If the reader falls more than
+	:py:data:`capacity` rows behind, the oldest unread rows are overwritten and counted in :py:data:`overrunRows`. The
+	rows a write started overwriting, finished or not, are dropped from a read after copying them, by
+	:py:data:`writeStarted`, so a read never returns torn rows.
+
+	:param int capacity: The number of rows the buffer can hold.
+	:param numpy.dtype dtype: The dtype of a row, usually a structured one.
+	"""
+
+	def __init__(self, capacity, dtype):
+		self.capacity = capacity
+		self.data = np.zeros(capacity, dtype=dtype)
+		self.writeCount = 0
+		# the write count once the last started write finishes, ahead of writeCount while copying
+		self.writeStarted = 0
+		self.readCount = 0
+		self.overrunRows = 0
+		self.dataAvailable = threading.Event()
+
+	def available(self):
+		""" Returns the number of unread rows """
+		return min(self.writeCount - self.readCount, self.capacity)
+
+	def write(self, rows):
+		"""
+		Writes the given rows, overwriting the oldest ones if the buffer is full.
+
+		:param numpy.ndarray rows: Array of rows with the buffer's dtype.
+		"""
+		rows = rows[-self.capacity:]
+		# tell the reader which rows are being overwritten before touching them
+		self.writeStarted = self.writeCount + rows.shape[0]
+		start = self.writeCount % self.capacity
+		firstPart = min(rows.shape[0], self.capacity - start)
+		self.data[start:start + firstPart] = rows[:firstPart]
+		self.data[:rows.shape[0] - firstPart] = rows[firstPart:]
+		self.writeCount += rows.shape[0]
+		self.dataAvailable.set()
+
+	def read(self, maxRows=None, timeout=None):
+		"""
+		Reads the oldest unread rows.
+
+		:param int maxRows: The maximum number of rows to read, every unread row if None.
+		:param float timeout: Seconds to wait for new rows if there are none, don't wait if None.
+		:return: (numpy.ndarray) Copy of the read rows, possibly empty.
+		"""
+		if timeout is not None and self.writeCount == self.readCount:
+			self.dataAvailable.clear()
+			if self.writeCount == self.readCount:
+				self.dataAvailable.wait(timeout)
+		writeCount = self.writeCount
+		if writeCount - self.readCount > self.capacity:
+			self.overrunRows += writeCount - self.readCount - self.capacity
+			self.readCount = writeCount - self.capacity
+		rowsNum = writeCount - self.readCount
+		if maxRows is not None:
+			rowsNum = min(rowsNum, maxRows)
+		indexes = np.arange(self.readCount, self.readCount + rowsNum) % self.capacity
+		rows = self.data[indexes]
+		# drop the rows a write started overwriting while copying, even if it has not finished yet
+		overwritten = self.writeStarted - self.capacity - self.readCount
+		if overwritten > 0:
+			rows = rows[overwritten:]
+			self.overrunRows += min(overwritten, rowsNum)
+		self.readCount += rowsNum
+		return rows
+
+	def clear(self):
+		""" Marks every row as read """
+		self.readCount = self.writeCount
+		self.overrunRows = 0
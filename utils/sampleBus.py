@@ -0,0 +1,130 @@
+import ctypes
+import numpy as np
+from multiprocessing import RawArray, RawValue, Condition
+
+
+class SampleBus:
+	"""
+	Preallocated circular buffer of samples in shared memory, written by exactly one process and read by any number
+	of processes.
+
+	* The writer first advances the shared :py:data:`_writeStarted` past the new rows, copies them in the buffer, only
+	  then advances the shared :py:data:`_writeCount` and wakes the waiting readers.
+	* Every process reading the bus has its own copy of this object, hence its own :py:data:`readCount` cursor, so
+	  adding a reader costs nothing to the writer. A reader more than :py:data:`capacity` rows behind loses the
+	  oldest unread rows, counted in :py:data:`overrunRows`. The rows a write started overwriting, finished or not,
+	  are dropped from a read after copying them, by :py:data:`_writeStarted`, so a read never returns torn rows.
+
+	The object must be created before the processes using it and given to them as an argument.
+	The streamed samples are published in blocks, see :func:`sampleBlockDtype`.
+
+	:param int capacity: The number of rows the bus can hold.
+	:param numpy.dtype dtype: The dtype of a row.
+	"""
+
+	def __init__(self, capacity, dtype):
+		self.capacity = capacity
+		self.dtype = np.dtype(dtype)
+		self._buffer = RawArray(ctypes.c_char, capacity * self.dtype.itemsize)
+		self._writeCount = RawValue(ctypes.c_longlong, 0)
+		# the write count once the last started write finishes, ahead of _writeCount while copying
+		self._writeStarted = RawValue(ctypes.c_longlong, 0)
+		self._dataWritten = Condition()
+		self.readCount = 0
+		self.overrunRows = 0
+		self._attach()
+
+	def _attach(self):
+		self.data = np.frombuffer(self._buffer, dtype=self.dtype, count=self.capacity)
+
+	def __getstate__(self):
+		state = self.__dict__.copy()
+		del state['data']
+		return state
+
+	def __setstate__(self, state):
+		self.__dict__.update(state)
+		self._attach()
+
+	def write(self, rows):
+		"""
+		Writes the given rows, overwriting the oldest ones if the bus is full, and wakes the waiting readers.
+		Must be called by one process only.
+
+		:param numpy.ndarray rows: Array of rows with the bus's dtype.
+		"""
+		rows = rows[-self.capacity:]
+		writeCount = self._writeCount.value
+		# tell the readers which rows are being overwritten before touching them
+		self._writeStarted.value = writeCount + rows.shape[0]
+		start = writeCount % self.capacity
+		firstPart = min(rows.shape[0], self.capacity - start)
+		self.data[start:start + firstPart] = rows[:firstPart]
+		self.data[:rows.shape[0] - firstPart] = rows[firstPart:]
+		with self._dataWritten:
+			self._writeCount.value = writeCount + rows.shape[0]
+			self._dataWritten.notify_all()
+
+	def available(self):
+		""" Returns the number of rows this reader has not read yet """
+		return min(self._writeCount.value - self.readCount, self.capacity)
+
+	def read(self, maxRows=None, timeout=None):
+		"""
+		Reads the oldest rows this reader has not read yet.
+
+		:param int maxRows: The maximum number of rows to read, every unread row if None.
+		:param float timeout: Seconds to wait for new rows if there are none, don't wait if None.
+		:return: (numpy.ndarray) Copy of the read rows, possibly empty.
+		"""
+		if timeout is not None and self._writeCount.value == self.readCount:
+			with self._dataWritten:
+				self._dataWritten.wait_for(lambda: self._writeCount.value != self.readCount, timeout)
+		writeCount = self._writeCount.value
+		if writeCount - self.readCount > self.capacity:
+			self.overrunRows += writeCount - self.readCount - self.capacity
+			self.readCount = writeCount - self.capacity
+		rowsNum = writeCount - self.readCount
+		if maxRows is not None:
+			rowsNum = min(rowsNum, maxRows)
+		indexes = np.arange(self.readCount, self.readCount + rowsNum) % self.capacity
+		rows = self.data[indexes]
+		# drop the rows a write started overwriting while copying, even if it has not finished yet
+		overwritten = self._writeStarted.value - self.capacity - self.readCount
+		if overwritten > 0:
+			rows = rows[overwritten:]
+			self.overrunRows += min(overwritten, rowsNum)
+		self.readCount += rowsNum
+		return rows
+
+	def clear(self):
+		""" Marks every row written so far as read by this reader """
+		self.readCount = self._writeCount.value
+		self.overrunRows = 0
+
+
+def sampleBlockDtype(sampleDtype, blockSize):
+	"""
+	Returns the dtype of a block of samples published through a :class:`SampleBus`
+
+		* sequence: The number of blocks published before this one, consecutive blocks have consecutive numbers
+		* length: The number of valid samples in the block, less than blockSize only in the last block of a stream
+		* samples: The samples
+
+	:param numpy.dtype sampleDtype: The dtype of a sample.
+	:param int blockSize: The number of samples in a block.
+	"""
+	return np.dtype([('sequence', np.int64), ('length', np.int32), ('samples', sampleDtype, (blockSize,))])
+
+
+def blockSamples(blocks):
+	"""
+	Returns the valid samples of the given blocks, in order, see :func:`sampleBlockDtype`.
+
+	:param numpy.ndarray blocks: Array of blocks.
+	:return: (numpy.ndarray) Array of samples.
+	"""
+	samples = blocks['samples']
+	if np.all(blocks['length'] == samples.shape[1]):
+		return samples.reshape((-1,) + samples.shape[2:])
+	return samples[np.arange(samples.shape[1]) < blocks['length'][:, np.newaxis]]
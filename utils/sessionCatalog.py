@@ -0,0 +1,178 @@
+import json
+import os
+import sqlite3
+import h5py
+import numpy as np
+from utils.coloringPrint import printWarning
+from utils.constants import Constants as cnst
+from utils.sessionFile import getSessionSettings, getClassRuns, hasClassColumns
+
+
+class SessionCatalog:
+	"""
+	Catalog of the session files under a data directory, kept in an SQLite database in it, so the analysis scripts find
+	the sessions they need without walking the directories and opening every hdf5 file.
+
+	* The sessions are expected under <root>/<subject>/<wet or dry>/, with a numeric subject directory, like the
+	  subjects' data the analysis scripts read. Files elsewhere are cataloged with an empty subject or directory.
+	* :meth:`update` reads only the files added or changed since the last update, by their modification time and size,
+	  and drops the deleted ones.
+	* :meth:`query` returns the sessions as dicts, ordered by their path, with the keys:
+
+	  - path: the full path of the file
+	  - name: the file name
+	  - subject: the numeric subject directory
+	  - directory: the electrodes directory, e.g. 'wet' or 'dry'
+	  - electrodeType: the electrodes type of the board settings, e.g. 'DRY'
+	  - enabledChannels: the enabled channels of the board settings
+	  - samplesNum: the number of samples in the "signal" dataset
+	  - duration: the seconds between the first and the last sample
+	  - classHistogram: the number of samples of every class, e.g. {1: 7500, 2: 7500}
+	  - mtime: the modification time of the file
+
+	  The duration and the classHistogram are None for the files without the class and time columns, e.g. the
+	  recordings converted by :mod:`utils.txtToHdf5`.
+
+	:param str root: The data directory, e.g. the streamData directory or the subjects' directory.
+	:param str filename: The name of the database in root.
+	"""
+
+	# the sessions of a catalog of an older version are read again
+	version = 1
+
+	def __init__(self, root, filename=cnst.sessionCatalogFilename):
+		self.root = os.path.abspath(root)
+		self.connection = sqlite3.connect(os.path.join(self.root, filename))
+		self.connection.row_factory = sqlite3.Row
+		self.connection.execute(
+			'CREATE TABLE IF NOT EXISTS sessions (path TEXT PRIMARY KEY, name TEXT, subject TEXT, directory TEXT, '
+			'electrodeType TEXT, enabledChannels TEXT, samplesNum INTEGER, duration REAL, classHistogram TEXT, '
+			'mtime REAL, size INTEGER)')
+		if self.connection.execute('PRAGMA user_version').fetchone()[0] < self.version:
+			self.connection.execute('DELETE FROM sessions')
+			self.connection.execute('PRAGMA user_version = ' + self.version.__str__())
+			self.connection.commit()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+	def close(self):
+		self.connection.close()
+
+	def update(self):
+		"""
+		Catalogs the hdf5 files under root added or changed since the last update and drops the deleted ones. The files
+		that cannot be read, e.g. while they are being written, are left for the next update.
+
+		:return: (int) The number of files read.
+		"""
+		cataloged = {row['path']: (row['mtime'], row['size'])
+		             for row in self.connection.execute('SELECT path, mtime, size FROM sessions')}
+		found = set()
+		readNum = 0
+		for directory, _, files in os.walk(self.root):
+			for name in sorted(files):
+				if not name.lower().endswith('.hdf5'):
+					continue
+				path = os.path.relpath(os.path.join(directory, name), self.root)
+				stat = os.stat(os.path.join(self.root, path))
+				found.add(path)
+				if cataloged.get(path) == (stat.st_mtime, stat.st_size):
+					continue
+				session = self._readSession(path)
+				if session is None:
+					continue
+				session.update(mtime=stat.st_mtime, size=stat.st_size)
+				self.connection.execute(
+					'INSERT OR REPLACE INTO sessions VALUES (:path, :name, :subject, :directory, :electrodeType, '
+					':enabledChannels, :samplesNum, :duration, :classHistogram, :mtime, :size)', session)
+				readNum += 1
+		self.connection.executemany('DELETE FROM sessions WHERE path = ?',
+		                            [(path,) for path in cataloged.keys() - found])
+		self.connection.commit()
+		return readNum
+
+	def _readSession(self, path):
+		try:
+			with h5py.File(os.path.join(self.root, path), 'r') as fl:
+				if 'signal' not in fl:
+					return None
+				settings = getSessionSettings(fl) if 'StreamSettings' in fl else {}
+				samplesNum = fl['signal'].shape[0]
+				duration = None
+				classHistogram = None
+				if hasClassColumns(fl):
+					duration = 0.0
+					if samplesNum:
+						duration = float(fl['signal'][-1, cnst.signalTimeColumn] -
+						                 fl['signal'][0, cnst.signalTimeColumn])
+					classRuns = getClassRuns(fl)
+					classes, samples = np.unique(classRuns[:, 0], return_inverse=True)
+					classSamples = np.bincount(samples, weights=classRuns[:, 2] - classRuns[:, 1])
+					classHistogram = json.dumps({int(cls): int(num) for cls, num in zip(classes, classSamples)})
+		except (OSError, KeyError) as error:
+			printWarning('Could not catalog ' + path + ': ' + error.__str__())
+			return None
+		directories = os.path.dirname(path).split(os.sep)
+		return {
+			'path': path,
+			'name': os.path.basename(path),
+			'subject': next((directory for directory in directories if directory.isnumeric()), ''),
+			'directory': directories[-1].lower(),
+			'electrodeType': settings.get('usingElectrodes', ''),
+			'enabledChannels': json.dumps(settings.get('enabledChannels', [])),
+			'samplesNum': samplesNum,
+			'duration': duration,
+			'classHistogram': classHistogram,
+		}
+
+	def query(self, subject=None, directory=None, electrodeType=None, nameContains=None, limit=None):
+		"""
+		Returns the cataloged sessions matching every given filter, see :class:`SessionCatalog` for their keys. Call
+		:meth:`update` first to catalog the latest files.
+
+		:param str subject: The numeric subject directory, e.g. '01'.
+		:param str directory: The electrodes directory, e.g. 'wet'.
+		:param str electrodeType: The electrodes type of the board settings, e.g. 'DRY'.
+		:param str nameContains: Text the file name contains, case insensitive, e.g. 'streaming'.
+		:param int limit: The maximum number of sessions returned.
+		:return: ([dict]) The sessions, ordered by their path.
+		"""
+		conditions = []
+		parameters = []
+		for column, value in (('subject', subject), ('directory', directory), ('electrodeType', electrodeType)):
+			if value is not None:
+				conditions.append(column + ' = ?')
+				parameters.append(value)
+		if nameContains is not None:
+			# LIKE is case insensitive for ASCII
+			conditions.append("name LIKE ? ESCAPE '\\'")
+			parameters.append('%' + nameContains.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+		sql = 'SELECT * FROM sessions'
+		if conditions:
+			sql += ' WHERE ' + ' AND '.join(conditions)
+		sql += ' ORDER BY path'
+		if limit is not None:
+			sql += ' LIMIT ?'
+			parameters.append(limit)
+		sessions = []
+		for row in self.connection.execute(sql, parameters):
+			session = dict(row)
+			session['path'] = os.path.join(self.root, session['path'])
+			session['enabledChannels'] = json.loads(session['enabledChannels'])
+			if session['classHistogram'] is not None:
+				session['classHistogram'] = {int(cls): num for cls, num in
+				                             json.loads(session['classHistogram']).items()}
+			del session['size']
+			sessions.append(session)
+		return sessions
+
+	def subjects(self):
+		"""
+		:return: ([str]) The cataloged subjects, in order.
+		"""
+		return [row['subject'] for row in
+		        self.connection.execute("SELECT DISTINCT subject FROM sessions WHERE subject != '' ORDER BY subject")]
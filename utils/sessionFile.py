@@ -0,0 +1,185 @@
+import ast
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+from utils.constants import Constants as cnst
+
+
+def createDataset(hf, name, shape, chunks, profile=cnst.storageProfile, dtype=None):
+	"""
+	Creates a chunked dataset resizable in every dimension, stored as the given storage profile says, see
+	:data:`utils.constants.Constants.storageProfiles`.
+
+	:param h5py.File hf: The open session file.
+	:param str name: The name of the dataset.
+	:param tuple shape: The initial shape of the dataset.
+	:param tuple chunks: The shape of a chunk.
+	:param str profile: The name of the storage profile.
+	:param dtype: The dtype of the dataset, the profile's one if None.
+	:return: (h5py.Dataset) The dataset.
+	"""
+	options = cnst.storageProfiles[profile]
+	return hf.create_dataset(name, shape=shape, maxshape=(None,) * len(shape), chunks=chunks,
+	                         dtype=options['dtype'] if dtype is None else dtype, compression=options['compression'],
+	                         compression_opts=options['compression_opts'], shuffle=options['shuffle'])
+
+
+def appendRows(dataset, rows):
+	""" Appends the given rows to the given resizable dataset """
+	if rows.shape[0]:
+		dataset.resize(dataset.shape[0] + rows.shape[0], axis=0)
+		dataset[-rows.shape[0]:] = rows
+
+
+def parseSettings(boardSettings):
+	"""
+	Converts the stringified board settings of the "StreamSettings" dataset to their types.
+	The enabled channels are [] and the electrodes type is '' if they were not set.
+
+	:param dict boardSettings: The board settings, as returned by :meth:`source.boardState.BoardState.getBoardSettings`.
+	:return: (dict) The settings, e.g. {'lowerBand': 4, 'enabledChannels': [0, 1, 2], 'usingElectrodes': 'DRY', ...}.
+	"""
+	enabledChannels = ast.literal_eval(boardSettings['enabledChannels'])
+	usingElectrodes = boardSettings['usingElectrodes']
+	return {
+		'lowerBand': int(boardSettings['lowerBand']),
+		'upperBand': int(boardSettings['upperBand']),
+		'windowSize': int(boardSettings['windowSize']),
+		'filtering_data': boardSettings['filtering_data'] == 'True',
+		'scaling_output': boardSettings['scaling_output'] == 'True',
+		'enabledChannels': [] if enabledChannels is None else list(enabledChannels),
+		'windowStepSize': float(boardSettings['windowStepSize']),
+		# stringified ElectrodeType, e.g. ElectrodeType.DRY
+		'usingElectrodes': '' if usingElectrodes == 'None' else usingElectrodes.split('.')[-1]
+	}
+
+
+def getSessionSettings(fl):
+	"""
+	Returns the board settings of the given session file with their types, see :func:`parseSettings`, read from the
+	file's attributes, or from the "StreamSettings" dataset for the files written before them.
+
+	:param h5py.File fl: The open session file.
+	:return: (dict) The settings.
+	"""
+	if 'lowerBand' in fl.attrs:
+		settings = {key: value.item() if isinstance(value, np.generic) else value for key, value in fl.attrs.items()}
+		settings['enabledChannels'] = [int(channel) for channel in fl.attrs['enabledChannels']]
+		return settings
+	return parseSettings({key.decode('UTF-8'): value.decode('UTF-8') for key, value in fl['StreamSettings'][:]})
+
+
+def classRuns(classes, start=0):
+	"""
+	Returns the runs of consecutive samples of the same class.
+
+	:param numpy.ndarray classes: The class of every sample.
+	:param int start: The index of the first sample.
+	:return: (numpy.ndarray) Array of [class, start, end) rows, end excluded.
+	"""
+	changes = np.flatnonzero(classes[1:] != classes[:-1]) + 1
+	starts = np.concatenate(([0], changes))[:classes.shape[0]]
+	ends = np.concatenate((changes, [classes.shape[0]]))[:starts.shape[0]]
+	return np.stack((classes[starts], starts + start, ends + start), axis=1).astype(np.int64)
+
+
+def hasClassColumns(fl):
+	"""
+	Tells whether the "signal" dataset of the given file has the class, the ground truth class and the time columns
+	after the channels, see :data:`utils.constants.Constants.signalClassColumn`, or only the channels, like the
+	recordings converted by :mod:`utils.txtToHdf5`.
+
+	:param h5py.File fl: The open session file.
+	:return: (bool) True if the columns are there.
+	"""
+	if 'channels' in fl.attrs:
+		# the converted recordings keep their channels as an attribute
+		return fl['signal'].shape[1] > len(fl.attrs['channels'])
+	return fl['signal'].shape[1] > -cnst.signalClassColumn
+
+
+def getClassRuns(fl):
+	"""
+	Returns the runs of consecutive samples of the same class in the "signal" dataset of the given session file, read
+	from the "classIndex" dataset, or found in the class column for the files written before it. Read only the samples
+	of a run with fl['signal'][start:end].
+
+	:param h5py.File fl: The open session file.
+	:return: (numpy.ndarray) Array of [class, start, end) rows, end excluded.
+	"""
+	if 'classIndex' in fl:
+		return fl['classIndex'][:]
+	return classRuns(fl['signal'][:, cnst.signalClassColumn])
+
+
+def getWindowsNum(fl):
+	"""
+	Returns the number of windows in the given session file, without reading them.
+
+	:param h5py.File fl: The open session file.
+	"""
+	if 'windows' in fl:
+		return fl['windows'].shape[0]
+	return fl['packages'].shape[0]
+
+
+def getWindowStarts(fl):
+	"""
+	Returns the "signal" row of the first sample of every window of the given session file, read from the "windows"
+	dataset, or found by the timestamp of the first sample of every window in "packages".
+
+	:param h5py.File fl: The open session file.
+	:return: (numpy.ndarray) The start of every window.
+	"""
+	if 'windows' in fl:
+		return fl['windows'][:, 0]
+	times = fl['signal'][:, cnst.signalTimeColumn]
+	windowTimes = fl['packages'][:, 0, cnst.signalTimeColumn]
+	starts = np.minimum(np.searchsorted(times, windowTimes), max(times.shape[0] - 1, 0))
+	if not np.array_equal(times[starts], windowTimes):
+		raise ValueError('The windows of ' + fl.filename + ' are not found in its signal.')
+	return starts
+
+
+def readWindows(fl, columns=slice(None), signalFilter=None, transient=0):
+	"""
+	Returns the windows of the given session file, with the layout of the "packages" dataset:
+	[number of windows][window size][columns].
+
+	* If the file has the "packages" dataset, the windows are read from it.
+	* If the file has the "windows" dataset instead, or a signalFilter is given, only the "signal" dataset is read and
+	  the windows are returned as a read only strided view over it, built from their start rows, see
+	  :func:`getWindowStarts`. The view is copied only if the windows are not evenly spaced, e.g. when samples were lost
+	  while recording.
+	* With a signalFilter, the channel columns of the whole "signal" dataset are filtered once before the windows are
+	  cut, see :func:`utils.filters.filterSignal`, instead of filtering every window afterwards.
+
+	:param h5py.File fl: The open session file.
+	:param slice columns: The columns of the "signal" dataset to return, e.g. slice(0, 9) for the 8 channels and the class.
+	:param signalFilter: Function filtering a (number of samples, number of channels) array, None to not filter.
+	:param int transient: The windows starting in the first transient samples of the signal are left out, to drop the
+	                      ones affected by the start of the filter.
+	:return: (numpy.ndarray) The windows.
+	"""
+	if 'windows' not in fl and signalFilter is None:
+		return fl['packages'][:, :, columns]
+	if signalFilter is None:
+		signal = fl['signal'][:, columns]
+	else:
+		signal = fl['signal'][:]
+		# the columns after the channels are the class, the ground truth class and the time
+		channelsNum = signal.shape[1] + cnst.signalClassColumn
+		signal[:, :channelsNum] = signalFilter(signal[:, :channelsNum])
+		signal = signal[:, columns]
+	signal = np.ascontiguousarray(signal)
+	starts = getWindowStarts(fl)
+	starts = starts[starts >= transient]
+	if 'windows' in fl:
+		window = fl['windows'].attrs['windowSize']
+		step = fl['windows'].attrs['windowStepSize']
+	else:
+		window = fl['packages'].shape[1]
+		step = starts[1] - starts[0] if starts.shape[0] > 1 else 0
+	if starts.shape[0] and np.all(np.diff(starts) == step):
+		return as_strided(signal[starts[0]:], shape=(starts.shape[0], window, signal.shape[1]),
+		                  strides=(step * signal.strides[0],) + signal.strides, writeable=False)
+	return signal[starts[:, np.newaxis] + np.arange(window)]
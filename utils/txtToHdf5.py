@@ -1,49 +1,141 @@
+import argparse
+import functools
+import itertools
+import os
+import sys
+from multiprocessing import Pool
 import h5py
 import numpy as np
-import sys
 
 sys.path.append('..')
-from utils.constants import Constants as cnst
-from constants import getSessionFilename
-from tkinter import *
-from tkinter import filedialog
-from tkinter.filedialog import asksaveasfilename
-
-readFromLine = 2000
-readToLine = 22000
-dir= "/home/zn/Documents/OpenBCI_GUI/Recordings/OpenBCISession_2021-09-29_15-37-05/"
-root = Tk()
-root.withdraw()
-name = filedialog.askopenfilename(title="Choose an openbci GUI streaming text filename",
-                                  defaultextension=".txt",
-                                  initialdir=dir,
-                                  filetypes=[('Text Document', '*.txt')])
-
-file1 = open(name, 'r')
-Lines = file1.readlines()
-
-count = 0
-dd = []
-# Strips the newline character
-for line in Lines:
-	count += 1
-	if readFromLine <= count <= readToLine:
-		sp = line.split(',')
-		cp = [float(i) for i in sp[1:5]]
-		dd.append(cp)
-		# print(cp)
-
-filename = asksaveasfilename(title="Choose a name for the hdf5 file",
-                             initialfile=getSessionFilename(openbciGUI=True),
-                             defaultextension=".hdf5",
-                             filetypes=[('HDF5', '.hdf5')],
-                             initialdir=cnst.destinationFolder,
-                             confirmoverwrite=True)
-
-if not filename:
-	exit()
-print(filename)
-hf = h5py.File(filename, 'w')
-windowedSignal = np.array(dd).astype(float)
-hf.create_dataset("signal", data=windowedSignal)
-hf.close()
+from utils.constants import Constants as cnst, getSessionFilename
+from utils.coloringPrint import printError, printInfo
+from utils.sessionFile import createDataset, appendRows
+
+
+def parseLines(lines, channels):
+	"""
+	Parses the given lines of an OpenBCI GUI recording at once, skipping the comments and the column names.
+
+	:param [str] lines: The lines of the recording.
+	:param [int] channels: The channels to keep, 0 is the first EXG channel.
+	:return: (numpy.ndarray) Array of shape (number of samples, number of channels).
+	"""
+	# the samples start with their index, the comments with % and the column names with their name
+	lines = [line for line in lines if line.lstrip()[:1].isdigit()]
+	if not lines:
+		return np.empty((0, len(channels)))
+	return np.loadtxt(lines, delimiter=',', usecols=[channel + 1 for channel in channels], ndmin=2)
+
+
+def convert(txtFilename, hdf5Filename=None, channels=cnst.txtConversionChannels, fromLine=1, toLine=None,
+            chunkLines=cnst.txtChunkLines, profile=cnst.storageProfile):
+	"""
+	Converts an OpenBCI GUI recording into an hdf5 file with the "signal" dataset, holding the samples of the given
+	channels.
+
+	* The recording is read and parsed :data:`utils.constants.Constants.txtChunkLines` lines at a time, and every chunk
+	  is appended to the "signal" dataset before the next one is read, so the recording is never kept in memory.
+	* The "signal" dataset is stored as the given storage profile says, see
+	  :data:`utils.constants.Constants.storageProfiles`.
+	* The recording's name, the channels and the lines converted are stored as attributes of the file.
+
+	:param str txtFilename: The OpenBCI GUI recording, e.g. OpenBCI-RAW-2021-09-29_15-37-05.txt.
+	:param str hdf5Filename: The hdf5 file name, the recording's name with the .hdf5 extension if None.
+	:param [int] channels: The channels to keep, 0 is the first EXG channel.
+	:param int fromLine: The first line of the recording to convert, counted from 1.
+	:param int toLine: The last line of the recording to convert, the last line of the file if None.
+	:param int chunkLines: The lines parsed at a time.
+	:param str profile: The name of the storage profile.
+	:return: (str) The hdf5 file name.
+	"""
+	if hdf5Filename is None:
+		hdf5Filename = os.path.splitext(txtFilename)[0] + '.hdf5'
+	channels = list(channels)
+	with open(txtFilename, 'r') as txtFile, h5py.File(hdf5Filename, 'w') as hf:
+		signal = createDataset(hf, 'signal', (0, len(channels)),
+		                       (cnst.storageProfiles[profile]['chunkSize'], len(channels)), profile)
+		lines = itertools.islice(txtFile, fromLine - 1, toLine)
+		while True:
+			chunk = list(itertools.islice(lines, chunkLines))
+			if not chunk:
+				break
+			appendRows(signal, parseLines(chunk, channels))
+		hf.attrs['sourceFile'] = os.path.basename(txtFilename)
+		hf.attrs['channels'] = channels
+		hf.attrs['fromLine'] = fromLine
+		hf.attrs['toLine'] = -1 if toLine is None else toLine
+		printInfo(hdf5Filename + ': ' + signal.shape[0].__str__() + ' samples')
+	return hdf5Filename
+
+
+def convertDirectory(directory, outputDirectory=None, processes=None, **options):
+	"""
+	Converts every OpenBCI GUI recording in the given directory and its subdirectories in parallel, one recording per
+	process, see :func:`convert`.
+
+	:param str directory: The directory of the recordings, e.g. the OpenBCI_GUI/Recordings directory.
+	:param str outputDirectory: The directory of the hdf5 files, next to their recordings if None.
+	:param int processes: The number of processes, the number of cpus if None.
+	:param options: The options of :func:`convert`, e.g. channels=[0, 1, 2].
+	:return: ([str]) The hdf5 file names.
+	"""
+	txtFilenames = sorted(os.path.join(path, name) for path, _, names in os.walk(directory)
+	                      for name in names if name.lower().endswith('.txt'))
+	hdf5Filenames = [None] * len(txtFilenames)
+	if outputDirectory is not None:
+		# the same subdirectories as the recordings'
+		hdf5Filenames = [os.path.join(outputDirectory, os.path.splitext(os.path.relpath(name, directory))[0] + '.hdf5')
+		                 for name in txtFilenames]
+		for hdf5Filename in hdf5Filenames:
+			os.makedirs(os.path.dirname(hdf5Filename), exist_ok=True)
+	with Pool(processes) as pool:
+		return pool.starmap(functools.partial(convert, **options), zip(txtFilenames, hdf5Filenames))
+
+
+def chooseFiles():
+	""" Asks for the recording and the hdf5 file name with file dialogs, like the conversion script used to """
+	from tkinter import Tk, filedialog
+	root = Tk()
+	root.withdraw()
+	txtFilename = filedialog.askopenfilename(title="Choose an openbci GUI streaming text filename",
+	                                         defaultextension=".txt",
+	                                         filetypes=[('Text Document', '*.txt')])
+	if not txtFilename:
+		return None, None
+	hdf5Filename = filedialog.asksaveasfilename(title="Choose a name for the hdf5 file",
+	                                            initialfile=getSessionFilename(openbciGUI=True),
+	                                            defaultextension=".hdf5",
+	                                            filetypes=[('HDF5', '.hdf5')],
+	                                            initialdir=cnst.destinationFolder,
+	                                            confirmoverwrite=True)
+	return txtFilename, hdf5Filename
+
+
+if __name__ == '__main__':
+	parser = argparse.ArgumentParser(description='Converts OpenBCI GUI recordings into hdf5 files.')
+	parser.add_argument('input', nargs='?',
+	                    help='An OpenBCI GUI recording, or a directory to convert every recording in it. '
+	                         'Chosen with a file dialog if not given.')
+	parser.add_argument('-o', '--output', help='The hdf5 file, or the directory of the hdf5 files for a directory.')
+	parser.add_argument('-c', '--channels', type=int, nargs='+', default=cnst.txtConversionChannels,
+	                    help='The channels to keep, 0 is the first EXG channel.')
+	parser.add_argument('-f', '--fromLine', type=int, default=1, help='The first line to convert, counted from 1.')
+	parser.add_argument('-t', '--toLine', type=int, help='The last line to convert.')
+	parser.add_argument('-p', '--processes', type=int, help='The number of processes converting a directory.')
+	parser.add_argument('-sp', '--storageProfile', choices=cnst.storageProfiles.keys(), default=cnst.storageProfile,
+	                    help='How the signal dataset is stored.')
+	args = parser.parse_args()
+	convertOptions = dict(channels=args.channels, fromLine=args.fromLine, toLine=args.toLine,
+	                      profile=args.storageProfile)
+	if args.input is None:
+		txtName, hdf5Name = chooseFiles()
+		if not txtName or not hdf5Name:
+			exit()
+		convert(txtName, hdf5Name, **convertOptions)
+	elif os.path.isdir(args.input):
+		convertDirectory(args.input, args.output, args.processes, **convertOptions)
+	elif os.path.isfile(args.input):
+		convert(args.input, args.output, **convertOptions)
+	else:
+		printError('No such file or directory: ' + args.input)
@@ -0,0 +1,128 @@
+import numpy as np
+
+
+class WindowBuffer:
+	"""
+	Preallocated circular buffer of samples that cuts them in overlapping windows without copying them.
+
+	* Every sample is written twice, at its position and :py:data:`capacity` rows after it, so the last
+	  :py:data:`capacity` samples are always contiguous in :py:data:`data`, wherever the buffer wraps.
+	* The windows end every :py:data:`step` samples, see :meth:`push`. Windows of every length given to
+	  :meth:`setWindow` can be cut at these ends from the same samples, see :meth:`getWindows`, as strided views over
+	  :py:data:`data`. Nothing is copied until a window is handed to another process.
+	* The window and step can be changed at any time with :meth:`setWindow`. The next window starts where the
+	  previous settings would have started it, with the new window size, and the buffer grows if the longest window
+	  does not fit.
+
+	:param int capacity: The number of samples the buffer can hold, grows to twice the longest window if smaller.
+	:param numpy.dtype dtype: The dtype of a sample, usually a structured one.
+	"""
+
+	def __init__(self, capacity, dtype):
+		self.capacity = capacity
+		self.data = np.zeros(2 * capacity, dtype=dtype)
+		self._rows = self.data.view(np.dtype((np.void, self.data.dtype.itemsize)))
+		self.window = 0
+		self.step = 0
+		self.lengths = ()
+		self.writeCount = 0
+		# the first sample windows can start with, moved by clear and when the samples before it are dropped
+		self.firstSample = 0
+		self.nextWindowEnd = 0
+		self.windowsNum = 0
+
+	def setWindow(self, window, step, lengths=()):
+		"""
+		Changes the size and the step of the windows, keeping the samples already written.
+
+		:param int window: The number of samples in a window.
+		:param int step: The number of samples between the ends of two consecutive windows.
+		:param tuple lengths: Other window sizes, in samples, cut at the same ends, see :meth:`getWindows`.
+		"""
+		self.lengths = tuple(lengths)
+		longest = max((window,) + self.lengths)
+		if longest > self.capacity:
+			self._resize(2 * longest)
+		self.nextWindowEnd = max(self.nextWindowEnd + window - self.window, self.firstSample + window)
+		self.window = window
+		self.step = step
+
+	def _resize(self, capacity):
+		kept = min(self.writeCount, self.capacity, capacity)
+		samples = self.data[self._position(self.writeCount - kept):][:kept]
+		self.capacity = capacity
+		self.data = np.zeros(2 * capacity, dtype=self.data.dtype)
+		self._rows = self.data.view(np.dtype((np.void, self.data.dtype.itemsize)))
+		self._write(samples, self.writeCount - kept)
+		self.firstSample = max(self.firstSample, self.writeCount - kept)
+
+	def _position(self, index):
+		return index % self.capacity
+
+	def _write(self, samples, start):
+		# copy the samples as raw rows, much faster than field by field
+		samples = samples.view(self._rows.dtype)
+		position = self._position(start)
+		firstPart = min(samples.shape[0], self.capacity - position)
+		self._rows[position:position + firstPart] = samples[:firstPart]
+		self._rows[position + self.capacity:position + self.capacity + firstPart] = samples[:firstPart]
+		self._rows[:samples.shape[0] - firstPart] = samples[firstPart:]
+		self._rows[self.capacity:self.capacity + samples.shape[0] - firstPart] = samples[firstPart:]
+
+	def push(self, samples):
+		"""
+		Writes the given samples and yields the ends of the windows they complete, in order. The samples are written
+		while iterating, so the returned generator must be consumed.
+
+		The ends are yielded as arrays of sample indexes, each one past the last sample of a window, counted from the
+		first sample ever written. The windows ending there are given by :meth:`getWindows` until the next iteration,
+		since the buffer is written again to make room for the remaining samples.
+
+		:param numpy.ndarray samples: Array of samples with the buffer's dtype.
+		"""
+		if self.window <= 0 or self.step <= 0:
+			# no windows to cut, keep the last samples for when there will be
+			kept = samples[-self.capacity:]
+			self._write(kept, self.writeCount + samples.shape[0] - kept.shape[0])
+			self.writeCount += samples.shape[0]
+			self.firstSample = max(self.firstSample, self.writeCount - self.capacity)
+			self.nextWindowEnd = max(self.nextWindowEnd, self.firstSample + self.window)
+			return
+		longest = max((self.window,) + self.lengths)
+		while samples.shape[0]:
+			# write as many samples as possible without overwriting the next windows
+			room = self.capacity - min(max(self.writeCount - max(self.firstSample, self.nextWindowEnd - longest), 0),
+			                           self.capacity)
+			self._write(samples[:room], self.writeCount)
+			self.writeCount += min(room, samples.shape[0])
+			samples = samples[room:]
+			if self.writeCount >= self.nextWindowEnd:
+				ends = np.arange(self.nextWindowEnd, self.writeCount + 1, self.step)
+				self.nextWindowEnd += ends.shape[0] * self.step
+				self.windowsNum += ends.shape[0]
+				yield ends
+
+	def getWindows(self, ends, length=None):
+		"""
+		Returns the windows of the given length ending at the given ends, as a read only strided view of shape
+		(number of windows, length) over :py:data:`data`. The windows starting before the oldest sample kept, or before
+		the first sample written after :meth:`clear`, are left out, so they are the last ones of the given ends.
+
+		:param numpy.ndarray ends: The ends yielded by :meth:`push`.
+		:param int length: The window size, :py:data:`window` or one of :py:data:`lengths`, :py:data:`window` if None.
+		"""
+		if length is None:
+			length = self.window
+		ends = ends[np.searchsorted(ends, max(self.firstSample, self.writeCount - self.capacity) + length):]
+		itemsize = self.data.dtype.itemsize
+		# same as numpy.lib.stride_tricks.as_strided, which is much slower with structured dtypes
+		windows = np.ndarray((ends.shape[0], length), dtype=self.data.dtype, buffer=self.data,
+		                     offset=self._position(ends[0] - length if ends.shape[0] else 0) * itemsize,
+		                     strides=(self.step * itemsize, itemsize))
+		windows.flags.writeable = False
+		return windows
+
+	def clear(self):
+		""" Drops every sample written so far, the next window starts with the next written sample """
+		self.firstSample = self.writeCount
+		self.nextWindowEnd = self.writeCount + self.window